@@ -4,10 +4,51 @@ import eventlet
 # we need to monkey patch the standard library to make it work with eventlet
 # Apscheduler timers break without this
 eventlet.monkey_patch()
+import atexit
+import importlib
+import sys
+
+
+def _shutdown_logging():
+    # the log handlers are flushed and closed while greenlets can still run. Once
+    # they are finalized, logging's (green) lock can't be acquired, and it is
+    # whenever a handler is collected, unless logging's list of handlers is empty
+    if "covfee.logger" in sys.modules:
+        # writes the queued records first
+        sys.modules["covfee.logger"].shutdown_logging()
+    if "logging" in sys.modules:
+        logging = sys.modules["logging"]
+        logging.shutdown()
+        # so that logging.shutdown() has nothing left to do at exit either
+        del logging._handlerList[:]
+
+
+atexit.register(_shutdown_logging)
+
 from . import _version
-from .shared import task_dataclasses as tasks  # noqa: F401
 
-# expose building blocks
-from .shared.dataclass import HIT, Journey, Project  # noqa: F401
+# expose building blocks. They are imported on first access, so that the CLI
+# does not load the ORM when importing covfee.
+_lazy_exports = {
+    "tasks": ("covfee.shared.task_dataclasses", None),
+    "HIT": ("covfee.shared.dataclass", "HIT"),
+    "Journey": ("covfee.shared.dataclass", "Journey"),
+    "Project": ("covfee.shared.dataclass", "Project"),
+}
 
 __version__ = _version.get_versions()["version"]
+
+
+def __getattr__(name):
+    if name not in _lazy_exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attr = _lazy_exports[name]
+    value = importlib.import_module(module_name)
+    if attr is not None:
+        value = getattr(value, attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_exports))
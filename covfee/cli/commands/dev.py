@@ -3,14 +3,17 @@
 These commands meant as development tools only
 """
 
+import json
 import os
+import subprocess
+import sys
+from typing import List, Tuple
+
 import click
 
-from flask import current_app as app
 from halo.halo import Halo
 
 from covfee.cli.utils import working_directory
-from covfee.shared.schemata import Schemata
 from covfee.config import config
 
 
@@ -24,24 +27,277 @@ def build_master():
     """
     Builds the master (without custom tasks) for distribution.
     """
+    from covfee.server.static_assets import build_bundle_assets
+
     config.load_environment("dev")
     bundle_path = config["MASTER_BUNDLE_PATH"]
     with working_directory(config["COVFEE_CLIENT_PATH"]):
-        os.system(
+        exit_code = os.system(
             "npx webpack"
             + " --config ./webpack.prod.js"
             + " --output-path "
             + bundle_path
         )
+    if exit_code != 0:
+        sys.exit(1)
+
+    # content-hashed names and precompressed variants for static serving
+    manifest = build_bundle_assets(bundle_path, config["STATIC_COMPRESSION_MIN_SIZE"])
+    for entry, hashed_name in manifest.items():
+        print(f"{entry} -> {hashed_name}")
 
 
 @covfee_dev_cli.command(name="schemata")
-def make_schemata():
+@click.option(
+    "--check",
+    is_flag=True,
+    help="Only checks that the schemata are up to date with the typescript specs.",
+)
+@click.option(
+    "--force", is_flag=True, help="Rebuilds the schemata even if up to date."
+)
+def make_schemata(check=False, force=False):
+    from covfee.shared.schemata import Schemata
+
+    config.load_environment("dev")
+    schema = Schemata()
+    if check:
+        if not schema.is_up_to_date():
+            print("Schemata are out of date. Run covfee-dev schemata to rebuild them.")
+            sys.exit(1)
+        print("Schemata are up to date.")
+        return
+
     with Halo(text="Making schemata", spinner="dots") as spinner:
-        schema = Schemata()
-        schema.make()
-        schema.make_dataclasses()
-        spinner.succeed("Schemata made.")
+        schemata_made = schema.make(force)
+        dataclasses_made = schema.make_dataclasses(force)
+        if schemata_made or dataclasses_made:
+            spinner.succeed("Schemata made.")
+        else:
+            spinner.succeed("Schemata are up to date.")
+
+
+def measure_import_time(module: str) -> Tuple[float, List[Tuple[float, str]]]:
+    """Imports a module in a new interpreter with -X importtime.
+    Returns the cumulative import time of the module and the (self time, name) of
+    every module imported, both in ms.
+    """
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total, imports = 0.0, []
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        imports.append((int(self_us) / 1000, name.strip()))
+        if name.strip() == module:
+            total = int(cumulative_us) / 1000
+    return total, imports
+
+
+@covfee_dev_cli.command(name="importtime")
+@click.option(
+    "--module",
+    "modules",
+    multiple=True,
+    default=["covfee.cli.commands.launch", "covfee.cli.commands.dev"],
+    help="Module to measure. Can be given multiple times.",
+)
+@click.option(
+    "--budget",
+    type=float,
+    default=None,
+    help="Maximum import time in ms. Defaults to IMPORT_TIME_BUDGET_MS.",
+)
+@click.option("--repeat", default=5, help="Number of measurements per module.")
+@click.option("--top", default=10, help="Number of slowest imports to list.")
+def import_time(modules, budget, repeat, top):
+    """
+    Measures the import time of the CLI modules and fails if over budget.
+    """
+    if budget is None:
+        budget = config["IMPORT_TIME_BUDGET_MS"]
+
+    over_budget = False
+    for module in modules:
+        # the fastest run is the least affected by noise
+        total, imports = min(
+            (measure_import_time(module) for _ in range(repeat)),
+            key=lambda m: m[0],
+        )
+        over_budget = over_budget or total > budget
+        print(f"{module}: {total:.0f}ms (budget {budget:.0f}ms)")
+        for self_ms, name in sorted(imports, reverse=True)[:top]:
+            print(f"  {self_ms:8.1f}ms  {name}")
+
+    if over_budget:
+        print("Import time over budget.")
+        sys.exit(1)
+
+
+@covfee_dev_cli.command(name="check-indexes")
+@click.argument("database", type=click.Path(exists=True, dir_okay=False))
+def check_indexes(database):
+    """
+    Checks that the hot queries use indexes in an existing database file.
+    """
+    from sqlalchemy import create_engine
+
+    from covfee.server.migrations import check_query_plans, get_pending_migrations
+
+    with create_engine(f"sqlite:///{database}").connect() as connection:
+        failures = check_query_plans(connection)
+        pending = get_pending_migrations(connection)
+    print(f"{database}: {len(failures)} queries without index")
+    for failure in failures:
+        print(f"  {failure}")
+    if len(pending) > 0:
+        print(f"  pending migrations: {', '.join(m.name for m in pending)}")
+    if len(failures) > 0:
+        sys.exit(1)
+
+
+@covfee_dev_cli.command(name="loader-benchmark")
+@click.option("--hits", default=10000, help="HITs of the synthetic project.")
+@click.option("--nodes", default=3, help="Task nodes in each HIT.")
+def loader_benchmark(hits, nodes):
+    """
+    Loads a synthetic JSON project into an in-memory database.
+    """
+    from covfee.cli.loader_benchmark import run_loader_benchmark
+
+    config.load_environment("dev")
+    report = run_loader_benchmark(hits, nodes)
+    print(
+        f"{report['hits']} HITs ({report['file_size_mb']:.1f}MB): "
+        f"header {report['header_s']:.2f}s, HITs {report['hits_s']:.2f}s, "
+        f"{report['hits_per_s']:.0f} HITs/s, "
+        f"peak memory {report['peak_memory_mb'] or 0:.0f}MB"
+    )
+
+
+@covfee_dev_cli.command(name="task-benchmark")
+@click.option("--nodes", default=100, help="Task nodes of the synthetic project.")
+@click.option("--repeat", default=100, help="Calls timed per node.")
+def task_benchmark(nodes, repeat):
+    """
+    Times the task objects of task nodes, with and without their cache.
+    """
+    from covfee.cli.task_benchmark import run_task_benchmark
+
+    report = run_task_benchmark(nodes, repeat)
+    print(
+        f"{report['nodes']} nodes: task object "
+        f"{report['uncached_us']:.1f}us uncached, {report['cached_us']:.1f}us cached; "
+        f"to_dict {report['uncached_to_dict_us']:.1f}us uncached, "
+        f"{report['cached_to_dict_us']:.1f}us cached; "
+        f"set_status {report['uncached_set_status_us']:.1f}us uncached, "
+        f"{report['cached_set_status_us']:.1f}us cached"
+    )
+
+
+@covfee_dev_cli.command(name="serializer-benchmark")
+@click.option("--hits", default=2000, help="HITs of the synthetic project.")
+@click.option("--nodes", default=5, help="Task nodes in each HIT.")
+@click.option("--repeat", default=3, help="Calls timed per row.")
+def serializer_benchmark(hits, nodes, repeat):
+    """
+    Times the to_dict of the rows of every model, reflective and with serializers.
+    """
+    from covfee.cli.serializer_benchmark import run_serializer_benchmark
+
+    report = run_serializer_benchmark(hits, nodes, repeat)
+    for name, model in report["models"].items():
+        print(
+            f"{name:>25}: {model['rows']:>6} rows, "
+            f"{model['reflective_us']:.1f}us reflective, "
+            f"{model['serializers_us']:.1f}us serializers"
+        )
+    print(
+        f"{report['rows']} rows: {report['reflective_s']:.2f}s reflective, "
+        f"{report['serializers_s']:.2f}s serializers"
+    )
+
+
+@covfee_dev_cli.command(name="loadtest")
+@click.option("--participants", default=10, help="Number of simulated participants.")
+@click.option("--nodes", default=3, help="Task nodes in each participant's journey.")
+@click.option("--states", default=10, help="State updates sent per node.")
+@click.option(
+    "--actions",
+    default=0,
+    help="Redux actions sent per node. Requires the redux store service.",
+)
+@click.option("--messages", default=2, help="Chat messages sent per node.")
+@click.option(
+    "--restarts",
+    default=0,
+    help="Responses added to every task node beforehand, as by restarts.",
+)
+@click.option(
+    "--ramp-up", default=1.0, help="Seconds over which participants are started."
+)
+@click.option("--timeout", default=10.0, help="Seconds to wait for each response.")
+@click.option("--port", default=5055, help="Port of the load test server.")
+@click.option(
+    "--session-backend",
+    type=click.Choice(["memory", "sqlite", "filesystem"]),
+    default=None,
+    help="Session backend of the server. Defaults to SESSION_BACKEND.",
+)
+@click.option(
+    "--socketio-serializer",
+    type=click.Choice(["json", "msgpack"]),
+    default="json",
+    help="Socket.IO packet format of the server and the participants.",
+)
+@click.option(
+    "--server",
+    type=click.Choice(["eventlet", "gunicorn"]),
+    default="eventlet",
+    help="Embedded eventlet server (as covfee start) or gunicorn (eventlet worker).",
+)
+@click.option(
+    "--viewers", default=0, help="Media viewers seeking in a video concurrently."
+)
+@click.option("--seeks", default=20, help="Range requests made by each viewer.")
+@click.option("--media-size", default=64, help="Size (MB) of the video.")
+@click.option("--seek-size", default=512, help="KB requested by each seek.")
+@click.option(
+    "--output", type=click.Path(), default=None, help="Writes the JSON report here."
+)
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True),
+    default=None,
+    help="JSON report of a previous run to compare against.",
+)
+def loadtest(output, baseline, **kwargs):
+    """
+    Runs simulated participants against a local server with a synthetic project.
+    """
+    from covfee.cli.loadtest import LoadTestSettings, format_report, run_loadtest
+
+    try:
+        report = run_loadtest(LoadTestSettings(**kwargs))
+    except (RuntimeError, TimeoutError) as ex:
+        # missing dependencies, or a server that did not start
+        print(ex)
+        sys.exit(1)
+
+    baseline_report = None
+    if baseline is not None:
+        with open(baseline) as f:
+            baseline_report = json.load(f)
+    print(format_report(report, baseline_report))
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
 
 
 if __name__ == "__main__":
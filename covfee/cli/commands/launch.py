@@ -14,12 +14,13 @@ from colorama import init as colorama_init
 
 from covfee.cli.utils import NPMPackage, working_directory
 from covfee.config import Config
-from covfee.launcher import Launcher, ProjectExistsException, launch_webpack
 from covfee.shared.validator.validation_errors import JavascriptError, ValidationError
 
-from covfee.loader import Loader
 import sys
 
+# Note: the launcher and loader (and with them the server and ORM) are imported
+# within the commands that use them, to keep the startup of the CLI fast.
+
 colorama_init()
 
 
@@ -38,6 +39,8 @@ def webpack(host):
     """
     Launches a webpack instance for use in dev mode
     """
+    from covfee.launcher import launch_webpack
+
     config = Config("dev")
 
     host = (
@@ -97,6 +100,16 @@ def get_start_message(url):
 @click.option(
     "--no-launch", is_flag=True, help="Do not launch covfee, only make the DB"
 )
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    help="Only report the changes that would be made to the DB, then exit.",
+)
+@click.option(
+    "--recompress-json",
+    is_flag=True,
+    help="Compresses the large JSON values written by older covfee versions.",
+)
 @click.argument("project_spec_file")
 def make(
     force: bool,
@@ -105,6 +118,8 @@ def make(
     safe: bool,
     rms: bool,
     no_launch: bool,
+    dry_run: bool,
+    recompress_json: bool,
     project_spec_file: str,
 ):
     mode = "local"
@@ -117,6 +132,10 @@ def make(
 
     install_npm_packages()
 
+    from covfee.launcher import Launcher, ProjectExistsException
+    from covfee.loader import Loader
+    from covfee.shared.dataclass import SpecsChangedException
+
     try:
         # 1. Parse the project spec file into a format that covfee can manage (CovfeeApp)
         loader = Loader(project_spec_file)
@@ -128,7 +147,11 @@ def make(
         launcher = Launcher(
             mode, covfee_app, Path(project_spec_file).parent, auth_enabled=not unsafe
         )
-        launcher.create_or_update_database(delete_existing_data=force)
+        if dry_run:
+            return print(launcher.get_database_changes_report(delete_existing_data=force))
+        launcher.create_or_update_database(
+            delete_existing_data=force, recompress_json=recompress_json
+        )
 
         # 3. Launch the app based on the current data/configuration.
         if not no_launch:
@@ -151,6 +174,14 @@ def make(
         return print(
             f'Project "{err.name}" exists in database. Add --force option to overwrite all projects.'
         )
+    except SpecsChangedException as err:
+        return print(
+            f'The specs of project "{err.name}" differ from those in the database:\n'
+            + "\n".join(f"  - {c}" for c in err.changed)
+            + "\nExisting HITs and journeys cannot be modified. Revert the changes,"
+            " add the modified HITs/journeys with a new global_unique_id, or add"
+            " --force to recreate the database (deleting its data)."
+        )
     except Exception as err:
         print(traceback.format_exc())
         if "js_stack_trace" in dir(err):
@@ -173,6 +204,8 @@ def start(host, port, deploy, safe):
     unsafe = False if mode == "deploy" else (not safe)
     config = Config(mode)
 
+    from covfee.launcher import Launcher
+
     try:
         launcher = Launcher(mode, [], auth_enabled=not unsafe)
         launcher.launch(host=host, port=port)
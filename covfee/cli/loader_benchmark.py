@@ -0,0 +1,66 @@
+"""Benchmark of the loading of large JSON project files.
+
+A synthetic JSON project is written to a temporary folder, then loaded like covfee
+make does: its header is read and validated, and its HITs are parsed and validated
+in chunks as they are added to an (in-memory) database in batches. Used by the
+covfee-dev loader-benchmark command.
+"""
+
+import json
+import os
+import tempfile
+import time
+from typing import Dict
+
+
+def write_synthetic_project(path: str, hits: int, nodes: int):
+    """Writes a JSON project with hits HITs of nodes tasks each, one HIT at a time"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"id": 1, "name": "Loader benchmark", "email": "loader@example.com",')
+        f.write(' "hits": [')
+        for i in range(hits):
+            hit = {
+                "id": f"hit{i}",
+                "name": f"Loader benchmark HIT {i}",
+                "nodes": [
+                    {"type": "IncrementCounterTask", "name": f"Counter {j}"}
+                    for j in range(nodes)
+                ],
+                "journeys": [{"nodes": list(range(nodes))}],
+            }
+            f.write(("," if i > 0 else "") + json.dumps(hit))
+        f.write("]}")
+
+
+def run_loader_benchmark(hits: int, nodes: int) -> Dict:
+    """Loads a synthetic project into an in-memory database, and returns the
+    durations of the header and HITs stages.
+    """
+    from covfee.cli.utils import get_peak_memory_mb
+    from covfee.launcher import Launcher
+    from covfee.loader import Loader
+
+    with tempfile.TemporaryDirectory(prefix="covfee-loader-benchmark-") as folder:
+        path = os.path.join(folder, "benchmark.covfee.json")
+        write_synthetic_project(path, hits, nodes)
+        file_size_mb = os.path.getsize(path) / 2**20
+
+        start = time.perf_counter()
+        covfee_app = Loader(path).load_project_spec_file_and_parse_as_covfee_app()
+        header_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        launcher = Launcher("dev", covfee_app, folder, auth_enabled=False)
+        launcher.create_or_update_database(delete_existing_data=True)
+        hits_duration = time.perf_counter() - start
+        launcher.engine.dispose()
+
+    total = header_duration + hits_duration
+    return {
+        "hits": hits,
+        "file_size_mb": file_size_mb,
+        "header_s": header_duration,
+        "hits_s": hits_duration,
+        "hits_per_s": hits / total if total > 0 else 0,
+        "peak_memory_mb": get_peak_memory_mb(),
+    }
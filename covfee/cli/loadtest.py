@@ -0,0 +1,675 @@
+"""Load test of a covfee server.
+
+A synthetic project is served from a temporary folder by a server subprocess, and
+driven by simulated participants that go through their journeys like the frontend
+does: connect, join each node, stream state (and optionally redux actions), chat
+and submit. The chat messages' delivery latency is measured from the moment they
+are sent until they are received back from the chat room. Simulated media viewers
+can run alongside them, seeking to random positions of a video in the project's
+www folder with range requests. The server is either the embedded eventlet server
+of covfee start, or gunicorn (eventlet worker), which sends the media ranges with
+sendfile. Used by the covfee-dev loadtest command.
+"""
+
+import json
+import os
+import queue
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+JOURNEYS_FILENAME = "loadtest_journeys.json"
+# pid of the process that serves the requests (the worker, for gunicorn)
+SERVER_PID_FILENAME = "loadtest_server.pid"
+MEDIA_FILENAME = "loadtest.mp4"
+
+
+class LoadTestSettings(NamedTuple):
+    participants: int = 10
+    # task nodes per journey
+    nodes: int = 3
+    # state events sent per node
+    states: int = 10
+    # redux actions sent per node. Requires the redux store service
+    actions: int = 0
+    # chat messages sent per node
+    messages: int = 2
+    # seconds over which the participants are started
+    ramp_up: float = 1.0
+    # seconds to wait for each response
+    timeout: float = 10.0
+    port: int = 5055
+    # responses added to every task node before the run, as restarts would
+    restarts: int = 0
+    # SESSION_BACKEND of the server. Defaults to the config's
+    session_backend: Optional[str] = None
+    # SOCKETIO_SERIALIZER of the server, also used by the participants' clients
+    socketio_serializer: str = "json"
+    # "eventlet" (socketio.run, as covfee start) or "gunicorn" (eventlet worker)
+    server: str = "eventlet"
+    # media viewers, each seeking to random positions of the media file
+    viewers: int = 0
+    # range requests made by each viewer
+    seeks: int = 20
+    # size (MB) of the media file
+    media_size: int = 64
+    # bytes (KB) requested by each seek
+    seek_size: int = 512
+
+
+def make_loadtest_app(participants: int, nodes: int):
+    """Synthetic project with one single-journey HIT per participant"""
+    from covfee.shared import task_dataclasses as tasks
+    from covfee.shared.dataclass import HIT, CovfeeApp, Project
+
+    hits = []
+    for i in range(participants):
+        hit = HIT(f"Load test HIT {i}")
+        hit.add_journey(
+            [
+                tasks.IncrementCounterTaskSpec(
+                    name=f"Counter {j}", useSharedState=False
+                )
+                for j in range(nodes)
+            ]
+        )
+        hits.append(hit)
+    return CovfeeApp([Project("Load test", email="loadtest@example.com", hits=hits)])
+
+
+def write_media_file(folder: str, size_mb: int) -> str:
+    """Writes a media file of size_mb random MB to the www folder in folder"""
+    www_path = os.path.join(folder, "www")
+    os.makedirs(www_path, exist_ok=True)
+    path = os.path.join(www_path, MEDIA_FILENAME)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(1024 * 1024))
+    return path
+
+
+def serve(
+    folder: str,
+    port: int,
+    participants: int,
+    nodes: int,
+    restarts: int = 0,
+    server: str = "eventlet",
+):
+    """Creates the load test database in folder and runs the server on it.
+    Runs in the server subprocess, with folder as working directory.
+    """
+    from covfee.launcher import Launcher
+    from covfee.server.db import create_database_sessionmaker
+    from covfee.server.orm import JourneyInstance, TaskInstance
+
+    launcher = Launcher(
+        "local", make_loadtest_app(participants, nodes), folder, auth_enabled=False
+    )
+    launcher.create_or_update_database(delete_existing_data=True)
+
+    session_local = create_database_sessionmaker(launcher.engine)
+    with session_local() as session:
+        for task in session.query(TaskInstance).all():
+            for _ in range(restarts):
+                task.add_response().state = {"restart": True}
+        session.commit()
+        journey_ids = [j.id.hex() for j in session.query(JourneyInstance).all()]
+    with open(os.path.join(folder, JOURNEYS_FILENAME), "w") as f:
+        json.dump(journey_ids, f)
+
+    if server == "gunicorn":
+        # the gunicorn master must not be monkey patched by eventlet: it is started
+        # in a fresh interpreter (same pid), and the app is created in the worker
+        launcher.engine.dispose()
+        os.execv(
+            sys.executable,
+            [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                "--worker-class",
+                "eventlet",
+                "--workers",
+                "1",
+                # the open socketio connections are not waited for on exit
+                "--graceful-timeout",
+                "1",
+                "--bind",
+                f"127.0.0.1:{port}",
+                "covfee.cli.loadtest:make_gunicorn_app()",
+            ],
+        )
+    socketio, app = make_server_app(session_local)
+    socketio.run(app, host="127.0.0.1", port=port, log_output=False)
+
+
+def make_server_app(session_local=None):
+    """Creates the app of the load test server, on the database of the working
+    directory if session_local is not given.
+    """
+    from covfee.server.app import create_app_and_socketio
+
+    with open(SERVER_PID_FILENAME, "w") as f:
+        f.write(str(os.getpid()))
+    socketio, app = create_app_and_socketio("local", session_local)
+    app.config["UNSAFE_MODE_ON"] = True
+    return socketio, app
+
+
+def make_gunicorn_app():
+    """App factory called by gunicorn in its worker"""
+    return make_server_app()[1]
+
+
+class LoadTestStats:
+    """Latencies and errors of the requests made by the participants, per event"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def record(self, event: str, start: float, error: Optional[str] = None):
+        latency = time.perf_counter() - start
+        with self._lock:
+            if error is None:
+                self.latencies.setdefault(event, []).append(latency)
+            else:
+                self.errors.setdefault(event, Counter())[error] += 1
+
+    def get_summary(self, duration: float) -> Dict[str, Dict]:
+        events = sorted(set(self.latencies) | set(self.errors))
+        summary = {}
+        for event in events:
+            latencies = sorted(self.latencies.get(event, []))
+            errors = self.errors.get(event, Counter())
+            count = len(latencies) + sum(errors.values())
+            summary[event] = {
+                "count": count,
+                "throughput": count / duration if duration > 0 else 0,
+                "errors": sum(errors.values()),
+                "error_rate": sum(errors.values()) / count if count > 0 else 0,
+                "error_messages": dict(errors.most_common(5)),
+                "p50_ms": get_percentile(latencies, 50) * 1000,
+                "p99_ms": get_percentile(latencies, 99) * 1000,
+                "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0,
+                "max_ms": latencies[-1] * 1000 if latencies else 0,
+            }
+        return summary
+
+
+def get_percentile(sorted_values: List[float], percentile: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if len(sorted_values) == 0:
+        return 0
+    rank = max(0, -(-len(sorted_values) * percentile // 100) - 1)
+    return sorted_values[int(rank)]
+
+
+class ProcessMonitor:
+    """Samples the CPU time and resident memory of a process from /proc (linux)"""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.max_rss_mb: Optional[float] = None
+        self.cpu_start: Optional[float] = None
+        self.cpu_end: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def read_cpu_seconds(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                # fields after the command name, which may contain spaces
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        utime, stime = int(fields[11]), int(fields[12])
+        return (utime + stime) / os.sysconf("SC_CLK_TCK")
+
+    def read_rss_mb(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        rss = self.read_rss_mb()
+        if rss is not None:
+            self.max_rss_mb = max(rss, self.max_rss_mb or 0)
+        cpu = self.read_cpu_seconds()
+        if cpu is not None:
+            self.cpu_end = cpu
+
+    def start(self):
+        self.cpu_start = self.read_cpu_seconds()
+        self._thread.start()
+
+    def stop(self):
+        self.sample()
+        self._stop.set()
+
+    def get_summary(self, duration: float) -> Dict:
+        cpu_seconds = (
+            self.cpu_end - self.cpu_start
+            if self.cpu_start is not None and self.cpu_end is not None
+            else None
+        )
+        return {
+            "max_rss_mb": self.max_rss_mb,
+            "cpu_seconds": cpu_seconds,
+            "cpu_percent": cpu_seconds / duration * 100
+            if cpu_seconds is not None and duration > 0
+            else None,
+        }
+
+
+class SimulatedClient:
+    def __init__(self, base_url: str, settings: LoadTestSettings, stats: LoadTestStats):
+        self.base_url = base_url
+        self.settings = settings
+        self.stats = stats
+
+    def timed(self, event: str, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as ex:
+            self.stats.record(event, start, error=f"{type(ex).__name__}: {ex}"[:200])
+            raise
+        self.stats.record(event, start)
+        return result
+
+    def http(self, session, method: str, path: str, **kwargs):
+        response = session.request(
+            method, self.base_url + path, timeout=self.settings.timeout, **kwargs
+        )
+        response.raise_for_status()
+        return response.json()
+
+
+class SimulatedViewer(SimulatedClient):
+    """Seeks to random positions of the media file, like a video player would"""
+
+    def __init__(
+        self,
+        base_url: str,
+        settings: LoadTestSettings,
+        stats: LoadTestStats,
+        seed: int,
+    ):
+        super().__init__(base_url, settings, stats)
+        self.random = random.Random(seed)
+
+    def run(self):
+        import requests
+
+        session = requests.Session()
+        size = self.settings.media_size * 1024 * 1024
+        length = min(self.settings.seek_size * 1024, size)
+        for _ in range(self.settings.seeks):
+            start = self.random.randrange(0, size - length + 1)
+            self.timed("media_seek", self.seek, session, start, length)
+
+    def seek(self, session, start: int, length: int):
+        response = session.get(
+            f"{self.base_url}/www/{MEDIA_FILENAME}",
+            headers={"Range": f"bytes={start}-{start + length - 1}"},
+            timeout=self.settings.timeout,
+        )
+        response.raise_for_status()
+        if response.status_code != 206 or len(response.content) != length:
+            raise ValueError(
+                f"Expected {length} bytes (206), got {len(response.content)} "
+                f"({response.status_code})"
+            )
+
+
+class SimulatedParticipant(SimulatedClient):
+    def __init__(
+        self,
+        base_url: str,
+        journey_id: str,
+        settings: LoadTestSettings,
+        stats: LoadTestStats,
+    ):
+        super().__init__(base_url, settings, stats)
+        self.journey_id = journey_id
+
+    def run(self):
+        import requests
+        import socketio
+
+        settings = self.settings
+        session = requests.Session()
+        journey = self.timed(
+            "get_journey",
+            self.http,
+            session,
+            "GET",
+            f"/api/journeys/{self.journey_id}?with_specs=0",
+        )
+
+        joins = queue.Queue()
+        # send times of the chat messages that were not received back yet
+        self.sent_messages: Dict[str, float] = {}
+        client = socketio.Client(
+            reconnection=False,
+            serializer="msgpack"
+            if settings.socketio_serializer == "msgpack"
+            else "default",
+        )
+        client.on("join", lambda data: joins.put(data))
+        client.on("message", self.on_chat_message, namespace="/chat")
+        self.timed(
+            "connect",
+            client.connect,
+            self.base_url,
+            auth={"journeyId": self.journey_id},
+            namespaces=["/", "/chat"],
+            wait_timeout=settings.timeout,
+        )
+        try:
+            chat_id = journey["chat_id"]
+            self.timed(
+                "join_chat",
+                client.call,
+                "join_chat",
+                {"chatId": chat_id},
+                namespace="/chat",
+                timeout=settings.timeout,
+            )
+            for node in journey["nodes"]:
+                self.run_node(session, client, joins, node["id"], chat_id)
+        finally:
+            client.disconnect()
+
+    def on_chat_message(self, data):
+        start = self.sent_messages.pop(data.get("message"), None)
+        if start is not None:
+            self.stats.record("chat_delivery", start)
+
+    def run_node(self, session, client, joins: queue.Queue, node_id: int, chat_id):
+        settings = self.settings
+
+        def join():
+            client.emit(
+                "join",
+                {
+                    "journeyId": self.journey_id,
+                    "nodeId": node_id,
+                    "useSharedState": False,
+                },
+            )
+            return joins.get(timeout=settings.timeout)
+
+        self.timed("join", join)
+        for i in range(settings.states):
+            self.timed(
+                "state",
+                client.call,
+                "state",
+                {"nodeId": node_id, "state": {"counter": i}},
+                timeout=settings.timeout,
+            )
+        for i in range(settings.actions):
+            self.timed(
+                "action",
+                client.call,
+                "action",
+                {"nodeId": node_id, "action": {"type": "loadtest/action", "i": i}},
+                timeout=settings.timeout,
+            )
+        for i in range(settings.messages):
+            message = f"load test message {self.journey_id[:8]} {node_id} {i}"
+            self.sent_messages[message] = time.perf_counter()
+            self.timed(
+                "chat",
+                client.call,
+                "message",
+                {"chatId": chat_id, "message": message},
+                namespace="/chat",
+                timeout=settings.timeout,
+            )
+        self.timed(
+            "submit",
+            self.http,
+            session,
+            "POST",
+            f"/api/nodes/{node_id}/submit",
+            json={"state": {"counter": settings.states}},
+        )
+
+
+def get_server_log_tail(folder: str, lines: int = 40) -> str:
+    try:
+        with open(os.path.join(folder, "server.log")) as f:
+            return "".join(f.readlines()[-lines:])
+    except OSError:
+        return ""
+
+
+def wait_for_server(base_url: str, folder: str, process, timeout: float = 60):
+    """Waits until the server answers. The errors raised when it exits or does not
+    start in time include the end of its log, as the folder is then deleted.
+    """
+    import requests
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(
+                f"The server exited with code {process.returncode}. "
+                f"End of its log:\n{get_server_log_tail(folder)}"
+            )
+        if os.path.exists(os.path.join(folder, JOURNEYS_FILENAME)):
+            try:
+                requests.get(base_url + "/", timeout=1)
+                return
+            except (requests.ConnectionError, requests.Timeout):
+                pass
+        time.sleep(0.2)
+    raise TimeoutError(
+        "The server did not start in time. "
+        f"End of its log:\n{get_server_log_tail(folder)}"
+    )
+
+
+def stop_server(process, timeout: float = 10):
+    """Terminates the server, and kills it if it did not exit within timeout"""
+    # polled: with eventlet's monkey patching, process.wait(timeout) raises a
+    # TimeoutExpired that is not subprocess.TimeoutExpired
+    process.terminate()
+    deadline = time.time() + timeout
+    while process.poll() is None and time.time() < deadline:
+        time.sleep(0.1)
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+
+
+def run_loadtest(settings: LoadTestSettings) -> Dict:
+    """Runs the load test and returns its report"""
+    try:
+        import websocket  # noqa: F401
+    except ImportError:
+        # the socketio clients would silently fall back to long-polling
+        raise RuntimeError(
+            "The load test requires websocket-client. Install the development "
+            'dependencies: pip install -e ".[dev]"'
+        )
+    if settings.socketio_serializer == "msgpack":
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            # the server would fall back to JSON packets, which the clients can't read
+            raise RuntimeError(
+                "The msgpack packet format requires msgpack. Install the "
+                'serialization dependencies: pip install -e ".[serialization]"'
+            )
+
+    base_url = f"http://127.0.0.1:{settings.port}"
+    with tempfile.TemporaryDirectory(prefix="covfee-loadtest-") as folder:
+        # read by the server (local mode) from its working directory
+        with open(os.path.join(folder, "covfee.local.config.py"), "w") as f:
+            if settings.session_backend is not None:
+                f.write(f"SESSION_BACKEND = {settings.session_backend!r}\n")
+            # the packet format is server-wide: the clients must use the same
+            f.write(f"SOCKETIO_SERIALIZER = {settings.socketio_serializer!r}\n")
+        if settings.viewers > 0:
+            write_media_file(folder, settings.media_size)
+        with open(os.path.join(folder, "server.log"), "w") as log:
+            process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "covfee.cli.loadtest",
+                    folder,
+                    str(settings.port),
+                    str(settings.participants),
+                    str(settings.nodes),
+                    str(settings.restarts),
+                    settings.server,
+                ],
+                cwd=folder,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+        try:
+            wait_for_server(base_url, folder, process)
+            with open(os.path.join(folder, JOURNEYS_FILENAME)) as f:
+                journey_ids = json.load(f)
+
+            with open(os.path.join(folder, SERVER_PID_FILENAME)) as f:
+                server_pid = int(f.read())
+
+            stats = LoadTestStats()
+            monitor = ProcessMonitor(server_pid)
+
+            def run_participant(index: int, journey_id: str) -> Optional[str]:
+                """Returns the name of the exception the participant failed with"""
+                time.sleep(settings.ramp_up * index / max(1, len(journey_ids)))
+                try:
+                    SimulatedParticipant(base_url, journey_id, settings, stats).run()
+                except Exception as ex:
+                    return type(ex).__name__
+                return None
+
+            def run_viewer(index: int) -> Optional[str]:
+                """Returns the name of the exception the viewer failed with"""
+                time.sleep(settings.ramp_up * index / max(1, settings.viewers))
+                try:
+                    SimulatedViewer(base_url, settings, stats, seed=index).run()
+                except Exception as ex:
+                    return type(ex).__name__
+                return None
+
+            monitor.start()
+            start = time.perf_counter()
+            workers = len(journey_ids) + settings.viewers
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                futures = [
+                    executor.submit(run_participant, index, journey_id)
+                    for index, journey_id in enumerate(journey_ids)
+                ]
+                viewer_futures = [
+                    executor.submit(run_viewer, index)
+                    for index in range(settings.viewers)
+                ]
+            duration = time.perf_counter() - start
+            # counted here rather than in the participants' threads
+            failed_participants = Counter(
+                future.result() for future in futures if future.result() is not None
+            )
+            failed_viewers = Counter(
+                future.result()
+                for future in viewer_futures
+                if future.result() is not None
+            )
+            monitor.stop()
+        finally:
+            stop_server(process)
+
+    events = stats.get_summary(duration)
+    total_requests = sum(e["count"] for e in events.values())
+    total_errors = sum(e["errors"] for e in events.values())
+    seeks = len(stats.latencies.get("media_seek", []))
+    return {
+        "settings": settings._asdict(),
+        "duration_s": duration,
+        "participants_failed": sum(failed_participants.values()),
+        "participant_failures": dict(failed_participants),
+        "viewers_failed": sum(failed_viewers.values()),
+        "viewer_failures": dict(failed_viewers),
+        # of the successful seeks
+        "media_mb_per_s": seeks * settings.seek_size / 1024 / duration
+        if duration > 0
+        else 0,
+        "throughput": total_requests / duration if duration > 0 else 0,
+        "error_rate": total_errors / total_requests if total_requests > 0 else 0,
+        "events": events,
+        "server": monitor.get_summary(duration),
+    }
+
+
+def format_report(report: Dict, baseline: Optional[Dict] = None) -> str:
+    """Human-readable summary of a report, compared to a baseline report if given"""
+
+    def delta(value, base_value):
+        if base_value is None or not base_value:
+            return ""
+        return f" ({(value - base_value) / base_value * 100:+.1f}%)"
+
+    base_events = baseline["events"] if baseline is not None else {}
+    lines = [
+        f"duration: {report['duration_s']:.2f}s, "
+        f"throughput: {report['throughput']:.1f} req/s"
+        + delta(report["throughput"], baseline and baseline["throughput"]),
+        f"error rate: {report['error_rate'] * 100:.2f}%, "
+        f"failed participants: {report['participants_failed']}",
+    ]
+    if report["settings"]["viewers"] > 0:
+        base_media = baseline.get("media_mb_per_s") if baseline is not None else None
+        lines.append(
+            f"media: {report['media_mb_per_s']:.1f}MB/s"
+            + delta(report["media_mb_per_s"], base_media)
+            + f", failed viewers: {report['viewers_failed']}"
+        )
+    for event, summary in report["events"].items():
+        base = base_events.get(event, {})
+        p50, p99 = summary["p50_ms"], summary["p99_ms"]
+        lines.append(
+            f"{event:>13}: n={summary['count']:<6} "
+            f"rate={summary['throughput']:.1f}/s "
+            f"p50={p50:.1f}ms{delta(p50, base.get('p50_ms'))} "
+            f"p99={p99:.1f}ms{delta(p99, base.get('p99_ms'))} "
+            f"errors={summary['errors']}"
+        )
+    server = report["server"]
+    if server["max_rss_mb"] is not None:
+        lines.append(
+            f"server: max rss {server['max_rss_mb']:.1f}MB, "
+            f"cpu {server['cpu_seconds']:.2f}s ({server['cpu_percent']:.0f}%)"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # server subprocess: folder port participants nodes restarts server
+    serve(sys.argv[1], *[int(arg) for arg in sys.argv[2:6]], server=sys.argv[6])
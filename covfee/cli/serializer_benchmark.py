@@ -0,0 +1,120 @@
+"""Benchmark of the serialization of rows (Base.to_dict).
+
+Base.to_dict converts the columns of a row with serializers built once per model,
+where it used to walk the table columns of the model and convert each value with
+utils.to_dict. Both are timed on the rows of every model of the load test's
+synthetic project (in an in-memory database), with chat messages and responses
+added. Used by the covfee-dev serializer-benchmark command.
+"""
+
+import tempfile
+import time
+from typing import Dict
+
+
+def reflective_to_dict(instance) -> Dict:
+    """to_dict as Base.to_dict was before the serializers, without the deferred
+    columns that it now leaves out
+    """
+    from covfee.server.orm import utils
+    from covfee.server.orm.deferred import get_deferred_keys
+
+    deferred = get_deferred_keys(type(instance))
+    return {
+        c.name: utils.to_dict(getattr(instance, c.name))
+        for c in instance.__table__.columns
+        if c.key not in deferred
+    }
+
+
+def add_sample_rows(session, rows: int = 2):
+    """Adds rows of the models that the synthetic project has none of"""
+    from covfee.server.orm import (
+        Annotator,
+        Chat,
+        ChatMessage,
+        JourneyInstance,
+        TaskResponseStateVersion,
+    )
+    from covfee.server.orm.node import NodeInstanceStatus
+    from covfee.server.orm.task import TaskInstance
+    from covfee.server.tasks.continuous_annotation import Annotation
+
+    for chat in session.query(Chat).limit(rows):
+        chat.messages.append(ChatMessage("test message"))
+    for journey in session.query(JourneyInstance).limit(rows):
+        session.add(Annotator(prolific_id="test", journey_instance=journey))
+    for node in session.query(TaskInstance).limit(rows):
+        response = node.add_response()
+        node.status = NodeInstanceStatus.RUNNING
+        session.add(
+            TaskResponseStateVersion(
+                response=response, version=1, snapshot=True, data={"counter": 1}
+            )
+        )
+        session.add(
+            Annotation(
+                task=node,
+                category="test",
+                participant="test",
+                interface={},
+                data_json=[0, 1],
+            )
+        )
+    session.commit()
+
+
+def run_serializer_benchmark(hits: int, nodes: int, repeat: int) -> Dict:
+    """Times the reflective to_dict and Base.to_dict on the rows of every model of
+    a synthetic project of hits HITs of nodes task nodes.
+    """
+    from covfee.cli.loadtest import make_loadtest_app
+    from covfee.launcher import Launcher
+    from covfee.server.db import create_database_sessionmaker
+    from covfee.server.orm import Base
+
+    with tempfile.TemporaryDirectory(prefix="covfee-serializer-benchmark-") as folder:
+        launcher = Launcher(
+            "dev", make_loadtest_app(hits, nodes), folder, auth_enabled=False
+        )
+        launcher.create_or_update_database(delete_existing_data=True)
+        session_local = create_database_sessionmaker(launcher.engine)
+        with session_local() as session:
+            # as many rows of the other models as of the journeys
+            add_sample_rows(session, hits)
+
+        models = {}
+        with session_local() as session:
+            for mapper in sorted(
+                Base.registry.mappers, key=lambda mapper: mapper.class_.__name__
+            ):
+                rows = session.query(mapper.class_).all()
+                if len(rows) == 0:
+                    continue
+                for row in rows:
+                    # loads the lazy attributes
+                    reflective_to_dict(row)
+
+                def time_per_row(fn) -> float:
+                    start = time.perf_counter()
+                    for _ in range(repeat):
+                        for row in rows:
+                            fn(row)
+                    return (time.perf_counter() - start) / (repeat * len(rows))
+
+                models[mapper.class_.__name__] = {
+                    "rows": len(rows),
+                    "reflective_us": time_per_row(reflective_to_dict) * 1e6,
+                    "serializers_us": time_per_row(Base.to_dict) * 1e6,
+                }
+        launcher.engine.dispose()
+
+    def total(key: str) -> float:
+        return sum(model["rows"] * model[key] for model in models.values()) / 1e6
+
+    return {
+        "models": models,
+        "rows": sum(model["rows"] for model in models.values()),
+        "reflective_s": total("reflective_us"),
+        "serializers_s": total("serializers_us"),
+    }
@@ -0,0 +1,91 @@
+"""Benchmark of the task objects of task nodes.
+
+TaskInstance.get_task_object returns the node's cached task object, where it used
+to look the task class up in covfee.server.tasks and construct a new object on
+every call. Both are timed on the nodes of the load test's synthetic project (in
+an in-memory database), alone and through to_dict and set_status, which use the
+task object. Used by the covfee-dev task-benchmark command.
+"""
+
+import logging
+import tempfile
+import time
+from typing import Dict
+
+
+def make_uncached_task_object(node):
+    """Task object as get_task_object made them before the cache"""
+    from sqlalchemy.orm import object_session
+
+    from covfee.server import tasks
+    from covfee.server.tasks.base import BaseCovfeeTask
+
+    task_class = getattr(tasks, node.spec.spec["type"], BaseCovfeeTask)
+    return task_class(task=node, session=object_session(node))
+
+
+def run_task_benchmark(nodes: int, repeat: int) -> Dict:
+    """Times the task objects of the nodes of the synthetic project, uncached and
+    cached, and the to_dict and status transitions of the nodes using them.
+    """
+    from covfee.cli.loadtest import make_loadtest_app
+    from covfee.launcher import Launcher
+    from covfee.server.app import create_app_and_socketio
+    from covfee.server.db import create_database_sessionmaker
+    from covfee.server.orm.node import NodeInstanceStatus
+    from covfee.server.orm.task import TaskInstance
+
+    with tempfile.TemporaryDirectory(prefix="covfee-task-benchmark-") as folder:
+        launcher = Launcher(
+            "dev", make_loadtest_app(nodes, 1), folder, auth_enabled=False
+        )
+        launcher.create_or_update_database(delete_existing_data=True)
+        session_local = create_database_sessionmaker(launcher.engine)
+
+        # to_dict makes urls
+        _, app = create_app_and_socketio("dev", session_local)
+        with app.app_context(), session_local() as session:
+            task_nodes = session.query(TaskInstance).all()
+            for node in task_nodes:
+                # loads the lazy attributes and fills the cache
+                node.to_dict()
+
+            def time_per_call(fn) -> float:
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    for node in task_nodes:
+                        fn(node)
+                return (time.perf_counter() - start) / (repeat * len(task_nodes))
+
+            def uncached_to_dict(node):
+                node.invalidate_task_object()
+                return node.to_dict()
+
+            def toggle_status(node):
+                # RUNNING <-> PAUSED, each calling a task object event handler
+                if node.status == NodeInstanceStatus.RUNNING:
+                    node.set_status(NodeInstanceStatus.PAUSED)
+                else:
+                    node.set_status(NodeInstanceStatus.RUNNING)
+
+            def uncached_toggle_status(node):
+                node.invalidate_task_object()
+                toggle_status(node)
+
+            # the event handlers of the task objects log every call
+            logging.disable(logging.INFO)
+            try:
+                report = {
+                    "nodes": len(task_nodes),
+                    "uncached_us": time_per_call(make_uncached_task_object) * 1e6,
+                    "cached_us": time_per_call(TaskInstance.get_task_object) * 1e6,
+                    "uncached_to_dict_us": time_per_call(uncached_to_dict) * 1e6,
+                    "cached_to_dict_us": time_per_call(TaskInstance.to_dict) * 1e6,
+                    "uncached_set_status_us": time_per_call(uncached_toggle_status)
+                    * 1e6,
+                    "cached_set_status_us": time_per_call(toggle_status) * 1e6,
+                }
+            finally:
+                logging.disable(logging.NOTSET)
+        launcher.engine.dispose()
+    return report
@@ -1,5 +1,7 @@
 import os
+import sys
 from pathlib import Path
+from typing import Optional
 import contextlib
 from shutil import which
 
@@ -28,3 +30,14 @@ def working_directory(path):
         yield
     finally:
         os.chdir(prev_cwd)
+
+
+def get_peak_memory_mb() -> Optional[float]:
+    """Returns the peak resident memory of the current process in MB, if available"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return max_rss / 2**20 if sys.platform == "darwin" else max_rss / 2**10
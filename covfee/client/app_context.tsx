@@ -6,7 +6,7 @@ import {
   State as StateResponse,
 } from "../server/socketio/types"
 import { UserContextMethods, UserState } from "./app_provider"
-import { Chat, ChatMessage } from "./types/chat"
+import { Chat, ChatMessage, ChatSummary } from "./types/chat"
 import {
   JourneyAssoc,
   ManualStatus,
@@ -92,12 +92,19 @@ export interface ClientToServerEvents {
 export interface ChatServerToClientEvents {
   message: (msg: ChatMessage) => void
   chat_update: (chat: Partial<Chat>) => void
+  chat_summary: (summary: ChatSummary) => void
+  chat_summaries: (summaries: ChatSummary[]) => void
 }
 
 export interface ChatClientToServerEvents {
   message: (arg0: { message: string; chatId: number }) => void
   read: (arg0: { chatId: number; journeyId?: string }) => void
   join_chat: (arg0: { chatId: number }) => void
+  summaries: (arg0: {
+    chatIds?: number[]
+    after?: number
+    limit?: number
+  }) => void
 }
 
 export type MainSocket = Socket<ServerToClientEvents, ClientToServerEvents>
@@ -2,6 +2,7 @@ import * as React from "react"
 import { appContext } from "./app_context"
 import Constants from "Constants"
 import { io } from "socket.io-client"
+import msgpackParser from "socket.io-msgpack-parser"
 import {
   log,
   fetcher,
@@ -41,19 +42,26 @@ export const AppProvider: React.FC<Props> = (props) => {
     ...props,
   }
 
+  // packet format of the server (SOCKETIO_SERIALIZER)
+  const ioOptions =
+    Constants.socketio_serializer === "msgpack" ? { parser: msgpackParser } : {}
+
   const getSocket = () => {
     if (args.admin) {
       console.log("IO: connect: /admin")
-      return io("/admin")
+      return io("/admin", ioOptions)
     } else {
       if (routeParams.journeyId) {
         console.log("IO: connect", {
           auth: { journeyId: routeParams.journeyId },
         })
-        return io({ auth: { journeyId: routeParams.journeyId } })
+        return io({
+          ...ioOptions,
+          auth: { journeyId: routeParams.journeyId },
+        })
       } else {
         console.log("IO: connect", {})
-        return io()
+        return io(ioOptions)
       }
     }
   }
@@ -61,10 +69,10 @@ export const AppProvider: React.FC<Props> = (props) => {
   const getChocket = () => {
     if (args.admin) {
       console.log("IO: connect: /admin_chat")
-      return io("/admin_chat")
+      return io("/admin_chat", ioOptions)
     } else {
       console.log("IO: connect: /chat")
-      return io("/chat")
+      return io("/chat", ioOptions)
     }
   }
 
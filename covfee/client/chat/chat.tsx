@@ -165,7 +165,8 @@ export const Chatbox: React.FC<ChatboxProps> = (props) => {
     ...props,
   }
 
-  const { emitMessage, getChatMessages } = React.useContext(chatContext)
+  const { emitMessage, getChatMessages, hasOlderMessages, loadOlderMessages } =
+    React.useContext(chatContext)
   const textareaRef = React.useRef<HTMLTextAreaElement>(null)
 
   const messages = getChatMessages(props.chat.id)
@@ -174,6 +175,13 @@ export const Chatbox: React.FC<ChatboxProps> = (props) => {
     <ChatboxContainer>
       {messages.length ? (
         <ul>
+          {hasOlderMessages(props.chat.id) && (
+            <li className="older">
+              <button onClick={() => loadOlderMessages(props.chat.id)}>
+                Load older messages
+              </button>
+            </li>
+          )}
           {messages.map((message, index) => (
             <li key={index}>
               <span>{message.message}</span>
@@ -227,6 +235,10 @@ const ChatboxContainer = styled.div<any>`
     background-color: rgba(255, 255, 255, 0.5);
     border-radius: 5px;
   }
+  > ul > li.older {
+    text-align: center;
+    background-color: transparent;
+  }
   > ul > li > .date {
     display: block;
     text-align: right;
@@ -1,10 +1,25 @@
 import * as React from "react"
-import { ApiChat, Chat, ChatMessage, IoChatMessage } from "../types/chat"
+import {
+  ApiChat,
+  Chat,
+  ChatMessage,
+  ChatSummary,
+  IoChatMessage,
+} from "../types/chat"
 import { fetcher, throwBadResponse } from "../utils"
 import Constants from "Constants"
 import { ChatSocket, appContext } from "../app_context"
 import type { ChatClientToServerEvents } from "../app_context"
 
+/**
+ * Number of messages fetched at a time by the admin, who can see every chat
+ */
+const MESSAGES_PAGE_SIZE = 50
+/**
+ * Number of chat summaries requested at a time by the admin
+ */
+const SUMMARIES_PAGE_SIZE = 100
+
 type Props = {
   /**
    * Current journeyId, if any. Used to calculate eg. number of unread messages
@@ -32,6 +47,8 @@ export const useChats = ({
 }: Props) => {
   const { chocket } = React.useContext(appContext)
   const [init, setInit] = React.useState<boolean>(true)
+  // the admin loads pages of messages, and gets unread counts from the server
+  const isAdmin = journeyId === undefined
 
   // Stores chat ids currently being fetched from server
   const [chatIdsBeingFetched, setChatIdsBeingFetched] = React.useState<
@@ -54,6 +71,10 @@ export const useChats = ({
   const [messages, setMessages] = React.useState<Record<string, ChatMessage>>(
     {}
   )
+  // chats with older messages than those loaded, mapping chat_id => boolean
+  const [hasOlderMessages, setHasOlderMessages] = React.useState<
+    Record<string, boolean>
+  >({})
 
   const [chatOpen, setChatOpen] = React.useState(initialChatOpen)
   const [activeChatId, setActiveChatId] = React.useState(0)
@@ -137,7 +158,8 @@ export const useChats = ({
 
       setChatIdsBeingFetched((s) => new Set([...s, ...idsToAdd]))
 
-      return getChats(idsToAdd).then((res) => {
+      const messagesLimit = isAdmin ? MESSAGES_PAGE_SIZE : undefined
+      return getChats(idsToAdd, messagesLimit).then((res) => {
         console.log(res)
         const newChats: Record<string, Chat> = Object.fromEntries(
           res.map((chat) => [
@@ -171,6 +193,16 @@ export const useChats = ({
           ...messages,
           ...newMessages,
         }))
+        setHasOlderMessages((hasOlder) => ({
+          ...hasOlder,
+          ...Object.fromEntries(
+            res.map((chat) => [
+              chat.id,
+              messagesLimit !== undefined &&
+                chat.messages.length === messagesLimit,
+            ])
+          ),
+        }))
 
         idsToAdd.forEach((chat_id) => {
           console.log(`IO: join_chat ${chat_id}`)
@@ -178,7 +210,33 @@ export const useChats = ({
         })
       })
     },
-    [chocket, addChatListeners, chats, chatIdsBeingFetched]
+    [chocket, addChatListeners, chats, chatIdsBeingFetched, isAdmin]
+  )
+
+  /**
+   * Fetches the page of messages preceding the oldest loaded message of a chat
+   */
+  const loadOlderMessages = React.useCallback(
+    (chatId: number) => {
+      const loadedIds = Object.values(messages)
+        .filter((message) => message.chat_id == chatId)
+        .map((message) => message.id)
+      const before = loadedIds.length ? Math.min(...loadedIds) : undefined
+
+      return getChatMessagesPage(chatId, before, MESSAGES_PAGE_SIZE).then(
+        (res) => {
+          setMessages((messages) => ({
+            ...Object.fromEntries(res.map((message) => [message.id, message])),
+            ...messages,
+          }))
+          setHasOlderMessages((hasOlder) => ({
+            ...hasOlder,
+            [chatId]: res.length === MESSAGES_PAGE_SIZE,
+          }))
+        }
+      )
+    },
+    [messages]
   )
 
   type ChatFilterFn = (arg0: Chat) => boolean
@@ -259,7 +317,9 @@ export const useChats = ({
   }, [journeyToReadBy])
 
   // Journey unread counts
+  // (the admin's are sent by the server, as only pages of messages are loaded)
   React.useEffect(() => {
+    if (isAdmin) return
     if (journeyToReadBy === null || Object.keys(journeyToReadBy).length === 0)
       return
     // mapping chat_id -> count of unread messages
@@ -272,28 +332,24 @@ export const useChats = ({
     console.log(journeyToReadBy)
     console.log(messages)
 
-    if (journeyId !== undefined) {
-      Object.values(messages).forEach((msg) => {
-        const chatReadBy = journeyToReadBy[msg.chat_id][journeyId]
+    Object.values(messages).forEach((msg) => {
+      const chatReadBy = journeyToReadBy[msg.chat_id][journeyId]
 
-        if (!chatReadBy || chatReadBy < new Date(msg.created_at)) {
-          unreadCounts[msg.chat_id] += 1
-        }
-      })
-    } else {
-      // calculate admin unreadCounts
-      Object.values(messages).forEach((msg) => {
-        const chatReadBy = new Date(chats[msg.chat_id].read_by_admin_at)
-
-        if (!chatReadBy || chatReadBy < new Date(msg.created_at)) {
-          unreadCounts[msg.chat_id] += 1
-        }
-      })
-    }
+      if (!chatReadBy || chatReadBy < new Date(msg.created_at)) {
+        unreadCounts[msg.chat_id] += 1
+      }
+    })
 
     console.log(unreadCounts)
     setUnreadCounts(unreadCounts)
-  }, [journeyId, journeyToReadBy, chats, messages])
+  }, [isAdmin, journeyId, journeyToReadBy, chats, messages])
+
+  // Admin unread counts, from the chat summaries
+  React.useEffect(() => {
+    if (!isAdmin || !chocket) return
+    console.log("IO: summaries")
+    chocket.emit("summaries", { limit: SUMMARIES_PAGE_SIZE })
+  }, [isAdmin, chocket])
 
   React.useEffect(() => {
     setTotalUnreadMessages(() =>
@@ -309,6 +365,12 @@ export const useChats = ({
       chocket.removeAllListeners("message")
       chocket.on("message", (message: IoChatMessage) => {
         console.log(`IO: message: ${message}`)
+        if (isAdmin) {
+          setUnreadCounts((counts) => ({
+            ...counts,
+            [message.chat_id]: (counts[message.chat_id] || 0) + 1,
+          }))
+        }
         if (message.chat_id in chats) {
           // if the chat is open
           setMessages((messages) => ({
@@ -331,13 +393,74 @@ export const useChats = ({
         console.log(`IO: chat_update: ${partialChat}`)
         setChatData(partialChat.id, (chat) => ({ ...chat, ...partialChat }))
       })
+
+      if (isAdmin) {
+        const isListened = (chatId: number) =>
+          chatIdsToListen.size === 0 || chatIdsToListen.has(chatId)
+        const setSummaries = (summaries: ChatSummary[]) => {
+          // the read dates of the loaded chats
+          setChats((chats) => {
+            const updated = { ...chats }
+            summaries
+              .filter((summary) => summary.id in chats)
+              .forEach((summary) => {
+                const chat = chats[summary.id]
+                updated[summary.id] = {
+                  ...chat,
+                  read_by_admin_at: summary.read_by_admin_at,
+                  assocs: chat.assocs.map((assoc) => ({
+                    ...assoc,
+                    read_at:
+                      summary.read_at_by_journey[assoc.journeyinstance_id] ??
+                      assoc.read_at,
+                  })),
+                }
+              })
+            return updated
+          })
+          setUnreadCounts((counts) => ({
+            ...counts,
+            ...Object.fromEntries(
+              summaries.map((summary) => [summary.id, summary.unread_by_admin])
+            ),
+          }))
+          // chats with unread messages are loaded, as if a message was received
+          addChats(
+            summaries
+              .filter((summary) => summary.unread_by_admin > 0)
+              .map((summary) => summary.id)
+              .filter(isListened)
+          )
+        }
+
+        chocket.removeAllListeners("chat_summaries")
+        chocket.on("chat_summaries", (summaries: ChatSummary[]) => {
+          console.log(`IO: chat_summaries: ${summaries.length}`)
+          setSummaries(summaries)
+          // the summaries of every chat are requested page by page
+          if (summaries.length === SUMMARIES_PAGE_SIZE) {
+            chocket.emit("summaries", {
+              after: Math.max(...summaries.map((summary) => summary.id)),
+              limit: SUMMARIES_PAGE_SIZE,
+            })
+          }
+        })
+
+        chocket.removeAllListeners("chat_summary")
+        chocket.on("chat_summary", (summary: ChatSummary) => {
+          console.log(`IO: chat_summary: ${summary.id}`)
+          setSummaries([summary])
+        })
+      }
     }
-  }, [addChats, chatIdsToListen, chats, chocket])
+  }, [addChats, chatIdsToListen, chats, chocket, isAdmin])
 
   return {
     chats: Object.values(chats),
     chatIds: Object.keys(chats),
     getChatMessages,
+    hasOlderMessages: (chatId: number) => !!hasOlderMessages[chatId],
+    loadOlderMessages,
     addChatListeners,
     clearChatListeners,
     hasChat,
@@ -360,9 +483,35 @@ export const useChats = ({
 
 export type UseChats = ReturnType<typeof useChats>
 
-export async function getChats(chat_ids: number[]): Promise<ApiChat[]> {
+export async function getChats(
+  chat_ids: number[],
+  messagesLimit?: number
+): Promise<ApiChat[]> {
   console.log(`FETCH: chats ${chat_ids}`)
-  const url = Constants.api_url + "/chats/" + chat_ids.join(",")
+  let url = Constants.api_url + "/chats/" + chat_ids.join(",")
+  if (messagesLimit !== undefined) {
+    url +=
+      "?" + new URLSearchParams({ messages_limit: messagesLimit.toString() })
+  }
+
+  return await fetcher(url).then(throwBadResponse)
+}
+
+/**
+ * Fetches the most recent messages of a chat with an id lower than before
+ */
+export async function getChatMessagesPage(
+  chatId: number,
+  before: number | undefined,
+  limit: number
+): Promise<ChatMessage[]> {
+  console.log(`FETCH: chat ${chatId} messages before ${before}`)
+  const params: Record<string, string> = { limit: limit.toString() }
+  if (before !== undefined) params.before = before.toString()
+  const url =
+    Constants.api_url +
+    `/chats/${chatId}/messages?` +
+    new URLSearchParams(params)
 
   return await fetcher(url).then(throwBadResponse)
 }
@@ -5,6 +5,7 @@ import download from "downloadjs"
 import { JourneyType as ReducedJourney } from "../types/hit"
 import { JourneyType as FullJourney } from "../types/journey"
 import { fetcher, myerror, myinfo, throwBadResponse } from "../utils"
+import { withNodeSpec } from "./Node"
 
 type JourneyType = FullJourney | ReducedJourney
 
@@ -70,9 +71,16 @@ export const fetchJourney = (id: string) => {
     "?" +
     new URLSearchParams({
       with_nodes: "1",
+      // the node specs are fetched from their (cacheable) spec_url
+      with_specs: "0",
     })
 
-  return fetcher(url).then(throwBadResponse)
+  return fetcher(url)
+    .then(throwBadResponse)
+    .then(async (journey) => ({
+      ...journey,
+      nodes: await Promise.all(journey.nodes.map(withNodeSpec)),
+    }))
 }
 
 export const submitJourney = (id: string) => {
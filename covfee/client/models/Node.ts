@@ -218,8 +218,41 @@ export function useNode(data: NodeType, socket: MainSocket = null) {
   }
 }
 
+// node specs are immutable and served with long-lived cache headers. Each spec is
+// requested once, even when shared by several nodes
+const nodeSpecRequests = new Map<string, Promise<any>>()
+
+export const fetchNodeSpec = (specUrl: string) => {
+  if (!nodeSpecRequests.has(specUrl)) {
+    const request = fetcher(specUrl)
+      .then(throwBadResponse)
+      .catch((error) => {
+        nodeSpecRequests.delete(specUrl)
+        throw error
+      })
+    nodeSpecRequests.set(specUrl, request)
+  }
+  return nodeSpecRequests.get(specUrl)
+}
+
+/**
+ * Merges its spec into a node fetched without it (with_spec=0), like the server
+ * does: the node's own properties take precedence.
+ */
+export const withNodeSpec = async <T extends { spec_url: string }>(node: T) => {
+  const spec = await fetchNodeSpec(node.spec_url)
+  return { ...spec, ...node }
+}
+
 export const fetchNode = (id: number) => {
-  const url = Constants.api_url + "/nodes/" + id
+  const url =
+    Constants.api_url +
+    "/nodes/" +
+    id +
+    "?" +
+    new URLSearchParams({
+      with_spec: "0",
+    })
 
-  return fetcher(url).then(throwBadResponse)
+  return fetcher(url).then(throwBadResponse).then(withNodeSpec)
 }
@@ -27,3 +27,25 @@ export type ApiChat = {
 }
 
 export type Chat = Omit<ApiChat, "messages">
+
+/**
+ * Chat without its messages, with the unread counts computed by the server
+ */
+export type ChatSummary = {
+  id: number
+  node_id: number | null
+  journey_id: string | null
+  read_by_admin_at: string | null
+  num_messages: number
+  last_message_id: number | null
+  last_message_at: string | null
+  unread_by_admin: number
+  /**
+   * maps journeyId -> number of messages unread by the journey
+   */
+  unread_by_journey: Record<string, number>
+  /**
+   * maps journeyId -> date the journey last read the chat
+   */
+  read_at_by_journey: Record<string, string | null>
+}
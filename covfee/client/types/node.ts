@@ -36,6 +36,11 @@ export interface NodeType extends AllPropsRequired<BaseNodeSpec> {
    */
   chat_id: number
   url: string
+  /**
+   * URL of the (immutable, cacheable) node spec, and its content hash
+   */
+  spec_url: string
+  spec_hash: string
   type: "TaskInstance" | "NodeInstance"
   /**
    * Task-specific arguments
@@ -0,0 +1,2 @@
+// the package has no type declarations
+declare module "socket.io-msgpack-parser"
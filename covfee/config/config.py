@@ -83,6 +83,7 @@ class Config(flask.Config):
             "base_url": self["BASE_URL"],
             "api_url": self["API_URL"],
             "auth_url": self["AUTH_URL"],
+            "socketio_serializer": self["SOCKETIO_SERIALIZER"],
             "admin": {
                 "unsafe_mode_on": self.get("UNSAFE_MODE_ON", False),
                 "home_url": self["ADMIN_URL"],
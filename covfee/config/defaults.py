@@ -25,13 +25,47 @@ COVFEE_SHARED_PATH = os.path.join(COVFEE_BASE_PATH, "shared")
 # for storing the json schemata for validation
 SCHEMATA_PATH = os.path.join(COVFEE_BASE_PATH, "shared", "schemata.json")
 DATACLASSES_PATH = os.path.join(COVFEE_BASE_PATH, "shared", "task_dataclasses.py")
+# cache of files derived from the schemata (eg. validation schemas)
+SCHEMATA_CACHE_PATH = os.path.join(COVFEE_BASE_PATH, "shared", ".schemata_cache")
+
+# project spec validator: "python" (in-process jsonschema) or "ajv" (nodejs service)
+SCHEMA_VALIDATOR = "python"
+# number of worker processes used by the python validator to validate HITs
+VALIDATOR_WORKERS = os.cpu_count() or 1
+# number of HITs from a JSON project file validated and parsed together
+LOADER_CHUNK_SIZE = 100
+# number of HITs added to the database session between flushes
+LOADER_BATCH_SIZE = 1000
 
 # Configure application to store JWTs in cookies. Whenever you make
 # a request to a protected endpoint, you will need to send in the
 # access or refresh JWT via a cookie.
 JWT_TOKEN_LOCATION = ["cookies"]
 JWT_COOKIE_CSRF_PROTECT = False
-
+# seconds for which the users of JWT identities are cached (0 disables the cache).
+# Changes to users committed by the server invalidate them immediately.
+AUTH_PRINCIPAL_CACHE_TTL = 30
+AUTH_PRINCIPAL_CACHE_SIZE = 1024
+# maximum number of password hashes (logins) computed at the same time
+PASSWORD_HASH_CONCURRENCY = 2
+
+
+# maximum import time of the CLI modules, checked by covfee-dev importtime
+IMPORT_TIME_BUDGET_MS = 1000
+
+# LOGGING
+# level of the covfee server logs
+LOG_LEVEL = "INFO"
+# levels of specific loggers, by module name (eg. "covfee.server.socketio.handlers")
+LOG_LEVELS = {"apscheduler": "WARNING"}
+# high-volume events of which only 1 in N are logged
+LOG_SAMPLING = {"socketio.state": 100, "socketio.action": 100}
+# formats and writes the server logs from a native thread, fed through a queue
+LOG_QUEUE = True
+
+# records server metrics (event latencies, commit times, etc.), exposed to admins
+# at /metrics in the prometheus text format
+METRICS_ENABLED = False
 
 # dev mode setting
 WEBPACK_DEVSERVER_HOST = "localhost"
@@ -46,9 +80,74 @@ DATABASE_PATH = os.path.join(os.getcwd(), DATABASE_RELPATH)
 # project www and bundle location
 PROJECT_WWW_PATH = os.path.join(os.getcwd(), "www")
 
+# server-side sessions: "memory" (single server process), "sqlite" (shared by
+# multiple server processes) or "filesystem" (Flask-Session)
+SESSION_BACKEND = "memory"
+# seconds after their last modification after which sessions expire
+SESSION_LIFETIME = 24 * 3600
+# seconds between removals of the expired sessions
+SESSION_SWEEP_INTERVAL = 600
+# maximum number of sessions kept by the memory backend (the least recently used
+# are dropped)
+SESSION_MEMORY_MAX_ENTRIES = 10000
+SESSION_SQLITE_PATH = os.path.join(os.getcwd(), ".covfee", "sessions.db")
+
+# versioned history of the response states, stored as JSON patches against a full
+# snapshot of the state every STATE_HISTORY_SNAPSHOT_INTERVAL versions
+STATE_HISTORY_ENABLED = False
+STATE_HISTORY_SNAPSHOT_INTERVAL = 50
+# every STATE_HISTORY_COMPACT_INTERVAL seconds (None disables it), the versions older
+# than STATE_HISTORY_COMPACT_AGE seconds are thinned to one every
+# STATE_HISTORY_COMPACT_KEEP_EVERY versions
+STATE_HISTORY_COMPACT_INTERVAL = 3600
+STATE_HISTORY_COMPACT_AGE = 7 * 24 * 3600
+STATE_HISTORY_COMPACT_KEEP_EVERY = 10
+
+# JSON columns of type CompressedJSON (response states, specs, annotations...) are
+# compressed once their serialized size reaches JSON_COMPRESSION_MIN_SIZE bytes.
+# JSON_COMPRESSION_CODEC: "zstd" (if the zstandard package, in the serialization
+# extra, is installed, otherwise zlib is used) or "zlib"
+JSON_COMPRESSION_MIN_SIZE = 4096
+JSON_COMPRESSION_CODEC = "zstd"
+JSON_COMPRESSION_LEVEL = 3
+
+# JSON library of the REST API and Socket.IO: "orjson" (used if the
+# orjson package is installed) or "json"
+JSON_BACKEND = "orjson"
+# Socket.IO packet format: "json" or "msgpack" (requires the msgpack package).
+# It is server-wide, not negotiated per connection: with "msgpack", every Socket.IO
+# client must use the msgpack parser. The frontend gets the format from the server
+# (pages opened before a change must be reloaded), but other clients, such as
+# scripts using the default parser of their Socket.IO library, can no longer
+# connect
+SOCKETIO_SERIALIZER = "json"
+
 # enables the www server
 SERVE_WWW = True
 
+# seconds during which the www files and the unhashed bundles are cached by browsers
+# before being revalidated. 0 revalidates them on every use (cheap 304 responses)
+WWW_CACHE_MAX_AGE = 0
+# content-hashed bundles (see covfee-dev build) never change and are cached for a year
+BUNDLES_IMMUTABLE_MAX_AGE = 31536000
+# smallest file (bytes) for which precompressed gzip/brotli variants are built
+STATIC_COMPRESSION_MIN_SIZE = 1024
+
+# how audio and video files in www are sent:
+# - None: by covfee, through the server's file_wrapper if any (sendfile in gunicorn).
+#   The embedded eventlet server of covfee start has no file_wrapper: the files are
+#   read and sent in blocks of MEDIA_BLOCK_SIZE, without zero-copy
+# - "x-sendfile": handed off to the reverse proxy with X-Sendfile (apache, lighttpd)
+# - "x-accel-redirect": handed off to nginx with X-Accel-Redirect. The www folder must
+#   be exposed as an internal nginx location at MEDIA_ACCEL_REDIRECT_PREFIX
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_PREFIX = "/_covfee_www/"
+# seconds during which the metadata (size, mtime) of a media file is reused
+MEDIA_METADATA_TTL = 5
+MEDIA_METADATA_CACHE_SIZE = 1024
+# size (bytes) of the blocks in which media files are streamed by covfee
+MEDIA_BLOCK_SIZE = 256 * 1024
+
 DEFAULT_ADMIN_USERNAME = "admin"
 DEFAULT_ADMIN_PASSWORD = "admin"
 
@@ -56,3 +155,17 @@ ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "admin"
 
 PROLIFIC_API_TOKEN: str = "MY_TOKEN_HERE"
+
+# prolific API settings
+PROLIFIC_API_URL = "https://api.prolific.com/api/v1"
+# seconds before a prolific study's list of invalid participants is refreshed
+PROLIFIC_CACHE_TTL = 60
+# seconds during which an outdated list is still served while it is refreshed
+PROLIFIC_CACHE_MAX_STALE = 3600
+# timeout (seconds) of each request to the prolific API
+PROLIFIC_REQUEST_TIMEOUT = 5
+
+# max number of chat messages returned by one request to the chat endpoints
+CHAT_MESSAGES_MAX_LIMIT = 500
+# max number of chat summaries sent to admins per page
+CHAT_SUMMARIES_MAX_LIMIT = 500
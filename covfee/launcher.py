@@ -2,8 +2,10 @@ import os
 import platform
 import shutil
 import sys
+import tempfile
 from datetime import datetime
 from shutil import which
+from typing import List
 
 from click import Path
 from colorama import Fore
@@ -20,9 +22,20 @@ from covfee.server.db import (
     create_database_engine,
     create_database_sessionmaker,
 )
+from covfee.server.migrations import (
+    Migration,
+    get_pending_migrations,
+    migrate,
+    recompress_json_columns,
+)
+from covfee.server.orm.types import json_compression
 from covfee.shared.dataclass import CovfeeApp
 
 
+# lists the bundle files linked (or copied) into the www folder by link_bundles
+BUNDLE_LINKS_MANIFEST = ".covfee-bundles"
+
+
 class ProjectExistsException(Exception):
     def __init__(self, name):
         super().__init__("Conflicting project found in database")
@@ -58,6 +71,7 @@ class Launcher:
         self.environment = environment
         self._covfee_app = covfee_app
         self.config = Config(environment)
+        json_compression.configure(self.config)
         self.folder = folder
         self.auth_enabled = auth_enabled
 
@@ -75,29 +89,68 @@ class Launcher:
         self.engine = create_database_engine(self._database_engine_config)
         self._sessionmaker = create_database_sessionmaker(self.engine)
 
-    def create_or_update_database(self, delete_existing_data: bool = False):
+    def create_or_update_database(
+        self, delete_existing_data: bool = False, recompress_json: bool = False
+    ):
         # 1. Create the folders for the database and media
         os.makedirs(os.path.join(self.folder, ".covfee"), exist_ok=True)
         os.makedirs(os.path.join(self.folder, "www", "media"), exist_ok=True)
 
-        # 2. Delete old tables if "delete_existing_data" is True. Then create tables.
-        if delete_existing_data:
-            if self._database_modifications_should_be_manually_confirmed:
-                confirmation = input(
+        # 2. Delete old tables if "delete_existing_data" is True. Otherwise, check
+        #    with the user before migrating an existing database to this version, or
+        #    recompressing it if "recompress_json" is True.
+        #    Either way, the database is backed up first. Then create tables.
+        database_backed_up = False
+        pending_migrations = []
+        if self._database_modifications_should_be_manually_confirmed:
+            if delete_existing_data:
+                self._ask_for_confirmation(
                     "Are you sure you want to delete existing database tables? (yes/no): "
                 )
-                if confirmation.lower() != "yes":
-                    print("Aborting...")
-                    exit()
-
                 self._make_a_backup_of_the_database_file()
+                database_backed_up = True
+            else:
+                pending_migrations = self.get_pending_migrations()
+                if len(pending_migrations) > 0:
+                    print(
+                        "The database will be migrated to this covfee version: "
+                        + ", ".join(m.name for m in pending_migrations)
+                    )
+                if recompress_json:
+                    print(
+                        "The uncompressed JSON values of the database over "
+                        "JSON_COMPRESSION_MIN_SIZE bytes will be compressed."
+                    )
+                if len(pending_migrations) > 0 or recompress_json:
+                    self._ask_for_confirmation(
+                        "Are you sure you want to continue? (yes/no): "
+                    )
+                    self._make_a_backup_of_the_database_file()
+                    database_backed_up = True
 
+        if delete_existing_data:
             orm.Base.metadata.drop_all(self.engine)
+            # ids of the new specs may collide with those of the deleted ones
+            orm.spec_cache.clear()
         orm.Base.metadata.create_all(self.engine)
+        # adds the columns and indexes of newer covfee versions to existing tables
+        migrate(self.engine)
+        if recompress_json:
+            rewritten = recompress_json_columns(self.engine)
+            logger.info(f"Compressed the JSON values of {rewritten} rows.")
 
         # 3. Create the admin user if required and not existing in the database
         self._create_admin_user_in_database_if_needed()
 
+        # New specs may be flushed to the database file in batches before the changes
+        # are confirmed, so the backup is taken beforehand. It is discarded if the
+        # database is not modified.
+        unconfirmed_backup = None
+        if self._database_modifications_should_be_manually_confirmed and not (
+            database_backed_up
+        ):
+            unconfirmed_backup = self._make_a_backup_of_the_database_file()
+
         with self._sessionmaker() as session:
             # 4. Now, we update the database according to the covfee app specification
             #    given by the user. If the projects already existed, then it either
@@ -105,37 +158,98 @@ class Launcher:
             #    through the global_unique_id mechanic, then it updates the database with
             #    new HITs/Journeys with global_unique_ids which are not already in the database.
             #    All the others are ignored/kept as is.
-            self._covfee_app.add_to_database_new_or_updated_projects_specifications_and_instances(
-                session
-            )
+            #    The HITs of JSON projects are validated meanwhile: if they are
+            #    invalid, nothing is committed.
+            try:
+                self._covfee_app.add_to_database_new_or_updated_projects_specifications_and_instances(
+                    session, self.config["LOADER_BATCH_SIZE"]
+                )
+            except Exception:
+                if unconfirmed_backup is not None:
+                    os.remove(unconfirmed_backup)
+                raise
 
             # 5. Prior to commit the changes, check with the user that this is intentional.
             if (
                 self._database_modifications_should_be_manually_confirmed
                 and not delete_existing_data
-                and (session.new or session.dirty or session.deleted)
+                and (
+                    session.new
+                    or session.dirty
+                    or session.deleted
+                    or session.info.get("covfee_specs_flushed", False)
+                )
             ):
-                user_confirmation_response = input(
+                self._ask_for_confirmation(
                     "The database will be modified. Are you sure you want to continue? (yes/no): "
                 )
-                if user_confirmation_response.lower() != "yes":
-                    print("Aborting...")
-                    exit()
-                else:
-                    self._make_a_backup_of_the_database_file()
             else:
-                logger.info("No database modifications were detected.")
+                if unconfirmed_backup is not None:
+                    os.remove(unconfirmed_backup)
+                if len(pending_migrations) > 0:
+                    logger.info(
+                        "The database was migrated. No other changes were detected."
+                    )
+                else:
+                    logger.info("No database modifications were detected.")
 
             session.commit()
             session.close()
 
-    def _make_a_backup_of_the_database_file(self) -> None:
+    def get_database_changes_report(self, delete_existing_data: bool = False) -> str:
+        """Describes the changes create_or_update_database would make to the specs
+        in the database, without modifying it.
+        """
+        database_exists = self._database_modifications_should_be_manually_confirmed
+        if delete_existing_data or not database_exists:
+            report = self._covfee_app.get_database_changes_report(None)
+            if database_exists:
+                report = "All existing data will be deleted.\n" + report
+            return report
+
+        pending_migrations = self.get_pending_migrations()
+        if len(pending_migrations) == 0:
+            with self._sessionmaker() as session:
+                return self._covfee_app.get_database_changes_report(session)
+
+        # the specs are compared against a migrated copy of the database
+        with tempfile.TemporaryDirectory(prefix="covfee-dry-run-") as folder:
+            database_copy = os.path.join(folder, "database.covfee.db")
+            shutil.copy2(self._database_engine_config.database_file, database_copy)
+            engine = create_database_engine(
+                DatabaseEngineConfig(database_file=database_copy)
+            )
+            orm.Base.metadata.create_all(engine)
+            migrate(engine)
+            with create_database_sessionmaker(engine)() as session:
+                report = self._covfee_app.get_database_changes_report(session)
+            engine.dispose()
+        return (
+            "The database will be migrated to this covfee version: "
+            + ", ".join(m.name for m in pending_migrations)
+            + "\n"
+            + report
+        )
+
+    def get_pending_migrations(self) -> List[Migration]:
+        """Migrations that create_or_update_database would apply to the database"""
+        with self.engine.connect() as connection:
+            return get_pending_migrations(connection)
+
+    def _ask_for_confirmation(self, question: str) -> None:
+        """Exits unless the user answers "yes" to the question"""
+        if input(question).lower() != "yes":
+            print("Aborting...")
+            exit()
+
+    def _make_a_backup_of_the_database_file(self) -> str:
         database_backup_filename = f"{self._database_engine_config.database_file}.backup.{datetime.now().strftime('%Y%m%d%H%M%S')}"
         logger.info(f"Creating database backup: {database_backup_filename}...")
         shutil.copy2(
             self._database_engine_config.database_file,
             database_backup_filename,
         )
+        return database_backup_filename
 
     def launch(self, host="0.0.0.0", port=5000):
         if self.environment != "dev":
@@ -183,6 +297,11 @@ class Launcher:
             ssl_options = {}
 
         print(f"Running covfee at {host}:{port} with environment={self.environment}")
+        if self.environment == "deploy" and app.config["MEDIA_SENDFILE"] is None:
+            logger.info(
+                "Media files are sent by the embedded server, without sendfile. "
+                "See MEDIA_SENDFILE to hand them off to the reverse proxy."
+            )
         if self.environment == "local":
             socketio.run(app, host=host, port=port, **ssl_options)
         elif self.environment == "dev":
@@ -202,31 +321,59 @@ class Launcher:
             print(Fore.GREEN + f" * covfee is available at {target_url}")
 
     def link_bundles(self):
-        master_bundle_path = os.path.join(self.config["MASTER_BUNDLE_PATH"], "main.js")
-        if not os.path.exists(master_bundle_path):
+        master_bundle_path = self.config["MASTER_BUNDLE_PATH"]
+        if not os.path.exists(os.path.join(master_bundle_path, "main.js")):
             raise Exception("Master bundles not found.")
-        bundle_path = os.path.join(self.config["PROJECT_WWW_PATH"], "main.js")
-        if os.path.exists(bundle_path):
-            os.remove(bundle_path)
-        # windows requires admin rights for symlinking -> fall back to copying
-        if platform.system() == "Windows":
-            shutil.copyfile(master_bundle_path, bundle_path)
-        else:
-            os.symlink(master_bundle_path, bundle_path)
-
-        admin_bundle_path = os.path.join(self.config["PROJECT_WWW_PATH"], "admin.js")
-        if os.path.exists(admin_bundle_path):
-            os.remove(admin_bundle_path)
-        if platform.system() == "Windows":
-            shutil.copyfile(
-                os.path.join(self.config["MASTER_BUNDLE_PATH"], "admin.js"),
-                admin_bundle_path,
-            )
-        else:
-            os.symlink(
-                os.path.join(self.config["MASTER_BUNDLE_PATH"], "admin.js"),
-                admin_bundle_path,
-            )
+
+        # the bundles load their chunks from the www folder (webpack publicPath).
+        # All the bundle files are linked, including the hashed and compressed ones
+        www_path = self.config["PROJECT_WWW_PATH"]
+        os.makedirs(www_path, exist_ok=True)
+        filenames = sorted(
+            f
+            for f in os.listdir(master_bundle_path)
+            if os.path.isfile(os.path.join(master_bundle_path, f))
+        )
+
+        # removes the bundle files linked by previous launches, including those of
+        # previous builds. Other files of the www folder are never modified
+        manifest_path = os.path.join(www_path, BUNDLE_LINKS_MANIFEST)
+        linked = set()
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                linked = set(f.read().split())
+        for filename in os.listdir(www_path):
+            path = os.path.join(www_path, filename)
+            if is_link_into(path, master_bundle_path) or (
+                filename in linked and os.path.isfile(path)
+            ):
+                os.remove(path)
+
+        linked = []
+        for filename in filenames:
+            source_path = os.path.join(master_bundle_path, filename)
+            bundle_path = os.path.join(www_path, filename)
+            if os.path.lexists(bundle_path):
+                logger.warning(
+                    f"Not linking the bundle file {filename}: {bundle_path} exists."
+                )
+                continue
+            # windows requires admin rights for symlinking -> fall back to copying
+            if platform.system() == "Windows":
+                shutil.copyfile(source_path, bundle_path)
+            else:
+                os.symlink(source_path, bundle_path)
+            linked.append(filename)
+        with open(manifest_path, "w") as f:
+            f.write("\n".join(linked))
+
+
+def is_link_into(path: str, folder: str) -> bool:
+    """Whether path is a symbolic link to a file of folder (which may not exist)"""
+    if not os.path.islink(path):
+        return False
+    target = os.path.join(os.path.dirname(path), os.readlink(path))
+    return os.path.dirname(os.path.abspath(target)) == os.path.abspath(folder)
 
 
 def launch_webpack(covfee_client_path, host=None):
@@ -1,9 +1,12 @@
 import os
 import sys
-import json
+import inspect
 import importlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Tuple
 
 from flask import current_app as app
 from halo import Halo
@@ -11,16 +14,167 @@ from colorama import init as colorama_init, Fore
 
 
 from covfee.server.orm.user import User, password_hash
-from covfee.cli.utils import working_directory
+from covfee.cli.utils import working_directory, get_peak_memory_mb
+from covfee.config import config
+from covfee.shared import task_dataclasses
+from covfee.shared.json_stream import JsonObjectStream
 from covfee.shared.schemata import Schemata
-from covfee.shared.validator.ajv_validator import AjvValidator
-from covfee.shared.dataclass import CovfeeApp
+from covfee.shared.validator.jsonschema_validator import (
+    ErrorTuple,
+    JsonSchemaValidator,
+    init_hits_validator_worker,
+    raise_validation_errors,
+    validate_hits_chunk,
+)
+from covfee.shared.dataclass import CovfeeApp, CovfeeTask, HIT
 from covfee.shared.dataclass import Project as ProjectSpec
 from covfee.server.orm.project import Project
 
 colorama_init()
 
 
+def iter_chunks(items: Iterable, chunk_size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def make_task_from_json_spec(node_spec: Dict) -> CovfeeTask:
+    task_class = getattr(task_dataclasses, node_spec["type"] + "Spec")
+    params = inspect.signature(task_class.__init__).parameters
+    task = task_class(
+        **{k: v for k, v in node_spec.items() if k in params and k != "self"}
+    )
+    # properties that are not parameters of the dataclass (eg. type)
+    for k, v in node_spec.items():
+        if k not in params:
+            setattr(task, k, v)
+    return task
+
+
+def make_hit_from_json_spec(hit_spec: Dict) -> HIT:
+    hit = HIT(
+        hit_spec["name"],
+        repeat=hit_spec.get("repeat", 1),
+        config=hit_spec.get("config"),
+        global_unique_id=hit_spec["id"],
+    )
+    nodes = [make_task_from_json_spec(node) for node in hit_spec["nodes"]]
+    for journey_spec in hit_spec["journeys"]:
+        hit.add_journey([nodes[i] for i in journey_spec["nodes"]])
+    return hit
+
+
+class JsonFileHits:
+    """The HITs of a JSON project file, whose header was validated. The HITs are
+    parsed as they are iterated, validated in chunks and converted into
+    dataclasses, so that they are never all held in memory. They can only be
+    iterated once, so that the file is parsed once per load.
+
+    The HITs of invalid chunks are not yielded, and the validation errors of all
+    the HITs are raised at the end of the iteration.
+    """
+
+    def __init__(
+        self,
+        stream: JsonObjectStream,
+        validator,
+        project_json_specs: Dict,
+        with_spinner: bool = False,
+    ):
+        self.stream = stream
+        self.validator = validator
+        self.project_json_specs = project_json_specs
+        self.with_spinner = with_spinner
+        self._iterated = False
+
+    def __iter__(self) -> Iterator[HIT]:
+        if self._iterated:
+            raise RuntimeError(
+                f"The HITs of {self.stream.path} can only be iterated once."
+            )
+        self._iterated = True
+
+        project_name = self.project_json_specs.get("name")
+        with Halo(
+            text=f"Loading project {project_name}",
+            spinner="dots",
+            enabled=self.with_spinner,
+        ) as spinner:
+            file_size = max(os.path.getsize(self.stream.path), 1)
+            hits_count = 0
+            errors = []
+            try:
+                for hits, chunk_errors in iter_validated_hits_chunks(
+                    self.stream, self.validator, self.project_json_specs
+                ):
+                    hits_count += len(hits)
+                    spinner.text = (
+                        f"Loading project {project_name}: {hits_count} HITs"
+                        f" ({min(100 * self.stream.chars_read // file_size, 100)}%),"
+                        f" peak memory {get_peak_memory_mb() or 0:.0f}MB"
+                    )
+                    errors += chunk_errors
+                    if len(errors) == 0:
+                        for hit_spec in hits:
+                            yield make_hit_from_json_spec(hit_spec)
+                raise_validation_errors(errors)
+            except Exception as e:
+                spinner.fail(f'Error loading project "{project_name}".\n')
+                raise e
+            spinner.succeed(
+                f'Project "{project_name}" is valid. {hits_count} HITs loaded,'
+                f" peak memory {get_peak_memory_mb() or 0:.0f}MB."
+            )
+
+
+def iter_validated_hits_chunks(
+    stream: JsonObjectStream, validator, project_json_specs: Dict
+) -> Iterator[Tuple[List[Dict], List[ErrorTuple]]]:
+    """Yields each chunk of HITs of the stream with its validation errors, in
+    order. With the python validator, chunks are validated by a pool of
+    VALIDATOR_WORKERS processes, with a bounded number of chunks in flight.
+    """
+    chunk_size = config["LOADER_CHUNK_SIZE"]
+    chunks = (
+        (i * chunk_size, chunk)
+        for i, chunk in enumerate(iter_chunks(stream.iter_items(), chunk_size))
+    )
+
+    if not isinstance(validator, JsonSchemaValidator):
+        for start_index, hits in chunks:
+            validator.validate_project({**project_json_specs, "hits": hits})
+            yield hits, []
+        return
+
+    if validator.workers <= 1:
+        for start_index, hits in chunks:
+            yield hits, validate_hits_chunk(
+                start_index, hits, validator.validators["HitSpec"]
+            )
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=validator.workers,
+        initializer=init_hits_validator_worker,
+        initargs=(validator.schemas["HitSpec"],),
+    ) as executor:
+        pending = deque()
+        for start_index, hits in chunks:
+            pending.append(
+                (hits, executor.submit(validate_hits_chunk, start_index, hits))
+            )
+            if len(pending) >= 2 * validator.workers:
+                hits, future = pending.popleft()
+                yield hits, future.result()
+        while pending:
+            hits, future = pending.popleft()
+            yield hits, future.result()
+
+
 def cli_create_tables():
     """
     Creates all the tables defined in the ORM
@@ -61,76 +215,60 @@ class Loader:
             if not schema.exists():
                 schema.make()
 
-            projects_json_specs: List[Dict] = (
-                self._load_projects_json_specs_from_json_file(with_spinner)
-            )
-            self._raise_exception_if_projects_json_specs_are_not_valid(
-                projects_json_specs, with_spinner
-            )
-            covfee_app = self._parse_projects_json_specs_into_covfee_app(
-                projects_json_specs, with_spinner
-            )
+            covfee_app = self._load_covfee_app_from_json_file(with_spinner)
 
         return covfee_app
 
-    def _load_projects_json_specs_from_json_file(self, with_spinner: bool=True) -> List[Dict]:
-        projects_json_specs: List[Dict] = []
+    def _load_covfee_app_from_json_file(self, with_spinner: bool=False) -> CovfeeApp:
+        """Parses the header of a JSON project file and validates it. The HITs are
+        parsed, validated and converted as they are added to the database (see
+        JsonFileHits), such that the whole file is never held in memory.
+        """
+        stream = JsonObjectStream(str(self._project_spec_file), "hits")
         with Halo(
             text=f"Parsing file {self._project_spec_file} as json..",
             spinner="dots",
             enabled=with_spinner,
         ) as spinner:
             try:
-                project_json_specs: Dict = json.load(open(self._project_spec_file))
+                project_json_specs = stream.read_header(("id", "name", "email"))
             except Exception as e:
                 spinner.fail(
                     f"Error parsing file {self._project_spec_file} as JSON. Are you sure it is valid json?"
                 )
                 raise e
-
-            projects_json_specs.append(project_json_specs)
             spinner.succeed(f"Read covfee file {self._project_spec_file}.")
-        return projects_json_specs
-
-    def _raise_exception_if_projects_json_specs_are_not_valid(
-        self, projects_json_specs: List[Dict], with_spinner: bool=False
-    ) -> None:
-        filter = AjvValidator()
-        for project_json_specs in projects_json_specs:
-            with Halo(
-                text=f'Validating project {project_json_specs["name"]}',
-                spinner="dots",
-                enabled=with_spinner,
-            ) as spinner:
-                try:
-                    filter.validate_project(project_json_specs)
-                except Exception as e:
-                    spinner.fail(
-                        f'Error validating project "{project_json_specs["name"]}".\n'
-                    )
-                    raise e
-                spinner.succeed(f'Project "{project_json_specs["name"]}" is valid.')
 
-    def _parse_projects_json_specs_into_covfee_app(
-        self, projects_json_specs: List[Dict], with_spinner: bool=False
-    ) -> CovfeeApp:
-        raise NotImplementedError
-        # FIXME: ...this function was broken, but was modified to provide a skeleton of what's needed.
-        #        ... moreover, the previous version of the code was very unclear regarding what cf is
-        #        ...supposed to be and whether it is inside the json data, or somehow added to "self.projects"
-        projects_specs: List[ProjectSpec] = []
-        for project_json_spec, cf in projects_json_specs:
-            with Halo(
-                text=f'Making project {project_json_spec["name"]} from file {cf}',
-                spinner="dots",
-                enabled=with_spinner,
-            ) as spinner:
-
-                projects_specs.append(ProjectSpec(**project_json_spec))
-                spinner.succeed(
-                    f'Project {project_json_spec["name"]} created successfully from file {cf}'
+        if config["SCHEMA_VALIDATOR"] == "ajv":
+            # imported on use, as it needs zmq
+            from covfee.shared.validator.ajv_validator import AjvValidator
+
+            validator = AjvValidator()
+        else:
+            validator = JsonSchemaValidator()
+
+        project_name = project_json_specs.get("name")
+        with Halo(
+            text=f'Validating project {project_name}',
+            spinner="dots",
+            enabled=with_spinner,
+        ) as spinner:
+            try:
+                validator.validate_project({**project_json_specs, "hits": []})
+            except Exception as e:
+                spinner.fail(f'Error validating project "{project_name}".\n')
+                raise e
+            spinner.succeed(f'Project "{project_name}" header is valid.')
+
+        return CovfeeApp(
+            [
+                ProjectSpec(
+                    project_json_specs["name"],
+                    project_json_specs["email"],
+                    JsonFileHits(stream, validator, project_json_specs, with_spinner),
                 )
-        return CovfeeApp(projects_specs)
+            ]
+        )
 
     def _load_covfee_app_from_python_module(self) -> CovfeeApp:
         if os.getcwd() not in sys.path:
@@ -1,6 +1,15 @@
+import atexit
 import logging
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from pprint import pformat
+from typing import Any, Dict, List, Mapping, Optional
+
+from eventlet import patcher
+
+# threading and queue as they are before eventlet's monkey patching
+_native_threading = patcher.original("threading")
+_native_queue = patcher.original("queue")
 
 logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)
@@ -14,3 +23,158 @@ stdout_handler.setLevel(logging.DEBUG)
 
 # Add handlers to the logger
 logger.addHandler(stdout_handler)
+# handlers created by covfee, closed by shutdown_logging
+_handlers: List[logging.Handler] = [stdout_handler]
+
+# event name -> only 1 in N records of the event are logged
+_sampling: Dict[str, int] = {}
+_listener: Optional[QueueListener] = None
+
+
+class StructuredMessage:
+    """A log message made of an event name and key=value fields.
+
+    The message is only formatted if the record is emitted. Field values can be
+    callables, which are then only evaluated at that point. With LOG_QUEUE, that is
+    in the listener thread, so fields must not be modified after they are logged.
+    """
+
+    __slots__ = ("event", "fields")
+
+    def __init__(self, event: str, fields: Dict[str, Any]):
+        self.event = event
+        self.fields = fields
+
+    def __str__(self):
+        parts = [self.event]
+        for key, value in self.fields.items():
+            if callable(value):
+                value = value()
+            parts.append(f"{key}={value}")
+        return " ".join(parts)
+
+
+class StructuredLogger:
+    """Logs events with structured fields, eg.
+    log.info("socketio.join", node_id=node_id, payload=payload).
+
+    Nothing is formatted for records below the logger's level, and events
+    configured in LOG_SAMPLING are only logged once every N times.
+    """
+
+    def __init__(self, name: str):
+        self.logger = logging.getLogger(name)
+        self._counts: Dict[str, int] = {}
+
+    def is_enabled_for(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def log(self, level: int, event: str, exc_info=False, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        every = _sampling.get(event, 1)
+        if every > 1:
+            count = self._counts.get(event, 0)
+            self._counts[event] = count + 1
+            if count % every != 0:
+                return
+            fields["sampled"] = f"1/{every}"
+        self.logger.log(level, StructuredMessage(event, fields), exc_info=exc_info)
+
+    def debug(self, event: str, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields):
+        self.log(logging.ERROR, event, **fields)
+
+    def exception(self, event: str, **fields):
+        self.log(logging.ERROR, event, exc_info=True, **fields)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(name)
+
+
+class UnformattedQueueHandler(QueueHandler):
+    """Enqueues the records as they are. QueueHandler.prepare formats them, which
+    would be done by the logging greenlet. The records are formatted by the
+    handlers of the listener instead.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class NativeQueueListener(QueueListener):
+    """QueueListener running on a native thread, so that the handlers' I/O does
+    not block eventlet's hub as a green thread would. The queue must be a native
+    queue, and the handlers are given native locks.
+    """
+
+    def __init__(self, queue, *handlers: logging.Handler, **kwargs):
+        super().__init__(queue, *handlers, **kwargs)
+        for handler in handlers:
+            handler.lock = _native_threading.RLock()
+
+    def start(self):
+        self._thread = _native_threading.Thread(target=self._monitor, daemon=True)
+        self._thread.start()
+
+
+def stop_queue_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def shutdown_logging():
+    """Stops the queue listener, then removes covfee's handlers from the root
+    logger and closes them. Other handlers are left to logging.shutdown.
+    """
+    global stdout_handler
+    stop_queue_listener()
+    while len(_handlers) > 0:
+        handler = _handlers.pop()
+        logger.removeHandler(handler)
+        handler.close()
+    # no references are left, so that the handlers are collected now rather than
+    # during interpreter shutdown
+    stdout_handler = None
+
+
+def configure_logging(config: Mapping):
+    """Applies the logging settings of a covfee config:
+
+    - LOG_LEVEL: level of the root logger
+    - LOG_LEVELS: levels of specific loggers, by (module) name
+    - LOG_SAMPLING: events logged only once every N times
+    - LOG_QUEUE: moves the handlers of the root logger to a native thread, fed
+      through a queue, so that requests do not wait on log formatting and I/O
+    """
+    global _listener
+    logger.setLevel(config.get("LOG_LEVEL", logging.DEBUG))
+    for name, level in config.get("LOG_LEVELS", {}).items():
+        logging.getLogger(name).setLevel(level)
+    _sampling.clear()
+    _sampling.update(config.get("LOG_SAMPLING", {}))
+
+    if config.get("LOG_QUEUE", False) and _listener is None:
+        handlers = [h for h in logger.handlers if not isinstance(h, QueueHandler)]
+        log_queue = _native_queue.SimpleQueue()
+        for handler in handlers:
+            logger.removeHandler(handler)
+        queue_handler = UnformattedQueueHandler(log_queue)
+        _handlers.append(queue_handler)
+        logger.addHandler(queue_handler)
+        _listener = NativeQueueListener(
+            log_queue, *handlers, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(stop_queue_listener)
@@ -1,4 +1,3 @@
-import inspect
 import json
 import os
 from typing import Optional
@@ -6,11 +5,11 @@ from typing import Optional
 from flask import (
     Blueprint,
     Flask,
+    Response,
     abort,
     redirect,
     render_template,
     request,
-    send_from_directory,
 )
 from flask import current_app as app
 from flask_cors import CORS
@@ -20,16 +19,29 @@ from sqlalchemy import not_, select
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from covfee.config import Config
-from covfee.server import tasks
+from covfee.logger import configure_logging
+from covfee.server.rest_api.auth import admin_required
+from covfee.server.rest_api.principals import password_hasher, principal_cache
 from covfee.server.rest_api.utils import (
     ProlificAPIRequestError,
-    fetch_prolific_ids_for_invalid_participants,
+    prolific_invalid_participants_cache,
 )
-from covfee.server.tasks.base import BaseCovfeeTask
+from covfee.server.tasks.registry import get_task_classes
 
 from .orm.annotator import Annotator
 from .orm.journey import JourneyInstance, JourneyInstanceStatus, JourneySpec
+from .orm.state_history import compact_state_history_job, state_history
+from .orm.types import json_compression
+from . import metrics
+from .media import media_metadata_cache
 from .scheduler.apscheduler import scheduler
+from .serialization import (
+    get_socketio_options,
+    get_socketio_serializer,
+    json_serializer,
+)
+from .sessions import CovfeeSessionInterface, create_session_store
+from .static_assets import get_bundle_filename, send_bundle, send_www_file
 
 
 def create_app_and_socketio(
@@ -45,10 +57,15 @@ def create_app_and_socketio(
     config.update(app.config)
     app.config = config
 
+    configure_logging(app.config)
+
     # custom JSON encoding
     from .rest_api.utils import CovfeeJSONProvider
 
+    json_serializer.configure(app.config)
     app.json = CovfeeJSONProvider(app)
+    # the frontend is given the Socket.IO packet format actually used
+    app.config["SOCKETIO_SERIALIZER"] = get_socketio_serializer(app.config)
 
     if session_local is None:
         from .db import DatabaseEngineConfig, create_database_sessionmaker
@@ -64,7 +81,15 @@ def create_app_and_socketio(
     from .socketio.socket import socketio
 
     # important: here, set socketio json implementation too
-    socketio.init_app(app, manage_session=True, json=app.json)
+    # with the covfee session backends, socketio events read and write the sessions
+    # in the session store like HTTP requests do
+    manage_session = config["SESSION_BACKEND"] == "filesystem"
+    socketio.init_app(
+        app,
+        manage_session=manage_session,
+        **get_socketio_options(app.config["SOCKETIO_SERIALIZER"]),
+    )
+    metrics.configure(app.config, socketio)
 
     app.register_blueprint(frontend, url_prefix="/")
     from .rest_api import api, auth
@@ -73,19 +98,33 @@ def create_app_and_socketio(
     app.register_blueprint(auth, url_prefix="/auth")
 
     # register the task blueprints
-    for name in dir(tasks):
-        elem = getattr(tasks, name)
-        if inspect.isclass(elem) and issubclass(elem, BaseCovfeeTask):
-            blueprint = elem.get_blueprint()
-            if blueprint is not None:
-                print(f"Registering blueprint for task {elem.__name__}")
-                app.register_blueprint(blueprint, url_prefix=f"/custom/{elem.__name__}")
+    # (task classes are resolved once here and reused by the TaskInstances)
+    for task_class in get_task_classes().values():
+        blueprint = task_class.get_blueprint()
+        if blueprint is not None:
+            print(f"Registering blueprint for task {task_class.__name__}")
+            app.register_blueprint(
+                blueprint, url_prefix=f"/custom/{task_class.__name__}"
+            )
 
     CORS(app, resources={r"/*": {"origins": "*"}})
     app.config["SECRET_KEY"] = "Meow Meow"
     app.config["SESSION_PERMANENT"] = False
-    app.config["SESSION_TYPE"] = "filesystem"
-    Session(app)
+    if config["SESSION_BACKEND"] == "filesystem":
+        app.config["SESSION_TYPE"] = "filesystem"
+        Session(app)
+    else:
+        session_store = create_session_store(app.config)
+        app.session_interface = CovfeeSessionInterface(
+            session_store, app.config["SESSION_LIFETIME"]
+        )
+        scheduler.add_job(
+            session_store.sweep,
+            "interval",
+            seconds=app.config["SESSION_SWEEP_INTERVAL"],
+            id="session_sweep",
+            replace_existing=True,
+        )
     jwt = JWTManager(app)
 
     from .rest_api import (
@@ -98,9 +137,26 @@ def create_app_and_socketio(
     jwt.user_identity_loader(user_identity_lookup)
     jwt.user_lookup_loader(user_loader_callback)
 
+    prolific_invalid_participants_cache.configure(app.config)
+    state_history.configure(app.config)
+    json_compression.configure(app.config)
+    if state_history.enabled and app.config["STATE_HISTORY_COMPACT_INTERVAL"]:
+        scheduler.add_job(
+            compact_state_history_job,
+            "interval",
+            seconds=app.config["STATE_HISTORY_COMPACT_INTERVAL"],
+            id="state_history_compaction",
+            replace_existing=True,
+        )
+    media_metadata_cache.configure(app.config)
+    principal_cache.configure(app.config)
+    password_hasher.configure(app.config)
+
     # APScheduler
     # app.scheduler = BackgroundScheduler()
-    scheduler.start()
+    # the scheduler is shared by the apps of the process (eg. of the tests)
+    if not scheduler.running:
+        scheduler.start()
 
     @app.teardown_appcontext
     def teardown_appctx(exception):
@@ -131,6 +187,7 @@ def main():
         "app.html",
         constants=json.dumps(app.config.get_frontend_config()),
         bundle_url=app.config["BUNDLES_URL"],
+        bundle_file=get_bundle_filename(app.config, "main.js"),
     )
 
 
@@ -141,9 +198,19 @@ def admin():
         "admin.html",
         constants=json.dumps(app.config.get_frontend_config()),
         bundle_url=app.config["BUNDLES_URL"],
+        bundle_file=get_bundle_filename(app.config, "admin.js"),
     )
 
 
+# server metrics, in the prometheus text format
+@frontend.route("/metrics")
+@admin_required
+def get_metrics():
+    if not metrics.registry.enabled:
+        abort(404)
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+
 # annotator redirection from prolific academic
 @frontend.route("/prolific")
 def prolific():
@@ -163,10 +230,9 @@ def prolific():
         abort(404)
 
     try:
-        prolific_ids_for_invalid_participants = (
-            fetch_prolific_ids_for_invalid_participants(
-                prolific_study_id, app.config["PROLIFIC_API_TOKEN"]
-            )
+        # answered from a per-study cache that is refreshed in the background
+        prolific_ids_for_invalid_participants = prolific_invalid_participants_cache.get(
+            prolific_study_id, app.config["PROLIFIC_API_TOKEN"]
         )
     except ProlificAPIRequestError as err:
         # This error would be raised whenever:
@@ -270,12 +336,12 @@ def prolific():
 # project www server
 @frontend.route("/www/<path:filename>")
 def project_www_file(filename):
-    return send_from_directory(app.config["PROJECT_WWW_PATH"], filename)
+    return send_www_file(app.config, filename)
 
 
 @frontend.route("/bundles/<path:filename>")
 def bundles(filename):
-    return send_from_directory(app.config["MASTER_BUNDLE_PATH"], filename)
+    return send_bundle(app.config, filename)
 
 
 @frontend.errorhandler(404)
@@ -0,0 +1,207 @@
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+from flask import Response, abort, request
+from werkzeug.http import is_resource_modified
+from werkzeug.security import safe_join
+
+
+class MediaFileInfo(NamedTuple):
+    path: str
+    size: int
+    last_modified: datetime
+    etag: str
+    mimetype: str
+    checked_at: float
+
+
+class MediaMetadataCache:
+    """LRU cache of the metadata of the media files served.
+
+    Seek-heavy players issue many range requests for the same files. Entries are
+    trusted for ttl seconds, after which the file is stat'ed again.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 5):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, MediaFileInfo]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        self.max_size = config["MEDIA_METADATA_CACHE_SIZE"]
+        self.ttl = config["MEDIA_METADATA_TTL"]
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, path: str) -> Optional[MediaFileInfo]:
+        """Returns the metadata of a file, or None if it does not exist"""
+        now = time.monotonic()
+        with self._lock:
+            info = self._entries.get(path, None)
+            if info is not None and now - info.checked_at < self.ttl:
+                self._entries.move_to_end(path)
+                return info
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        if stat is None or not os.path.isfile(path):
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+
+        info = MediaFileInfo(
+            path=path,
+            size=stat.st_size,
+            last_modified=datetime.fromtimestamp(int(stat.st_mtime), timezone.utc),
+            etag=f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+            mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream",
+            checked_at=now,
+        )
+        with self._lock:
+            self._entries[path] = info
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return info
+
+
+media_metadata_cache = MediaMetadataCache()
+
+
+class FileRangeWrapper:
+    """Iterates over a byte range of a file in blocks.
+    Used when the WSGI server does not provide a (sendfile-based) file_wrapper.
+    """
+
+    def __init__(self, file, start: int, length: int, block_size: int):
+        self.file = file
+        self.remaining = length
+        self.block_size = block_size
+        self.file.seek(start)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        if self.remaining <= 0:
+            raise StopIteration()
+        data = self.file.read(min(self.block_size, self.remaining))
+        if not data:
+            raise StopIteration()
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def is_media_file(filename: str) -> bool:
+    mimetype = mimetypes.guess_type(filename)[0]
+    return mimetype is not None and mimetype.split("/")[0] in ("video", "audio")
+
+
+def get_requested_range(info: MediaFileInfo):
+    """Returns the (start, stop) byte range to send, None to send the whole file,
+    or False if the range is not satisfiable.
+    """
+    requested = request.range
+    if requested is None or requested.units != "bytes" or len(requested.ranges) != 1:
+        # multipart ranges are answered with the whole file
+        return None
+
+    # If-Range: the range applies only if the file is unchanged
+    if_range = request.if_range
+    if if_range.etag is not None and if_range.etag != info.etag:
+        return None
+    if if_range.date is not None and if_range.date != info.last_modified:
+        return None
+
+    byte_range = requested.range_for_length(info.size)
+    if byte_range is None:
+        return False
+    return byte_range
+
+
+def send_media_file(config, directory: str, filename: str):
+    """Sends an audio or video file, with Range / If-Range support.
+
+    Depending on MEDIA_SENDFILE, the transfer of the file is handed off to the
+    reverse proxy (X-Sendfile or X-Accel-Redirect), which then also answers range
+    requests. Otherwise, the requested range is sent through the WSGI server's
+    file_wrapper (zero-copy sendfile in gunicorn) or in blocks.
+    """
+    path = safe_join(directory, filename)
+    if path is None:
+        abort(404)
+    info = media_metadata_cache.get(path)
+    if info is None:
+        abort(404)
+
+    response = Response(mimetype=info.mimetype, direct_passthrough=True)
+    response.set_etag(info.etag)
+    response.last_modified = info.last_modified
+    response.accept_ranges = "bytes"
+    max_age = config["WWW_CACHE_MAX_AGE"]
+    if max_age > 0:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+
+    if not is_resource_modified(
+        request.environ, etag=info.etag, last_modified=info.last_modified
+    ):
+        response.status_code = 304
+        return response
+
+    mode = config["MEDIA_SENDFILE"]
+    if mode == "x-sendfile":
+        response.headers["X-Sendfile"] = info.path
+        return response
+    if mode == "x-accel-redirect":
+        relative_path = os.path.relpath(info.path, directory).replace(os.sep, "/")
+        prefix = config["MEDIA_ACCEL_REDIRECT_PREFIX"].rstrip("/")
+        response.headers["X-Accel-Redirect"] = f"{prefix}/{relative_path}"
+        return response
+
+    byte_range = get_requested_range(info)
+    if byte_range is False:
+        response.status_code = 416
+        response.headers["Content-Range"] = f"bytes */{info.size}"
+        return response
+    start, stop = byte_range if byte_range is not None else (0, info.size)
+    if byte_range is not None:
+        response.status_code = 206
+        response.content_range = f"bytes {start}-{stop - 1}/{info.size}"
+    response.content_length = stop - start
+
+    if request.method == "HEAD":
+        return response
+
+    file = open(info.path, "rb")
+    file_wrapper = request.environ.get("wsgi.file_wrapper", None)
+    if byte_range is not None and not request.environ.get(
+        "SERVER_SOFTWARE", ""
+    ).startswith("gunicorn"):
+        # only gunicorn's file_wrapper is known to stop at the Content-Length
+        file_wrapper = None
+    if file_wrapper is not None:
+        # the server sends from the current position, up to the Content-Length
+        file.seek(start)
+        response.response = file_wrapper(file, config["MEDIA_BLOCK_SIZE"])
+    else:
+        response.response = FileRangeWrapper(
+            file, start, stop - start, config["MEDIA_BLOCK_SIZE"]
+        )
+    return response
@@ -0,0 +1,369 @@
+"""Server metrics, exposed in the Prometheus text format on the /metrics endpoint.
+
+Metrics are only recorded when METRICS_ENABLED is set. When disabled, recording a
+metric is a single attribute check, and no SQLAlchemy event listeners are added.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# latency buckets (seconds)
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+
+def format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], **extra):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra.items())
+    if len(pairs) == 0:
+        return ""
+    escaped = [
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    ]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+    ):
+        self.registry = registry
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self):
+        raise NotImplementedError()
+
+    def get_samples(self) -> List[str]:
+        raise NotImplementedError()
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        return "\n".join(lines + self.get_samples())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def get_samples(self) -> List[str]:
+        return [
+            f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Metric):
+    """A value that goes up and down. Can also be computed when the metrics are
+    rendered, by a function returning a {labelvalues: value} dict.
+    """
+
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+
+    def set_function(self, function: Callable[[], Dict[Tuple[str, ...], float]]):
+        self._function = function
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def get_samples(self) -> List[str]:
+        values = self._function() if self._function is not None else self._values
+        return [
+            f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class _HistogramTimer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: "Histogram", labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_null_timer = _NullTimer()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # per label values: [bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key, None)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def time(self, **labels):
+        """Context manager that observes the duration of its block"""
+        if not self.registry.enabled:
+            return _null_timer
+        return _HistogramTimer(self, labels)
+
+    def get_count(self, **labels) -> int:
+        return sum(self._counts.get(self._key(labels), []))
+
+    def reset(self):
+        with self._lock:
+            self._counts, self._sums = {}, {}
+
+    def get_samples(self) -> List[str]:
+        samples = []
+        for key, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else format_value(bound)
+                labels = format_labels(self.labelnames, key, le=le)
+                samples.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            samples.append(f"{self.name}_sum{labels} {format_value(self._sums[key])}")
+            samples.append(f"{self.name}_count{labels} {cumulative}")
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.enabled = False
+        self.metrics: Dict[str, Metric] = {}
+
+    def counter(self, name: str, description: str, labelnames=()) -> Counter:
+        return self._add(Counter(self, name, description, labelnames))
+
+    def gauge(self, name: str, description: str, labelnames=()) -> Gauge:
+        return self._add(Gauge(self, name, description, labelnames))
+
+    def histogram(
+        self, name: str, description: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._add(
+            Histogram(self, name, description, labelnames, buckets=buckets)
+        )
+
+    def _add(self, metric: Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already registered.")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
+
+socketio_events = registry.counter(
+    "covfee_socketio_events_total",
+    "Socket.IO events handled.",
+    ["namespace", "event", "status"],
+)
+socketio_event_duration = registry.histogram(
+    "covfee_socketio_event_duration_seconds",
+    "Time spent handling Socket.IO events.",
+    ["namespace", "event"],
+)
+socketio_connections = registry.gauge(
+    "covfee_socketio_connections",
+    "Connected Socket.IO clients (participant journeys).",
+)
+socketio_rooms = registry.gauge(
+    "covfee_socketio_rooms", "Active Socket.IO rooms.", ["namespace"]
+)
+db_commit_duration = registry.histogram(
+    "covfee_db_commit_duration_seconds", "Duration of database commits."
+)
+redux_store_duration = registry.histogram(
+    "covfee_redux_store_request_duration_seconds",
+    "Round-trip time of the requests to the Redux store service.",
+    ["command"],
+)
+redux_store_errors = registry.counter(
+    "covfee_redux_store_errors_total",
+    "Requests to the Redux store service that timed out.",
+    ["command"],
+)
+timer_lag = registry.histogram(
+    "covfee_timer_lag_seconds",
+    "Delay between the scheduled and the actual firing time of node timers.",
+    ["timer"],
+)
+chat_messages = registry.counter(
+    "covfee_chat_messages_total", "Chat messages received.", ["namespace"]
+)
+
+
+def timed_event(namespace: str, event_name: str):
+    """Decorator recording the count, errors and duration of a Socket.IO handler"""
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                socketio_events.inc(
+                    namespace=namespace, event=event_name, status="error"
+                )
+                raise
+            finally:
+                socketio_event_duration.observe(
+                    time.perf_counter() - start, namespace=namespace, event=event_name
+                )
+            socketio_events.inc(namespace=namespace, event=event_name, status="ok")
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _before_commit(session):
+    session.info["covfee_commit_start"] = time.perf_counter()
+
+
+def _after_commit(session):
+    start = session.info.pop("covfee_commit_start", None)
+    if start is not None:
+        db_commit_duration.observe(time.perf_counter() - start)
+
+
+def _after_rollback(session):
+    session.info.pop("covfee_commit_start", None)
+
+
+def count_rooms(socketio) -> Dict[Tuple[str, ...], float]:
+    """Counts the rooms of each namespace, excluding the per-client rooms"""
+    manager = socketio.server.manager
+    counts = {}
+    for namespace, rooms in list(manager.rooms.items()):
+        sids = set(rooms.get(None, {}).keys())
+        counts[(namespace,)] = sum(
+            1 for room in list(rooms) if room is not None and room not in sids
+        )
+    return counts
+
+
+def configure(config, socketio=None):
+    registry.enabled = bool(config.get("METRICS_ENABLED", False))
+    if not registry.enabled:
+        return
+
+    if not event.contains(Session, "before_commit", _before_commit):
+        event.listen(Session, "before_commit", _before_commit)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
+
+    if socketio is not None:
+        socketio_rooms.set_function(lambda: count_rooms(socketio))
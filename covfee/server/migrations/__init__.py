@@ -0,0 +1,32 @@
+"""Schema migrations of existing covfee databases.
+
+Base.metadata.create_all creates the missing tables, but does not change existing
+ones. The migrations in versions.py add what later covfee versions need to the
+tables of existing study databases (columns, indexes), and are recorded in the
+schema_migrations table once applied.
+
+Migrations are idempotent: on a database just created by create_all they find
+everything in place and are only recorded. They only add columns and indexes, and
+can be applied to the database of a running server.
+"""
+
+from .runner import (
+    Migration,
+    get_applied_versions,
+    get_pending_migrations,
+    migrate,
+    recompress_json_columns,
+)
+from .versions import MIGRATIONS
+from .query_plans import HOT_QUERIES, check_query_plans
+
+__all__ = [
+    "Migration",
+    "MIGRATIONS",
+    "HOT_QUERIES",
+    "check_query_plans",
+    "get_applied_versions",
+    "get_pending_migrations",
+    "migrate",
+    "recompress_json_columns",
+]
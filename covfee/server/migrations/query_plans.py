@@ -0,0 +1,119 @@
+"""Query plan checks of the hot lookups, run by tests/test_indexes.py and
+`covfee-dev check-indexes`."""
+
+import re
+from typing import List, NamedTuple
+
+from sqlalchemy import Connection, text
+from sqlalchemy.exc import OperationalError
+
+
+class HotQuery(NamedTuple):
+    name: str
+    # table that must be searched through an index instead of scanned
+    table: str
+    sql: str
+
+
+HOT_QUERIES = [
+    HotQuery(
+        "responses of a node",
+        "taskresponses",
+        "SELECT * FROM taskresponses WHERE node_id = :id",
+    ),
+    HotQuery(
+        "nodes of a HIT",
+        "nodeinstances",
+        "SELECT * FROM nodeinstances WHERE hit_id = :id",
+    ),
+    HotQuery(
+        "nodes of a spec",
+        "nodeinstances",
+        "SELECT * FROM nodeinstances WHERE nodespec_id = :id",
+    ),
+    HotQuery(
+        "journeys of a HIT",
+        "journeyinstances",
+        "SELECT * FROM journeyinstances WHERE hit_id = :id",
+    ),
+    HotQuery(
+        "journeys at a node",
+        "journeyinstances",
+        "SELECT * FROM journeyinstances WHERE curr_node_id = :id",
+    ),
+    HotQuery(
+        "journeys of a spec",
+        "journeyinstances",
+        "SELECT * FROM journeyinstances WHERE journeyspec_id = :id",
+    ),
+    HotQuery(
+        "journeys of a node",
+        "journey_node",
+        "SELECT * FROM journey_node WHERE node_id = :id",
+    ),
+    HotQuery(
+        "messages of a chat",
+        "chat_messages",
+        "SELECT * FROM chat_messages WHERE chat_id = :id ORDER BY id DESC LIMIT 50",
+    ),
+    HotQuery(
+        "annotator of a prolific participant",
+        "annotators",
+        "SELECT * FROM annotators "
+        "WHERE prolific_id = :id AND prolific_study_id = :study_id",
+    ),
+    HotQuery(
+        "annotator of a journey",
+        "annotators",
+        "SELECT * FROM annotators WHERE journey_instance_id = :id",
+    ),
+    HotQuery(
+        "annotations of a task",
+        "ContinuousAnnotationTask.annotations",
+        'SELECT * FROM "ContinuousAnnotationTask.annotations" WHERE task_id = :id',
+    ),
+    HotQuery(
+        "state history of a response",
+        "taskresponse_state_versions",
+        "SELECT version, data FROM taskresponse_state_versions "
+        "WHERE response_id = :id AND snapshot AND version <= 10 "
+        "ORDER BY version DESC LIMIT 1",
+    ),
+    HotQuery(
+        "HIT specs by fingerprint",
+        "hitspecs",
+        "SELECT * FROM hitspecs WHERE fingerprint = :id",
+    ),
+    HotQuery(
+        "journey specs by fingerprint",
+        "journeyspecs",
+        "SELECT * FROM journeyspecs WHERE fingerprint = :id",
+    ),
+]
+
+
+def get_query_plan(connection: Connection, sql: str) -> List[str]:
+    rows = connection.execute(
+        text("EXPLAIN QUERY PLAN " + sql), {"id": 1, "study_id": "1"}
+    )
+    # (id, parent, notused, detail)
+    return [row[3] for row in rows]
+
+
+def check_query_plans(connection: Connection) -> List[str]:
+    """Returns a description of the hot queries that scan their table.
+    Only supports SQLite.
+    """
+    failures = []
+    for query in HOT_QUERIES:
+        try:
+            plan = get_query_plan(connection, query.sql)
+        except OperationalError as ex:
+            # eg. columns added by pending migrations
+            failures.append(f"{query.name}: {ex.orig}")
+            continue
+        # "SCAN <table>" (older SQLite versions: "SCAN TABLE <table>")
+        scan = re.compile(rf"^SCAN (TABLE )?{re.escape(query.table)}\b")
+        if any(scan.match(detail) for detail in plan):
+            failures.append(f"{query.name}: {'; '.join(plan)}")
+    return failures
@@ -0,0 +1,176 @@
+import datetime
+import json
+from typing import Callable, List, NamedTuple, Sequence, Set
+
+from sqlalchemy import Connection, Engine, inspect, text
+
+from covfee.logger import logger
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+
+class Migration(NamedTuple):
+    # increasing number giving the order in which migrations are applied
+    version: int
+    name: str
+    # applies the migration. Runs in the transaction that records it. Migrations
+    # working in batches may commit each batch, in which case they must be able to
+    # resume after a failure
+    upgrade: Callable[[Connection], None]
+
+
+def ensure_migrations_table(connection: Connection):
+    connection.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+            "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)"
+        )
+    )
+
+
+def get_applied_versions(connection: Connection) -> Set[int]:
+    if not inspect(connection).has_table(MIGRATIONS_TABLE):
+        return set()
+    rows = connection.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE}"))
+    return {row[0] for row in rows}
+
+
+def get_pending_migrations(
+    connection: Connection, migrations: Sequence[Migration] = None
+) -> List[Migration]:
+    if migrations is None:
+        from .versions import MIGRATIONS
+
+        migrations = MIGRATIONS
+    applied = get_applied_versions(connection)
+    return sorted(
+        (m for m in migrations if m.version not in applied), key=lambda m: m.version
+    )
+
+
+def migrate(engine: Engine, migrations: Sequence[Migration] = None) -> List[Migration]:
+    """Applies the pending migrations, each in its own transaction (or more, see
+    Migration). Returns the migrations applied.
+    """
+    with engine.begin() as connection:
+        ensure_migrations_table(connection)
+        pending = get_pending_migrations(connection, migrations)
+
+    for migration in pending:
+        with engine.connect() as connection:
+            # another process may have applied it in the meantime
+            if migration.version in get_applied_versions(connection):
+                continue
+            logger.info(f"Applying migration {migration.version}: {migration.name}")
+            migration.upgrade(connection)
+            connection.execute(
+                text(
+                    f"INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at) "
+                    "VALUES (:version, :name, :applied_at)"
+                ),
+                {
+                    "version": migration.version,
+                    "name": migration.name,
+                    "applied_at": datetime.datetime.now().isoformat(),
+                },
+            )
+            connection.commit()
+    return pending
+
+
+# helpers for the migrations
+# Tables that do not exist are skipped: create_all creates them with their current
+# columns and indexes.
+
+
+def add_column(connection: Connection, table: str, column: str, ddl_type: str):
+    """Adds a column to a table, if it does not have it already. The column must be
+    nullable or have a default.
+    """
+    inspector = inspect(connection)
+    if not inspector.has_table(table):
+        return
+    columns = {c["name"] for c in inspector.get_columns(table)}
+    if column not in columns:
+        connection.execute(
+            text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl_type}')
+        )
+
+
+def recompress_json_column(
+    connection: Connection, table: str, column: str, batch_size: int = 500
+) -> int:
+    """Rewrites the uncompressed values of a CompressedJSON column that are over the
+    compression threshold, committing every batch. Returns the number of rows
+    rewritten.
+    """
+    from covfee.server.orm.types import CompressedJSON, json_compression
+
+    if not inspect(connection).has_table(table):
+        return 0
+    column_type = CompressedJSON()
+    rewritten, last_rowid = 0, 0
+    while True:
+        rows = connection.execute(
+            text(
+                f'SELECT rowid, {column} FROM "{table}" '
+                f"WHERE rowid > :last_rowid AND typeof({column}) = 'text' "
+                f"AND length({column}) >= :min_size ORDER BY rowid LIMIT :batch_size"
+            ),
+            {
+                "last_rowid": last_rowid,
+                "min_size": json_compression.min_size,
+                "batch_size": batch_size,
+            },
+        ).all()
+        if len(rows) == 0:
+            return rewritten
+        for rowid, value in rows:
+            connection.execute(
+                text(f'UPDATE "{table}" SET {column} = :value WHERE rowid = :rowid'),
+                {
+                    "value": column_type.process_bind_param(
+                        json.loads(value), connection.dialect
+                    ),
+                    "rowid": rowid,
+                },
+            )
+        connection.commit()
+        rewritten += len(rows)
+        last_rowid = rows[-1][0]
+
+
+def recompress_json_columns(engine: Engine) -> int:
+    """Compresses the existing values of all CompressedJSON columns that are over the
+    compression threshold. New values are compressed when written: this only
+    rewrites those written by older covfee versions. Returns the number of rows
+    rewritten.
+    """
+    from covfee.server.orm.base import Base
+    from covfee.server.orm.types import CompressedJSON
+
+    rewritten = 0
+    with engine.connect() as connection:
+        for table in Base.metadata.sorted_tables:
+            for column in table.columns:
+                if isinstance(column.type, CompressedJSON):
+                    rewritten += recompress_json_column(
+                        connection, table.name, column.name
+                    )
+    return rewritten
+
+
+def create_index(
+    connection: Connection, name: str, table: str, *columns: str, unique=False
+):
+    """Creates an index, if it does not exist already"""
+    if not inspect(connection).has_table(table):
+        return
+    column_list = ", ".join(columns)
+    unique_clause = "UNIQUE " if unique else ""
+    connection.execute(
+        text(
+            f"CREATE {unique_clause}INDEX IF NOT EXISTS {name} "
+            f'ON "{table}" ({column_list})'
+        )
+    )
@@ -0,0 +1,94 @@
+"""The migrations, in order. New migrations are appended with the next version."""
+
+from sqlalchemy import Connection, text
+
+from .runner import Migration, add_column, create_index
+
+
+def add_spec_fingerprints(connection: Connection):
+    for table in ["hitspecs", "journeyspecs"]:
+        add_column(connection, table, "fingerprint", "VARCHAR")
+        create_index(connection, f"ix_{table}_fingerprint", table, "fingerprint")
+
+
+def add_chat_message_indexes(connection: Connection):
+    create_index(
+        connection, "ix_chat_messages_chat_id_id", "chat_messages", "chat_id", "id"
+    )
+    create_index(
+        connection,
+        "ix_chat_messages_chat_id_created_at",
+        "chat_messages",
+        "chat_id",
+        "created_at",
+    )
+
+
+def add_lookup_indexes(connection: Connection):
+    # chat_messages.chat_id is covered by ix_chat_messages_chat_id_id
+    for table, column in [
+        ("taskresponses", "node_id"),
+        ("nodeinstances", "hit_id"),
+        ("nodeinstances", "nodespec_id"),
+        ("journeyinstances", "hit_id"),
+        ("journeyinstances", "curr_node_id"),
+        ("journeyinstances", "journeyspec_id"),
+        ("journey_node", "node_id"),
+        ("annotators", "journey_instance_id"),
+    ]:
+        create_index(connection, f"ix_{table}_{column}", table, column)
+    create_index(
+        connection,
+        "ix_annotators_prolific_id_prolific_study_id",
+        "annotators",
+        "prolific_id",
+        "prolific_study_id",
+    )
+    create_index(
+        connection,
+        "ix_continuous_annotations_task_id",
+        "ContinuousAnnotationTask.annotations",
+        "task_id",
+    )
+
+
+def add_curr_response_id(connection: Connection):
+    add_column(
+        connection,
+        "nodeinstances",
+        "curr_response_id",
+        "INTEGER REFERENCES taskresponses (id)",
+    )
+    # the latest response of each task
+    connection.execute(
+        text(
+            "UPDATE nodeinstances SET curr_response_id = ("
+            "SELECT MAX(taskresponses.id) FROM taskresponses "
+            "WHERE taskresponses.node_id = nodeinstances.id"
+            ") WHERE curr_response_id IS NULL"
+        )
+    )
+
+
+def add_state_version(connection: Connection):
+    # the taskresponse_state_versions table is created by create_all
+    add_column(
+        connection, "taskresponses", "state_version", "INTEGER NOT NULL DEFAULT 0"
+    )
+    create_index(
+        connection,
+        "ix_taskresponse_state_versions_response_id_version",
+        "taskresponse_state_versions",
+        "response_id",
+        "version",
+        unique=True,
+    )
+
+
+MIGRATIONS = [
+    Migration(1, "add_spec_fingerprints", add_spec_fingerprints),
+    Migration(2, "add_chat_message_indexes", add_chat_message_indexes),
+    Migration(3, "add_lookup_indexes", add_lookup_indexes),
+    Migration(4, "add_curr_response_id", add_curr_response_id),
+    Migration(5, "add_state_version", add_state_version),
+]
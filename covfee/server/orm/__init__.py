@@ -5,6 +5,7 @@ from .journey import *
 from .node import *
 from .task import *
 from .response import *
+from .state_history import TaskResponseStateVersion, get_state_version
 from .user import *
 from .chat import *
 from .annotator import *
@@ -1,7 +1,7 @@
 import datetime
 from typing import Optional
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -13,6 +13,14 @@ class Annotator(Base):
     """
 
     __tablename__ = "annotators"
+    __table_args__ = (
+        # used to find the annotator of a prolific participant in a study
+        Index(
+            "ix_annotators_prolific_id_prolific_study_id",
+            "prolific_id",
+            "prolific_study_id",
+        ),
+    )
 
     # A unique identifier for the annotator row
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -22,7 +30,7 @@ class Annotator(Base):
     prolific_study_id: Mapped[Optional[str]] = mapped_column()
     # A reference to the journey instance the annotator is working on
     journey_instance_id: Mapped[Optional[int]] = mapped_column(
-        ForeignKey("journeyinstances.id")
+        ForeignKey("journeyinstances.id"), index=True
     )
     # The journey instance the annotator is working on
     journey_instance: Mapped[Optional["JourneyInstance"]] = relationship(
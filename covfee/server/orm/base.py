@@ -1,12 +1,14 @@
 import random
 from typing import Dict, Any
-from sqlalchemy import JSON
+from sqlalchemy import JSON, event
 from sqlalchemy.orm import DeclarativeBase
-from . import utils
+from .mutable import MutableJSON
+from .serializers import get_serializer, receive_mapper_configured
 
 
 class Base(DeclarativeBase):
-    type_annotation_map = {Dict[str, Any]: JSON}
+    # JSON columns track in-place changes, see MutableJSON
+    type_annotation_map = {Dict[str, Any]: MutableJSON.as_mutable(JSON())}
 
     # random unique ID to use as hash key
     _unique_id: int
@@ -19,8 +21,8 @@ class Base(DeclarativeBase):
         self._unique_id = random.getrandbits(256)
 
     def to_dict(self):
-        instance_dict = {
-            c.name: utils.to_dict(getattr(self, c.name)) for c in self.__table__.columns
-        }
+        return get_serializer(type(self))(self)
 
-        return instance_dict
+
+# builds the serializer used by to_dict once per model
+event.listen(Base, "mapper_configured", receive_mapper_configured, propagate=True)
@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 import datetime
-from typing import TYPE_CHECKING, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import ForeignKey
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import ForeignKey, Index, and_, func, or_, select
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
 from typing_extensions import Annotated
 
+from . import utils
 from .base import Base
 
 if TYPE_CHECKING:
@@ -76,6 +77,146 @@ class Chat(Base):
 
         return chat_dict
 
+    @staticmethod
+    def get_messages_page(
+        session: Session,
+        chat_id: int,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[ChatMessage]:
+        """Returns a page of messages of a chat, in chronological order.
+
+        Args:
+            before (int, optional): cursor, only messages with id < before are returned.
+            after (int, optional): cursor, only messages with id > after are returned.
+            limit (int, optional): max number of messages. When only `before` (or no
+                cursor) is given the most recent messages are returned, when `after` is
+                given the oldest messages following the cursor are returned.
+        """
+        query = select(ChatMessage).where(ChatMessage.chat_id == chat_id)
+        if before is not None:
+            query = query.where(ChatMessage.id < before)
+        if after is not None:
+            query = query.where(ChatMessage.id > after)
+
+        newest_first = after is None
+        query = query.order_by(
+            ChatMessage.id.desc() if newest_first else ChatMessage.id.asc()
+        )
+        if limit is not None:
+            query = query.limit(limit)
+
+        messages = session.execute(query).scalars().all()
+        if newest_first:
+            messages = messages[::-1]
+        return messages
+
+    @staticmethod
+    def get_journey_reads(
+        session: Session, chat_ids: List[int]
+    ) -> Dict[int, Dict[str, Tuple[Optional[datetime.datetime], int]]]:
+        """Counts the unread messages of each (chat, journey) pair with one query.
+
+        Returns:
+            mapping chat_id => journey id (hex) => (read_at, number of unread
+            messages)
+        """
+        query = (
+            select(
+                ChatJourney.chat_id,
+                ChatJourney.journeyinstance_id,
+                ChatJourney.read_at,
+                func.count(ChatMessage.id),
+            )
+            .outerjoin(
+                ChatMessage,
+                and_(
+                    ChatMessage.chat_id == ChatJourney.chat_id,
+                    or_(
+                        ChatJourney.read_at.is_(None),
+                        ChatMessage.created_at > ChatJourney.read_at,
+                    ),
+                ),
+            )
+            .where(ChatJourney.chat_id.in_(chat_ids))
+            .group_by(ChatJourney.chat_id, ChatJourney.journeyinstance_id)
+        )
+        reads = {chat_id: {} for chat_id in chat_ids}
+        for chat_id, journey_id, read_at, count in session.execute(query):
+            reads[chat_id][journey_id.hex()] = (read_at, count)
+        return reads
+
+    @staticmethod
+    def get_summaries(session: Session, chat_ids: List[int]) -> List[Dict[str, Any]]:
+        """Lightweight representation of a list of chats, without their messages.
+        Computed with aggregate queries so that the cost does not depend on the
+        number of messages loaded in memory.
+        """
+        message_stats = (
+            select(
+                ChatMessage.chat_id,
+                func.count(ChatMessage.id).label("num_messages"),
+                func.max(ChatMessage.id).label("last_message_id"),
+                func.max(ChatMessage.created_at).label("last_message_at"),
+            )
+            .where(ChatMessage.chat_id.in_(chat_ids))
+            .group_by(ChatMessage.chat_id)
+            .subquery()
+        )
+        admin_unread = (
+            select(ChatMessage.chat_id, func.count(ChatMessage.id).label("unread"))
+            .join(Chat, Chat.id == ChatMessage.chat_id)
+            .where(
+                ChatMessage.chat_id.in_(chat_ids),
+                or_(
+                    Chat.read_by_admin_at.is_(None),
+                    ChatMessage.created_at > Chat.read_by_admin_at,
+                ),
+            )
+            .group_by(ChatMessage.chat_id)
+            .subquery()
+        )
+        query = (
+            select(
+                Chat.id,
+                Chat.node_id,
+                Chat.journey_id,
+                Chat.read_by_admin_at,
+                message_stats.c.num_messages,
+                message_stats.c.last_message_id,
+                message_stats.c.last_message_at,
+                admin_unread.c.unread,
+            )
+            .outerjoin(message_stats, message_stats.c.chat_id == Chat.id)
+            .outerjoin(admin_unread, admin_unread.c.chat_id == Chat.id)
+            .where(Chat.id.in_(chat_ids))
+            .order_by(Chat.id)
+        )
+        journey_reads = Chat.get_journey_reads(session, chat_ids)
+
+        return [
+            {
+                "id": row.id,
+                "node_id": row.node_id,
+                "journey_id": utils.to_dict(row.journey_id),
+                "read_by_admin_at": utils.to_dict(row.read_by_admin_at),
+                "num_messages": row.num_messages or 0,
+                "last_message_id": row.last_message_id,
+                "last_message_at": utils.to_dict(row.last_message_at),
+                "unread_by_admin": row.unread or 0,
+                "unread_by_journey": {
+                    journey_id: unread
+                    for journey_id, (_, unread) in journey_reads[row.id].items()
+                },
+                "read_at_by_journey": {
+                    journey_id: utils.to_dict(read_at)
+                    for journey_id, (read_at, _) in journey_reads[row.id].items()
+                },
+            }
+            for row in session.execute(query)
+        ]
+
 
 class ChatJourney(Base):
     __tablename__ = "chat_journey"
@@ -92,6 +233,12 @@ class ChatJourney(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # used by the (chat_id, id) cursors of the paginated message history
+        Index("ix_chat_messages_chat_id_id", "chat_id", "id"),
+        # used to load the history by date and to count unread messages
+        Index("ix_chat_messages_chat_id_created_at", "chat_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
 
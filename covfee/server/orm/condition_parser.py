@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Dict
 from pyparsing import (
     Word,
@@ -11,29 +12,35 @@ from pyparsing import (
     oneOf,
 )
 
-# Define basic elements (operands)
-identifier = oneOf(["NOW", "N", "NJOURNEYS"], caseless=True)
-number = Word(nums)
-operand = identifier | number
 
-# Define operators
-comparison_operator = oneOf("< <= > >=")
-and_operator = CaselessKeyword("AND")
-or_operator = CaselessKeyword("OR")
-not_operator = CaselessKeyword("NOT")
+@lru_cache(maxsize=None)
+def get_expression_grammar():
+    """Builds the grammar on first use, as it is slow to build"""
+    # Define basic elements (operands)
+    identifier = oneOf(["NOW", "N", "NJOURNEYS"], caseless=True)
+    number = Word(nums)
+    operand = identifier | number
+
+    # Define operators
+    comparison_operator = oneOf("< <= > >=")
+    and_operator = CaselessKeyword("AND")
+    or_operator = CaselessKeyword("OR")
+    not_operator = CaselessKeyword("NOT")
+
+    # Grammar definition using infixNotation
+    return infixNotation(
+        operand,
+        [
+            (comparison_operator, 2, opAssoc.LEFT),  # Comparison operators
+            (not_operator, 1, opAssoc.RIGHT),  # NOT operator - unary, right associative
+            (and_operator, 2, opAssoc.LEFT),  # AND operator
+            (or_operator, 2, opAssoc.LEFT),  # OR operator
+        ],
+    )
 
-# Grammar definition using infixNotation
-expression = infixNotation(
-    operand,
-    [
-        (comparison_operator, 2, opAssoc.LEFT),  # Comparison operators
-        (not_operator, 1, opAssoc.RIGHT),  # NOT operator - unary, right associative
-        (and_operator, 2, opAssoc.LEFT),  # AND operator
-        (or_operator, 2, opAssoc.LEFT),  # OR operator
-    ],
-)
 
-parse_expression = expression.parseString
+def parse_expression(expression: str):
+    return get_expression_grammar().parseString(expression)
 
 
 def eval_expression(parsed, var_values):
@@ -0,0 +1,52 @@
+"""Deferred columns.
+
+The large JSON columns (TaskSpec.spec, TaskResponse.state, Annotation.data_json,
+JourneyInstance.interface and JourneyInstance.aux) are declared with
+deferred=True: they are not loaded with their rows, but when first accessed, or
+along with the rows by queries with the undefer() option.
+
+Base.to_dict leaves them out. The to_dict methods returning them take a with_*
+argument, and the code paths using them undefer them in their queries. Setting a
+deferred column does not load its previous value.
+
+record_deferred_loads() records the deferred columns loaded meanwhile, to check
+that the listing endpoints don't load them (see tests/test_deferred.py).
+"""
+
+from contextlib import contextmanager
+from typing import FrozenSet, Iterator, List
+
+from sqlalchemy import event, inspect
+
+
+def get_deferred_keys(model: type) -> FrozenSet[str]:
+    """Returns the keys of the deferred columns of model"""
+    return frozenset(prop.key for prop in inspect(model).column_attrs if prop.deferred)
+
+
+@contextmanager
+def record_deferred_loads(base: type) -> Iterator[List[str]]:
+    """Records the deferred columns of the subclasses of base loaded within the
+    context, as a list of "Model.column" names (with repetitions).
+    """
+    loads = []
+
+    def record(target, keys):
+        deferred = get_deferred_keys(type(target))
+        loads.extend(f"{type(target).__name__}.{k}" for k in keys if k in deferred)
+
+    def receive_load(target, context):
+        # undeferred by the query
+        record(target, inspect(target).dict.keys())
+
+    def receive_refresh(target, context, attrs):
+        # loaded on access
+        record(target, attrs if attrs is not None else inspect(target).dict.keys())
+
+    event.listen(base, "load", receive_load, propagate=True)
+    event.listen(base, "refresh", receive_refresh, propagate=True)
+    try:
+        yield loads
+    finally:
+        event.remove(base, "load", receive_load)
+        event.remove(base, "refresh", receive_refresh)
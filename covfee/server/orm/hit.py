@@ -36,6 +36,10 @@ class HITSpec(Base):
     # the database. It's a string as it is intended to be human-readable
     global_unique_id: Mapped[Optional[str]] = mapped_column(unique=True)
 
+    # Hash of the spec this HIT was created from, used by "covfee make" to match
+    # HITs without global_unique_id and to detect changed specs.
+    fingerprint: Mapped[Optional[str]] = mapped_column(index=True)
+
     project_id: Mapped[int] = mapped_column(ForeignKey("projects.id"))
     # project_id = Column(Integer, ForeignKey("projects.name"))
     project: Mapped[Project] = relationship(back_populates="hitspecs")
@@ -236,7 +240,9 @@ class HITInstance(Base):
             instance_dict["nodes"] = [n.to_dict() for n in nodes]
 
             # get the journeys
-            instance_dict["journeys"] = [j.to_dict() for j in self.journeys]
+            instance_dict["journeys"] = [
+                j.to_dict(with_interface=False) for j in self.journeys
+            ]
 
         return instance_dict
 
@@ -18,6 +18,8 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .annotator import Annotator
 from .base import Base
 from .chat import Chat, ChatJourney
+from .mutable import MutableJSON
+from .types import CompressedJSON
 from .node import JourneyNode, JourneySpecNodeSpec
 
 if TYPE_CHECKING:
@@ -36,6 +38,10 @@ class JourneySpec(Base):
     # the database. It's a string as it is intended to be human-readable
     global_unique_id: Mapped[Optional[str]] = mapped_column(unique=True)
 
+    # Hash of the spec this journey was created from, used by "covfee make" to match
+    # journeys without global_unique_id and to detect changed specs.
+    fingerprint: Mapped[Optional[str]] = mapped_column(index=True)
+
     # Indicates whether this journey will be linked to the given study id
     # from prolific academic, such that when annotators are assigned journeys
     # , it will only assign journeys corresponding to the same study id as the
@@ -110,11 +116,13 @@ class JourneyInstance(Base):
     id: Mapped[bytes] = mapped_column(primary_key=True)
 
     # one JourneySpec -> many JourneyInstance
-    journeyspec_id: Mapped[int] = mapped_column(ForeignKey("journeyspecs.id"))
+    journeyspec_id: Mapped[int] = mapped_column(
+        ForeignKey("journeyspecs.id"), index=True
+    )
     spec: Mapped[JourneySpec] = relationship(back_populates="journeys")
 
     # one HitInstance -> many JourneyInstance
-    hit_id: Mapped[bytes] = mapped_column(ForeignKey("hitinstances.id"))
+    hit_id: Mapped[bytes] = mapped_column(ForeignKey("hitinstances.id"), index=True)
     hit: Mapped[HITInstance] = relationship(back_populates="journeys")
 
     # primary chat associated to this journey
@@ -140,7 +148,7 @@ class JourneyInstance(Base):
         creator=lambda obj: JourneyNode(node=obj),
     )
 
-    interface: Mapped[Dict[str, Any]] = mapped_column()
+    interface: Mapped[Dict[str, Any]] = mapped_column(deferred=True)
 
     # submitted = Mapped[bool]
 
@@ -148,7 +156,7 @@ class JourneyInstance(Base):
     # one NodeInstance -> many JourneyInstance
     curr_node_index: Mapped[Optional[int]]
     curr_node_id: Mapped[int] = mapped_column(
-        ForeignKey("nodeinstances.id"), nullable=True
+        ForeignKey("nodeinstances.id"), nullable=True, index=True
     )
     num_connections: Mapped[int] = mapped_column(default=0)
     curr_node: Mapped[NodeInstance] = relationship(back_populates="curr_journeys")
@@ -157,7 +165,10 @@ class JourneyInstance(Base):
     status: Mapped[JourneyInstanceStatus] = mapped_column(
         default=JourneyInstanceStatus.INIT
     )
-    aux: Mapped[Dict[str, Any]]  # json state associated to the journey
+    # json state associated to the journey
+    aux: Mapped[Dict[str, Any]] = mapped_column(
+        MutableJSON.as_mutable(CompressedJSON()), deferred=True
+    )
 
     instance_counter = 0
 
@@ -246,10 +257,20 @@ class JourneyInstance(Base):
             self.submitted_at = datetime.datetime.now()
             return True, None
 
-    def to_dict(self, with_nodes=False, with_response_info=False):
+    def to_dict(
+        self,
+        with_nodes=False,
+        with_response_info=False,
+        with_specs=True,
+        with_interface=True,
+    ):
         instance_dict = super().to_dict()
         spec_dict = self.spec.to_dict()
 
+        if with_interface:
+            instance_dict["interface"] = self.interface
+            instance_dict["aux"] = self.aux
+
         # merge hit and instance dicts
         instance_dict = {
             **spec_dict,
@@ -260,7 +281,7 @@ class JourneyInstance(Base):
         }
 
         if with_nodes:
-            nodes = [n.to_dict() for n in self.nodes]
+            nodes = [n.to_dict(with_spec=with_specs) for n in self.nodes]
             for i, n in enumerate(nodes):
                 n["index"] = i
                 n["journey_id"] = self.id.hex()
@@ -0,0 +1,89 @@
+"""Minimal JSON patch (RFC 6902) diff and apply, for JSON documents (dicts, lists and
+scalars). Only the add, remove and replace operations are produced and supported.
+"""
+
+import copy
+from typing import Any, Dict, List
+
+Patch = List[Dict[str, Any]]
+
+
+def escape(key) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(src: Any, dst: Any, path: str = "") -> Patch:
+    """Returns the operations that turn src into dst (an empty list if equal)"""
+    if isinstance(src, dict) and isinstance(dst, dict):
+        patch = []
+        for key in src:
+            if key not in dst:
+                patch.append({"op": "remove", "path": f"{path}/{escape(key)}"})
+        for key, value in dst.items():
+            key_path = f"{path}/{escape(key)}"
+            if key in src:
+                patch += make_patch(src[key], value, key_path)
+            else:
+                patch.append({"op": "add", "path": key_path, "value": value})
+        return patch
+
+    if isinstance(src, list) and isinstance(dst, list):
+        patch = []
+        common = min(len(src), len(dst))
+        for i in range(common):
+            patch += make_patch(src[i], dst[i], f"{path}/{i}")
+        # removed from the end first, so that indexes stay valid
+        for i in reversed(range(common, len(src))):
+            patch.append({"op": "remove", "path": f"{path}/{i}"})
+        for i in range(common, len(dst)):
+            patch.append({"op": "add", "path": f"{path}/{i}", "value": dst[i]})
+        return patch
+
+    # in JSON, true != 1 and 1 != 1.0, unlike in python
+    if type(src) is type(dst) and src == dst:
+        return []
+    return [{"op": "replace", "path": path, "value": dst}]
+
+
+def apply_patch(doc: Any, patch: Patch) -> Any:
+    """Applies a patch to doc, modifying it in place. Returns the patched document,
+    which is a new object if the root was replaced.
+    """
+    for operation in patch:
+        op, path = operation["op"], operation["path"]
+        value = copy.deepcopy(operation.get("value", None))
+        if path == "":
+            if op == "remove":
+                doc = None
+            else:
+                doc = value
+            continue
+
+        tokens = [unescape(t) for t in path.split("/")[1:]]
+        parent = doc
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+
+        if isinstance(parent, list):
+            index = len(parent) if last == "-" else int(last)
+            if op == "add":
+                parent.insert(index, value)
+            elif op == "remove":
+                del parent[index]
+            elif op == "replace":
+                parent[index] = value
+            else:
+                raise ValueError(f"Unsupported JSON patch operation {op}.")
+        else:
+            if op in ["add", "replace"]:
+                parent[last] = value
+            elif op == "remove":
+                del parent[last]
+            else:
+                raise ValueError(f"Unsupported JSON patch operation {op}.")
+    return doc
@@ -0,0 +1,325 @@
+"""Mutable JSON column values.
+
+Columns declared with MutableJSON.as_mutable(...) hold MutableJSONDict or
+MutableJSONList values, which track in-place changes (eg.
+`node.settings["n_start"] = 1`) so that they are persisted, like a reassignment.
+
+Changes are tracked by path. On SQLite, a value changed in place is then updated
+with json_set / json_remove on the changed paths only, instead of rewriting the
+whole value. Reassigned values, other databases, and values stored compressed
+(see CompressedJSON) are written whole.
+
+Containers nested in a value are tracked once accessed by key or index (`d[k]`,
+`d.get(k)`, `d.setdefault(k)`, `lst[i]`). Containers reached by iterating over a
+value (`d.items()`, `for item in lst`) are not, so they must be changed through
+their parent instead. Changes inside a list are tracked as a change of the
+whole list.
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.ext.mutable import Mutable
+from sqlalchemy.orm import attributes
+
+from .types import CompressedJSON
+
+Path = Tuple[Any, ...]
+
+# above this number of changed paths, values are written whole
+MAX_PARTIAL_PATHS = 32
+
+
+class MutableJSON(Mutable):
+    """Base class of the mutable JSON containers"""
+
+    # containing MutableJSON, or None for a column value
+    _parent: Optional["MutableJSON"] = None
+    # key in the parent. None for the items of a list, which are tracked as a
+    # change of the whole list
+    _key: Any = None
+
+    @classmethod
+    def coerce(cls, key, value):
+        if value is None or isinstance(value, MutableJSON):
+            return value
+        if isinstance(value, dict):
+            return MutableJSONDict(value)
+        if isinstance(value, list):
+            return MutableJSONList(value)
+        return Mutable.coerce(key, value)
+
+    def __reduce_ex__(self, proto):
+        # copies and pickles are plain JSON values
+        return (self._plain_type, (self._plain_type(self),))
+
+    def _attach(self, key, value):
+        if type(value) is dict or type(value) is list:
+            child = MutableJSON.coerce(key, value)
+            self._plain_type.__setitem__(self, key, child)
+            value = child
+        if isinstance(value, MutableJSON):
+            value._parent = self
+            value._key = None if isinstance(self, list) else key
+        return value
+
+    def _detach(self, value):
+        if isinstance(value, MutableJSON) and value._parent is self:
+            value._parent = None
+
+    def _changed(self, key=None):
+        """Marks self[key], or self if key is None, as changed"""
+        keys = [] if key is None else [key]
+        node = self
+        while node._parent is not None:
+            if isinstance(node._parent, list):
+                keys = []
+            else:
+                keys.append(node._key)
+            node = node._parent
+        node._mark_dirty(tuple(reversed(keys)))
+        node.changed()
+
+    def _mark_dirty(self, path: Path):
+        if "_dirty_paths" not in self.__dict__:
+            self._dirty_paths = set()
+        self._dirty_paths.add(path)
+
+    def get_dirty_paths(self) -> List[Path]:
+        """Paths changed since the value was loaded or last flushed, excluding the
+        paths inside other changed paths. [()] if the value changed as a whole.
+        """
+        paths = sorted(self.__dict__.get("_dirty_paths", ()), key=len)
+        result = []
+        for path in paths:
+            if not any(path[: len(prefix)] == prefix for prefix in result):
+                result.append(path)
+        return result
+
+    def clear_dirty_paths(self):
+        self.__dict__.pop("_dirty_paths", None)
+
+    @classmethod
+    def associate_with_attribute(cls, attribute):
+        super().associate_with_attribute(attribute)
+        _listen_for_partial_updates(attribute)
+
+
+class MutableJSONDict(MutableJSON, dict):
+    _plain_type = dict
+
+    def __getitem__(self, key):
+        return self._attach(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def __setitem__(self, key, value):
+        self._detach(dict.get(self, key))
+        dict.__setitem__(self, key, value)
+        self._attach(key, value)
+        self._changed(key)
+
+    def __delitem__(self, key):
+        self._detach(dict.get(self, key))
+        dict.__delitem__(self, key)
+        self._changed(key)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *args):
+        if key not in self:
+            return dict.pop(self, key, *args)
+        value = dict.pop(self, key)
+        self._detach(value)
+        self._changed(key)
+        return value
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        self._detach(value)
+        self._changed(key)
+        return key, value
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        for value in dict.values(self):
+            self._detach(value)
+        dict.clear(self)
+        self._changed()
+
+
+class MutableJSONList(MutableJSON, list):
+    _plain_type = list
+
+    def __getitem__(self, index):
+        value = list.__getitem__(self, index)
+        if isinstance(index, slice):
+            return value
+        return self._attach(index, value)
+
+    def __setitem__(self, index, value):
+        removed = list.__getitem__(self, index)
+        for item in removed if isinstance(index, slice) else [removed]:
+            self._detach(item)
+        list.__setitem__(self, index, value)
+        if not isinstance(index, slice):
+            self._attach(index, value)
+        self._changed()
+
+    def __delitem__(self, index):
+        removed = list.__getitem__(self, index)
+        for item in removed if isinstance(index, slice) else [removed]:
+            self._detach(item)
+        list.__delitem__(self, index)
+        self._changed()
+
+    def append(self, value):
+        list.append(self, value)
+        self._changed()
+
+    def extend(self, values):
+        list.extend(self, values)
+        self._changed()
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def __imul__(self, n):
+        list.__imul__(self, n)
+        self._changed()
+        return self
+
+    def insert(self, index, value):
+        list.insert(self, index, value)
+        self._changed()
+
+    def pop(self, *args):
+        value = list.pop(self, *args)
+        self._detach(value)
+        self._changed()
+        return value
+
+    def remove(self, value):
+        index = self.index(value)
+        del self[index]
+
+    def clear(self):
+        del self[:]
+
+    def sort(self, **kwargs):
+        list.sort(self, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        list.reverse(self)
+        self._changed()
+
+
+def get_path(value, path: Path):
+    for key in path:
+        value = dict.__getitem__(value, key)
+    return value
+
+
+def get_partial_update(column, value: MutableJSON, paths: List[Path]):
+    """Returns a SQLite expression applying the changed paths of value to column,
+    or None if the value must be written whole.
+    """
+    if len(paths) == 0 or len(paths) > MAX_PARTIAL_PATHS or () in paths:
+        return None
+
+    removed, changed = [], []
+    for path in paths:
+        # keys are written as quoted labels, which can't contain quotes
+        if any(not isinstance(key, str) or '"' in key for key in path):
+            return None
+        json_path = "$" + "".join(f'."{key}"' for key in path)
+        try:
+            current = get_path(value, path)
+        except (KeyError, TypeError):
+            removed.append(json_path)
+            continue
+        try:
+            # SQLite rejects NaN and Infinity
+            encoded = json.dumps(current, allow_nan=False)
+        except ValueError:
+            return None
+        changed += [json_path, func.json(encoded)]
+
+    expression = column
+    if len(removed) > 0:
+        expression = func.json_remove(expression, *removed)
+    if len(changed) > 0:
+        expression = func.json_set(expression, *changed)
+    return expression
+
+
+def is_stored_as_text(connection, mapper, column, target) -> bool:
+    primary_key = mapper.primary_key_from_instance(target)
+    stored_type = connection.execute(
+        select(func.typeof(column)).where(
+            *[c == v for c, v in zip(column.table.primary_key.columns, primary_key)]
+        )
+    ).scalar()
+    return stored_type == "text"
+
+
+def _listen_for_partial_updates(attribute):
+    key = attribute.key
+    column = attribute.property.columns[0]
+
+    @event.listens_for(attribute, "set", retval=True, propagate=True)
+    def receive_set(target, value, oldvalue, initiator):
+        value = MutableJSON.coerce(key, value)
+        if isinstance(value, MutableJSON):
+            value._mark_dirty(())
+        return value
+
+    @event.listens_for(attribute.class_, "before_update", propagate=True)
+    def receive_before_update(mapper, connection, target):
+        if connection.dialect.name != "sqlite":
+            return
+        state = inspect(target)
+        value = state.dict.get(key)
+        if key not in state.committed_state or not isinstance(value, MutableJSON):
+            return
+
+        expression = get_partial_update(column, value, value.get_dirty_paths())
+        if expression is None:
+            return
+        # compressed values are BLOBs, which json_set can't update
+        if isinstance(column.type, CompressedJSON) and not is_stored_as_text(
+            connection, mapper, column, target
+        ):
+            return
+        # the value is restored after the update (instead of being expired)
+        state.info.setdefault("mutable_json_values", {})[key] = value
+        state.dict[key] = expression
+
+    def receive_after_flush(mapper, connection, target):
+        state = inspect(target)
+        value = state.info.get("mutable_json_values", {}).pop(key, None)
+        if value is not None:
+            attributes.set_committed_value(target, key, value)
+        else:
+            value = state.dict.get(key)
+        if isinstance(value, MutableJSON):
+            value.clear_dirty_paths()
+
+    event.listen(attribute.class_, "after_insert", receive_after_flush, propagate=True)
+    event.listen(attribute.class_, "after_update", receive_after_flush, propagate=True)
@@ -1,24 +1,32 @@
 from __future__ import annotations
 
 import enum
+import hashlib
+import json
 from datetime import datetime, timedelta
-from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional
 
 from flask import current_app as app
 from sqlalchemy import ForeignKey, event
 from sqlalchemy.ext.associationproxy import AssociationProxy, association_proxy
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from covfee.logger import get_logger
 from covfee.server.scheduler.timers import TimerName, schedule_timer, stop_timer
+from covfee.server.serialization import json_serializer
 
 from .base import Base
 from .chat import Chat
 from .condition_parser import eval_string
+from .mutable import MutableJSON
+from .types import CompressedJSON
 
 if TYPE_CHECKING:
     from .hit import HITInstance, HITSpec
     from .journey import JourneyInstance, JourneySpec
 
+log = get_logger(__name__)
+
 
 class JourneySpecNodeSpec(Base):
     __tablename__ = "journeyspec_nodespec"
@@ -44,7 +52,7 @@ class JourneyNode(Base):
         ForeignKey("journeyinstances.id"), primary_key=True
     )
     node_id: Mapped[int] = mapped_column(
-        ForeignKey("nodeinstances.id"), primary_key=True
+        ForeignKey("nodeinstances.id"), primary_key=True, index=True
     )
 
     journey: Mapped[JourneyInstance] = relationship(back_populates="node_associations")
@@ -55,6 +63,19 @@ class JourneyNode(Base):
     ready: Mapped[bool] = mapped_column(default=False)
 
 
+class SerializedSpec(NamedTuple):
+    # content hash of the encoded spec, used as ETag and for cache-busting
+    hash: str
+    payload: Dict[str, Any]
+    # JSON-encoded payload, as served by the nodespecs endpoint
+    encoded: bytes
+
+
+# Specs do not change after covfee make. Their serialized form is therefore
+# cached in-process, by NodeSpec id.
+spec_cache: Dict[int, SerializedSpec] = {}
+
+
 class NodeSpec(Base):
     __tablename__ = "nodespecs"
 
@@ -66,7 +87,9 @@ class NodeSpec(Base):
         "polymorphic_on": "type",
     }
 
-    settings: Mapped[Dict[str, Any]]  # json
+    settings: Mapped[Dict[str, Any]] = mapped_column(
+        MutableJSON.as_mutable(CompressedJSON())
+    )  # json
 
     hitspec_id: Mapped[int] = mapped_column(ForeignKey("hitspecs.id"))
     hitspec: Mapped[HITSpec] = relationship(back_populates="nodespecs")
@@ -99,13 +122,38 @@ class NodeSpec(Base):
         journey.append(self)
         return journey
 
-    def to_dict(self):
+    def make_spec_dict(self):
         spec_dict = super().to_dict()
         settings = spec_dict["settings"]
         del spec_dict["settings"]
         spec_dict["customApiBase"] = None
         return {**spec_dict, **settings}
 
+    def get_serialized_spec(self) -> SerializedSpec:
+        """Returns the (cached) serialized spec and its content hash"""
+        serialized = spec_cache.get(self.id)
+        if serialized is not None:
+            return serialized
+
+        payload = self.make_spec_dict()
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+        serialized = SerializedSpec(
+            hashlib.sha256(encoded).hexdigest()[:32], payload, encoded
+        )
+        # specs are only cached once they have been persisted
+        if self.id is not None:
+            spec_cache[self.id] = serialized
+        return serialized
+
+    def get_spec_url(self):
+        spec_hash = self.get_serialized_spec().hash
+        return f'{app.config["API_URL"]}/nodespecs/{self.id}?v={spec_hash}'
+
+    def to_dict(self):
+        # decoded from the cached encoding: callers may modify the dict, and this is
+        # faster than a deep copy of the cached payload
+        return json_serializer.loads(self.get_serialized_spec().encoded)
+
 
 class NodeInstanceStatus(enum.Enum):
     # task has been initialized.
@@ -146,7 +194,7 @@ class NodeInstance(Base):
     type: Mapped[str]
 
     # spec relationships
-    nodespec_id: Mapped[int] = mapped_column(ForeignKey("nodespecs.id"))
+    nodespec_id: Mapped[int] = mapped_column(ForeignKey("nodespecs.id"), index=True)
     spec: Mapped[NodeSpec] = relationship(back_populates="nodes")
 
     # instance relationships
@@ -160,7 +208,7 @@ class NodeInstance(Base):
     )
 
     # one HitInstance -> many JourneyInstance
-    hit_id: Mapped[bytes] = mapped_column(ForeignKey("hitinstances.id"))
+    hit_id: Mapped[bytes] = mapped_column(ForeignKey("hitinstances.id"), index=True)
     hit: Mapped[HITInstance] = relationship(back_populates="nodes")
 
     # status: journeys currently at this node
@@ -376,11 +424,10 @@ class NodeInstance(Base):
 
     def check_timer(self, timer: TimerName):
         """State transitions caused by timers."""
-        print(f"check_timer called with timer={timer}")
+        log.debug("node.check_timer", node_id=self.id, timer=timer)
         if self.status == NodeInstanceStatus.FINISHED:
-            app.logger.warn(
-                "check_timers called after task finished. Some timers not cancelled?"
-            )
+            # some timers were not cancelled?
+            log.warning("node.check_timer_after_finish", node_id=self.id, timer=timer)
         # check timers
         if timer == "finish":
             if self.check_timer_finish():
@@ -463,22 +510,30 @@ class NodeInstance(Base):
         else:
             return self.status
 
-    def to_dict(self):
+    def to_dict(self, with_spec=True):
+        """
+        Args:
+            with_spec (bool, optional): Whether to merge the node spec into the dict.
+                When False, the spec must be fetched separately through spec_url, which
+                is cacheable by clients. Defaults to True.
+        """
         instance_dict = super().to_dict()
-        spec_dict = self.spec.to_dict()
+        spec_dict = self.spec.to_dict() if with_spec else {}
 
         # merge spec and instance dicts
 
         instance_dict = {
             **spec_dict,
             **instance_dict,
+            "spec_hash": self.spec.get_serialized_spec().hash,
+            "spec_url": self.spec.get_spec_url(),
             "chat_id": self.chat.id,
             "url": f'{app.config["API_URL"]}/nodes/{self.id}',
             "journeys": self.make_journey_status_dict(),
         }
 
         # mask status using manual status
-        instance_dict["status"] = self.get_masked_status()
+        instance_dict["status"] = self.get_masked_status().name
 
         return instance_dict
 
@@ -489,6 +544,17 @@ class NodeInstance(Base):
         return {}
 
 
+@event.listens_for(NodeSpec.settings, "set", propagate=True)
+def receive_settings_set(target: NodeSpec, value, oldvalue, initiator):
+    spec_cache.pop(target.id, None)
+
+
+@event.listens_for(NodeSpec.settings, "modified", propagate=True)
+def receive_settings_modified(target: NodeSpec, initiator):
+    # changed in place
+    spec_cache.pop(target.id, None)
+
+
 @event.listens_for(NodeSpec, "before_insert", propagate=True)
 def receive_before_insert(mapper, connection, target: NodeSpec):
     # set the n_start and n_pause variables
@@ -4,7 +4,6 @@ import json
 from pprint import pformat
 from typing import TYPE_CHECKING, List
 
-import pandas as pd
 from sqlalchemy import select
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -35,6 +34,8 @@ class Project(Base):
         self.hitspecs = hitspecs
 
     def get_dataframe(self):
+        import pandas as pd
+
         rows = list()
         for hit in self.hitspecs:
             for instance in hit.instances:
@@ -2,16 +2,15 @@ from __future__ import annotations
 import datetime
 from typing import TYPE_CHECKING, Dict, Any, Optional
 
-import numpy as np
 from flask import current_app as app
 from sqlalchemy import ForeignKey
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 
 from covfee.server.orm.node import NodeInstanceStatus
 
-from .. import tasks
 from .base import Base
-from ..tasks.base import BaseCovfeeTask
+from .mutable import MutableJSON
+from .types import CompressedJSON
 
 if TYPE_CHECKING:
     from .task import TaskInstance
@@ -25,11 +24,18 @@ class TaskResponse(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
 
     # instance relationships
-    node_id: Mapped[int] = mapped_column(ForeignKey("nodeinstances.id"))
-    task: Mapped["TaskInstance"] = relationship(back_populates="responses")
+    node_id: Mapped[int] = mapped_column(ForeignKey("nodeinstances.id"), index=True)
+    task: Mapped["TaskInstance"] = relationship(
+        back_populates="responses", foreign_keys=[node_id]
+    )
     # node_id = Column(Integer, ForeignKey('nodeinstances.id'))
 
-    state: Mapped[Dict[str, Any]]  # holds the shared state of the task
+    # holds the shared state of the task
+    state: Mapped[Dict[str, Any]] = mapped_column(
+        MutableJSON.as_mutable(CompressedJSON()), deferred=True
+    )
+    # latest version of the state in its history (see state_history)
+    state_version: Mapped[int] = mapped_column(default=0)
     submitted: Mapped[bool]
     valid: Mapped[bool]
     # data: Mapped[Dict[str, Any]]
@@ -53,9 +59,10 @@ class TaskResponse(Base):
         self.valid = False
         self.state = None
 
-    def to_dict(self):
+    def to_dict(self, with_state=True):
         response_dict = super().to_dict()
-        response_dict = {**response_dict}
+        if with_state:
+            response_dict["state"] = self.state
         response_dict[
             "url"
         ] = f'{app.config["API_URL"]}/responses/{response_dict["id"]}'
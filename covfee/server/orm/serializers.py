@@ -0,0 +1,111 @@
+"""Serializers of the columns of the ORM models, used by Base.to_dict.
+
+A serializer is built once per model (when its mapper is configured) instead of
+inspecting the columns and the type of every value on every call. Values are
+converted as by utils.to_dict, with a converter chosen from the column type:
+bytes as hex, enums by name and dates with str(). Other columns are returned as
+they are.
+
+Deferred columns are left out, unless requested in fields: the to_dict methods
+returning them add them, see deferred.
+"""
+
+import operator
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import types
+
+from . import utils
+from .deferred import get_deferred_keys
+from .types import CompressedJSON
+
+# columns of these types hold JSON values, returned as they are
+PLAIN_TYPES = (
+    types.Integer,
+    types.Float,
+    types.Numeric,
+    types.String,
+    types.Boolean,
+    types.JSON,
+    CompressedJSON,
+)
+
+
+def get_converter(column) -> Optional[Callable[[Any], Any]]:
+    """Returns the function converting the (non-null) values of column, or None if
+    they are returned as they are.
+    """
+    column_type = column.type
+    if isinstance(column_type, types.Enum) and column_type.enum_class is not None:
+        return operator.attrgetter("name")
+    if isinstance(column_type, types.LargeBinary):
+        return bytes.hex
+    if isinstance(column_type, (types.Date, types.DateTime)):
+        return str
+    if isinstance(column_type, PLAIN_TYPES):
+        return None
+    return utils.to_dict
+
+
+class ColumnSerializer:
+    """Serializes the columns of a model, in table order"""
+
+    def __init__(self, columns: Iterable, fields: Optional[Iterable[str]] = None):
+        if fields is not None:
+            fields = set(fields)
+            columns = [c for c in columns if c.name in fields]
+        self.names = tuple(c.name for c in columns)
+        # positions of the values to convert
+        self.converters = tuple(
+            (i, converter)
+            for i, converter in enumerate(get_converter(c) for c in columns)
+            if converter is not None
+        )
+        if len(self.names) == 1:
+            name = self.names[0]
+            self.get_loaded = lambda state: (state[name],)
+            self.get_values = lambda instance: (getattr(instance, name),)
+        elif len(self.names) > 1:
+            self.get_loaded = operator.itemgetter(*self.names)
+            self.get_values = operator.attrgetter(*self.names)
+        else:
+            self.get_loaded = self.get_values = lambda _: ()
+
+    def __call__(self, instance) -> Dict[str, Any]:
+        try:
+            # loaded values are read directly, without the attribute descriptors
+            values = self.get_loaded(instance.__dict__)
+        except KeyError:
+            # expired or deferred columns are loaded by the attributes
+            values = self.get_values(instance)
+        if len(self.converters) > 0:
+            values = list(values)
+            for i, converter in self.converters:
+                if values[i] is not None:
+                    values[i] = converter(values[i])
+        return dict(zip(self.names, values))
+
+
+serializers: Dict[Tuple[type, Optional[Tuple[str, ...]]], ColumnSerializer] = {}
+
+
+def get_serializer(
+    model: type, fields: Optional[Tuple[str, ...]] = None
+) -> ColumnSerializer:
+    """Returns the serializer of the (non-deferred) columns of model, or only of the
+    given fields
+    """
+    key = (model, fields)
+    serializer = serializers.get(key)
+    if serializer is None:
+        columns = model.__table__.columns
+        if fields is None:
+            deferred = get_deferred_keys(model)
+            columns = [c for c in columns if c.key not in deferred]
+        serializer = ColumnSerializer(columns, fields)
+        serializers[key] = serializer
+    return serializer
+
+
+def receive_mapper_configured(mapper, class_):
+    get_serializer(class_)
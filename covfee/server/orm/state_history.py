@@ -0,0 +1,256 @@
+"""Versioned history of the response states (TaskResponse.state).
+
+When enabled, every change of a response's state is stored as a new version: a
+JSON patch against the previous version, or a full snapshot of the state every
+STATE_HISTORY_SNAPSHOT_INTERVAL versions. Any version is rebuilt from the closest
+snapshot before it and the patches after that snapshot.
+
+Versions are added when the session is flushed, so the handlers writing
+response.state need no changes.
+"""
+
+import copy
+import datetime
+from typing import Any, Optional
+
+from sqlalchemy import ForeignKey, Index, event, inspect, select
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
+
+from covfee.logger import get_logger
+
+from .base import Base
+from .json_patch import apply_patch, make_patch
+from .response import TaskResponse
+from .types import CompressedJSON
+
+log = get_logger(__name__)
+
+
+class TaskResponseStateVersion(Base):
+    """A version of the state of a response"""
+
+    __tablename__ = "taskresponse_state_versions"
+    __table_args__ = (
+        Index(
+            "ix_taskresponse_state_versions_response_id_version",
+            "response_id",
+            "version",
+            unique=True,
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    response_id: Mapped[int] = mapped_column(
+        ForeignKey("taskresponses.id", ondelete="CASCADE")
+    )
+    response: Mapped[TaskResponse] = relationship()
+
+    # 1 for the first state of the response, then incremented by every change
+    version: Mapped[int]
+    # data is the full state if snapshot, or a JSON patch from the previous version
+    snapshot: Mapped[bool]
+    data: Mapped[Optional[Any]] = mapped_column(CompressedJSON())
+
+    created_at: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now)
+
+
+class StateHistorySettings:
+    def __init__(self):
+        self.enabled = False
+        self.snapshot_interval = 50
+        self.compact_age = 7 * 24 * 3600
+        self.compact_keep_every = 10
+
+    def configure(self, config):
+        self.enabled = config["STATE_HISTORY_ENABLED"]
+        self.snapshot_interval = max(1, config["STATE_HISTORY_SNAPSHOT_INTERVAL"])
+        self.compact_age = config["STATE_HISTORY_COMPACT_AGE"]
+        self.compact_keep_every = max(1, config["STATE_HISTORY_COMPACT_KEEP_EVERY"])
+
+
+state_history = StateHistorySettings()
+
+
+def _before_flush(session: Session, flush_context, instances):
+    if not state_history.enabled:
+        return
+
+    for response in list(session.new) + list(session.dirty):
+        if not isinstance(response, TaskResponse):
+            continue
+        history = inspect(response).attrs.state.history
+        if len(history.added) == 0:
+            continue
+        new_state = history.added[0]
+
+        if response in session.new:
+            old_state = None
+        elif len(history.deleted) > 0:
+            old_state = history.deleted[0]
+        else:
+            # the previous state was not loaded when the new one was set
+            old_state = session.execute(
+                select(TaskResponse.state).where(TaskResponse.id == response.id)
+            ).scalar_one()
+
+        patch = make_patch(old_state, new_state)
+        if len(patch) == 0:
+            continue
+
+        version = (response.state_version or 0) + 1
+        snapshot = (version - 1) % state_history.snapshot_interval == 0
+        response.state_version = version
+        session.add(
+            TaskResponseStateVersion(
+                response=response,
+                version=version,
+                snapshot=snapshot,
+                data=new_state if snapshot else patch,
+            )
+        )
+
+
+event.listen(Session, "before_flush", _before_flush)
+
+
+def get_state_version(session: Session, response_id: int, version: int = None) -> Any:
+    """Rebuilds a version of the state of a response (by default, the latest).
+    Raises ValueError if the version is not in the response's state history.
+    """
+    V = TaskResponseStateVersion
+    if version is None:
+        version = session.execute(
+            select(V.version)
+            .where(V.response_id == response_id)
+            .order_by(V.version.desc())
+            .limit(1)
+        ).scalar()
+
+    # columns instead of entities: the states are modified while patched
+    snapshot = session.execute(
+        select(V.version, V.data)
+        .where(V.response_id == response_id, V.snapshot, V.version <= version)
+        .order_by(V.version.desc())
+        .limit(1)
+    ).first()
+    if snapshot is None:
+        raise ValueError(f"Version {version} of response {response_id} not found.")
+
+    patches = session.execute(
+        select(V.version, V.data)
+        .where(
+            V.response_id == response_id,
+            V.version > snapshot.version,
+            V.version <= version,
+        )
+        .order_by(V.version)
+    ).all()
+    last_version = patches[-1].version if len(patches) > 0 else snapshot.version
+    if last_version != version:
+        raise ValueError(f"Version {version} of response {response_id} not found.")
+
+    state = snapshot.data
+    for patch in patches:
+        state = apply_patch(state, patch.data)
+    return state
+
+
+def compact_response_state_history(
+    session: Session,
+    response_id: int,
+    cutoff: datetime.datetime,
+    keep_every: int,
+    snapshot_interval: int,
+) -> int:
+    """Removes the versions of a response created before cutoff, except every
+    keep_every-th version, the first, the latest and the snapshots. The patches of
+    the versions kept are recomputed. Returns the number of versions removed.
+    """
+    versions = (
+        session.execute(
+            select(TaskResponseStateVersion)
+            .where(TaskResponseStateVersion.response_id == response_id)
+            .order_by(TaskResponseStateVersion.version)
+        )
+        .scalars()
+        .all()
+    )
+    if len(versions) == 0:
+        return 0
+    latest = versions[-1].version
+
+    state, prev_state = None, None
+    # patches since the last snapshot kept
+    chain = 0
+    removed = 0
+    for row in versions:
+        if row.snapshot:
+            state = copy.deepcopy(row.data)
+        else:
+            state = apply_patch(state, row.data)
+
+        keep = (
+            row.created_at >= cutoff
+            or row.snapshot
+            or row.version % keep_every == 0
+            or row.version in [1, latest]
+        )
+        if not keep:
+            session.delete(row)
+            removed += 1
+            continue
+
+        if row.snapshot or chain + 1 >= snapshot_interval:
+            snapshot, data, chain = True, copy.deepcopy(state), 0
+        else:
+            snapshot, data, chain = False, make_patch(prev_state, state), chain + 1
+        if row.snapshot != snapshot or row.data != data:
+            row.snapshot, row.data = snapshot, data
+        prev_state = copy.deepcopy(state)
+    return removed
+
+
+def compact_state_history(
+    session: Session, min_age: float, keep_every: int, snapshot_interval: int
+) -> int:
+    """Thins the state history of the responses, keeping one version every
+    keep_every among those older than min_age seconds.
+    Returns the number of versions removed.
+    """
+    V = TaskResponseStateVersion
+    cutoff = datetime.datetime.now() - datetime.timedelta(seconds=min_age)
+    response_ids = (
+        session.execute(
+            select(V.response_id)
+            .join(TaskResponse, TaskResponse.id == V.response_id)
+            .where(
+                V.created_at < cutoff,
+                ~V.snapshot,
+                V.version % keep_every != 0,
+                V.version != 1,
+                V.version != TaskResponse.state_version,
+            )
+            .distinct()
+        )
+        .scalars()
+        .all()
+    )
+    removed = 0
+    for response_id in response_ids:
+        removed += compact_response_state_history(
+            session, response_id, cutoff, keep_every, snapshot_interval
+        )
+    return removed
+
+
+def compact_state_history_job():
+    """Scheduler job compacting the state history with the configured settings"""
+    with TaskResponse.sessionmaker() as session:
+        removed = compact_state_history(
+            session,
+            state_history.compact_age,
+            state_history.compact_keep_every,
+            state_history.snapshot_interval,
+        )
+        session.commit()
+    log.info("state_history.compacted", removed=removed)
@@ -1,18 +1,28 @@
 from __future__ import annotations
 
 from pprint import pformat
-from typing import Any, Dict, List
-
-from sqlalchemy import event
-from sqlalchemy.orm import Mapped, object_session, relationship
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import ForeignKey, event
+from sqlalchemy.orm import (
+    Mapped,
+    Session,
+    attributes,
+    mapped_column,
+    object_session,
+    relationship,
+    undefer,
+)
 
 from covfee.shared.schemata import schemata
 
-from .. import tasks
 from ..tasks.base import BaseCovfeeTask
+from ..tasks.registry import get_task_class
 from . import utils
-from .node import NodeInstance, NodeInstanceStatus, NodeSpec
+from .node import NodeInstance, NodeInstanceStatus, NodeSpec, spec_cache
 from .response import TaskResponse
+from .mutable import MutableJSON
+from .types import CompressedJSON
 
 
 class TaskSpec(NodeSpec):
@@ -20,7 +30,10 @@ class TaskSpec(NodeSpec):
         "polymorphic_identity": "TaskSpec",
     }
 
-    spec: Mapped[Dict[str, Any]]
+    # deferred: see task_type
+    spec: Mapped[Dict[str, Any]] = mapped_column(
+        MutableJSON.as_mutable(CompressedJSON()), deferred=True
+    )
 
     def __init__(self, spec=None):
         # split spec into node settings and task spec
@@ -39,11 +52,24 @@ class TaskSpec(NodeSpec):
         self.nodes.append(instance)
         return instance
 
+    @property
+    def task_type(self) -> str:
+        """Type of the task. Read from the cached serialized spec, without loading
+        the spec when it is cached.
+        """
+        return self.get_serialized_spec().payload["spec"]["type"]
+
+    @property
+    def spec_version(self) -> int:
+        """Incremented every time the spec attribute is set"""
+        return self.__dict__.get("_spec_version", 0)
+
     def validate(str):
         pass
 
-    def to_dict(self):
-        res = super().to_dict()
+    def make_spec_dict(self):
+        res = super().make_spec_dict()
+        res["spec"] = self.spec
         # url of the custom API of this task type (if any)
         res["customApiBase"] = f'/custom/{self.spec["type"]}'
         return res
@@ -55,13 +81,39 @@ class TaskSpec(NodeSpec):
         return pformat({"settings": self.settings, "spec": self.spec})
 
 
+def get_session_token(session: Optional[Session]) -> Optional[object]:
+    """Token identifying a session, kept in its info dict. Unlike id(session), it
+    is never reused by another session while it is referenced.
+    """
+    if session is None:
+        return None
+    return session.info.setdefault("covfee_session_token", object())
+
+
 class TaskInstance(NodeInstance):
     __mapper_args__ = {
         "polymorphic_identity": "TaskInstance",
     }
 
     responses: Mapped[List[TaskResponse]] = relationship(
-        back_populates="task", cascade="all, delete-orphan"
+        back_populates="task",
+        cascade="all, delete-orphan",
+        foreign_keys=[TaskResponse.node_id],
+    )
+
+    # latest response (responses[-1]), maintained by add_response
+    # lets handlers load (or only reference) that response without loading all of
+    # them. use_alter/post_update: taskresponses also references nodeinstances
+    curr_response_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey(
+            "taskresponses.id",
+            use_alter=True,
+            name="fk_nodeinstances_curr_response_id",
+        ),
+        nullable=True,
+    )
+    curr_response: Mapped[Optional[TaskResponse]] = relationship(
+        foreign_keys=[curr_response_id], post_update=True
     )
 
     aux: Mapped[Dict[str, Any]]  # auxiliary task specific data
@@ -111,15 +163,54 @@ class TaskInstance(NodeInstance):
         for annotation in self.annotations:
             annotation.reset_data()
 
-    def get_task_object(self):
-        task_class = getattr(tasks, self.spec.spec["type"], BaseCovfeeTask)
-        task_object = task_class(task=self, session=object_session(self))
+    def get_task_object(self) -> BaseCovfeeTask:
+        """Returns the task object of this node.
+        Task objects are cached per instance (and therefore per session, given the
+        session identity map). The cache is invalidated when the instance moves to
+        another session or when its spec is modified.
+        """
+        session = object_session(self)
+        task_class = get_task_class(self.spec.task_type)
+        cache_key = (get_session_token(session), task_class, self.spec.spec_version)
+
+        cached = self.__dict__.get("_task_object_cache", None)
+        if cached is not None and cached[0] == cache_key:
+            return cached[1]
+
+        task_object = task_class(task=self, session=session)
+        self._task_object_cache = (cache_key, task_object)
         return task_object
 
-    def to_dict(self):
+    def invalidate_task_object(self):
+        self.__dict__.pop("_task_object_cache", None)
+
+    def load_results_data(self):
+        """Loads the responses with their states and the annotations with their
+        data, in one query each instead of one per row.
+        """
+        session = object_session(self)
+        responses = (
+            session.query(TaskResponse)
+            .filter(TaskResponse.node_id == self.id)
+            .order_by(TaskResponse.id)
+            .options(undefer(TaskResponse.state))
+            .all()
+        )
+        attributes.set_committed_value(self, "responses", responses)
+        # the query completes the annotations of the collection with their data
+        # (Annotation is defined by the continuous annotation task)
+        if len(self.annotations) > 0:
+            Annotation = type(self.annotations[0])
+            session.query(Annotation).filter(Annotation.task_id == self.id).options(
+                undefer(Annotation.data_json)
+            ).all()
+
+    def to_dict(self, with_spec=True):
         task_dict = {
-            **super().to_dict(),
-            "responses": [response.to_dict() for response in self.responses],
+            **super().to_dict(with_spec=with_spec),
+            "responses": [
+                response.to_dict(with_state=False) for response in self.responses
+            ],
             "taskSpecific": self.get_task_object().get_task_specific_props(),
         }
 
@@ -130,7 +221,9 @@ class TaskInstance(NodeInstance):
 
     def add_response(self):
         response = TaskResponse()
-        self.responses.append(response)
+        # does not load the (unloaded) responses collection, unlike append()
+        response.task = self
+        self.curr_response = response
         self.status = NodeInstanceStatus.INIT
         return response
 
@@ -140,10 +233,11 @@ class TaskInstance(NodeInstance):
         return {
             "id": self.id,
             "hit_id": self.hit_id.hex(),
-            "prev": prev_status,
-            "new": self.get_masked_status(),
-            "manual": self.manual,
-            "response_id": self.responses[-1].id,
+            # enum names, as serialized by to_dict
+            "prev": prev_status.name,
+            "new": self.get_masked_status().name,
+            "manual": self.manual.name if self.manual is not None else None,
+            "response_id": self.curr_response_id,
             "journeys": self.make_journey_status_dict(),
             "dt_start": utils.datetime_to_str(self.dt_start),
             "dt_play": utils.datetime_to_str(self.dt_play),
@@ -159,6 +253,7 @@ class TaskInstance(NodeInstance):
         self.get_task_object().on_admin_pause()
 
     def make_results_dict(self):
+        self.load_results_data()
         results_list = []
         for response in self.responses:
             result_dict = response.make_results_dict()
@@ -194,6 +289,20 @@ class TaskInstance(NodeInstance):
         return {"responses": results_list}
 
 
+@event.listens_for(TaskSpec.spec, "set", propagate=True)
+def receive_spec_set(target: TaskSpec, value, oldvalue, initiator):
+    # invalidates the task objects cached by the instances of this spec
+    target._spec_version = target.spec_version + 1
+    spec_cache.pop(target.id, None)
+
+
+@event.listens_for(TaskSpec.spec, "modified", propagate=True)
+def receive_spec_modified(target: TaskSpec, initiator):
+    # changed in place
+    target._spec_version = target.spec_version + 1
+    spec_cache.pop(target.id, None)
+
+
 # after a TaskInstance is inserted, we attach its
 @event.listens_for(TaskInstance, "after_insert")
 def create_permissions(mapper, connection, instance: TaskInstance):
@@ -0,0 +1,106 @@
+"""Column types"""
+
+import json
+import zlib
+from typing import Any, Optional
+
+from sqlalchemy import Text
+from sqlalchemy.types import TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+# compressed values start with MAGIC, the format version and the codec id. JSON text
+# never starts with a NUL byte
+MAGIC = b"\x00CJ"
+FORMAT_VERSION = 1
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+HEADER_SIZE = len(MAGIC) + 2
+
+
+class JSONCompressionSettings:
+    def __init__(self):
+        self.min_size = 4096
+        self.codec = "zstd"
+        self.level = 3
+
+    def configure(self, config):
+        self.min_size = config["JSON_COMPRESSION_MIN_SIZE"]
+        self.codec = config["JSON_COMPRESSION_CODEC"]
+        self.level = config["JSON_COMPRESSION_LEVEL"]
+
+    def get_codec_id(self) -> int:
+        if self.codec == "zstd" and zstandard is not None:
+            return CODEC_ZSTD
+        return CODEC_ZLIB
+
+
+json_compression = JSONCompressionSettings()
+
+
+def compress(data: bytes) -> bytes:
+    codec_id = json_compression.get_codec_id()
+    if codec_id == CODEC_ZSTD:
+        body = zstandard.ZstdCompressor(level=json_compression.level).compress(data)
+    else:
+        body = zlib.compress(data, json_compression.level)
+    return MAGIC + bytes([FORMAT_VERSION, codec_id]) + body
+
+
+def decompress(data: bytes) -> bytes:
+    version, codec_id = data[len(MAGIC)], data[len(MAGIC) + 1]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported compressed JSON format version {version}.")
+    body = data[HEADER_SIZE:]
+    if codec_id == CODEC_ZLIB:
+        return zlib.decompress(body)
+    if codec_id == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError(
+                "Reading zstd-compressed JSON requires the zstandard package."
+            )
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise ValueError(f"Unknown compressed JSON codec {codec_id}.")
+
+
+def is_compressed(value) -> bool:
+    return isinstance(value, bytes) and value.startswith(MAGIC)
+
+
+class CompressedJSON(TypeDecorator):
+    """JSON column whose values are compressed (zstd if available, else zlib) once
+    their serialized size reaches JSON_COMPRESSION_MIN_SIZE bytes.
+
+    Smaller values are stored as JSON text, like the JSON type does, so existing
+    rows are read as they are. In SQLite, compressed values are BLOBs of the same
+    column.
+    """
+
+    impl = Text
+    cache_ok = True
+    # None is stored as JSON null, like the JSON type does
+    should_evaluate_none = True
+
+    def __init__(self, min_size: Optional[int] = None):
+        """min_size overrides JSON_COMPRESSION_MIN_SIZE for this column"""
+        super().__init__()
+        self.min_size = min_size
+
+    def process_bind_param(self, value: Any, dialect):
+        encoded = json.dumps(value)
+        min_size = self.min_size
+        if min_size is None:
+            min_size = json_compression.min_size
+        if len(encoded) < min_size:
+            return encoded
+        return compress(encoded.encode())
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if is_compressed(value):
+            value = decompress(value)
+        return json.loads(value)
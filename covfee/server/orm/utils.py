@@ -6,6 +6,8 @@ import json
 from _ctypes import PyObj_FromPtr
 import re
 
+from covfee.server import serialization
+
 if TYPE_CHECKING:
     from .node import NodeInstance
 
@@ -61,7 +63,7 @@ class NoIndentJSONEncoder(json.JSONEncoder):
         return (
             self.FORMAT_SPEC.format(id(obj))
             if isinstance(obj, NoIndentJSON)
-            else super(NoIndentJSONEncoder, self).default(obj)
+            else serialization.default(obj)
         )
 
     def encode(self, obj):
@@ -1,4 +1,5 @@
 from functools import wraps
+from typing import Optional
 
 from flask import Blueprint, jsonify, request
 from flask import current_app as app
@@ -14,7 +15,8 @@ from flask_jwt_extended import (
     verify_jwt_in_request,
 )
 
-from ..orm import User, password_hash
+from ..orm import AuthProvider, User
+from .principals import Principal, password_hasher, principal_cache
 
 
 # AUTHENTICATION
@@ -46,12 +48,20 @@ def admin_required(fn):
 # get_jwt() in here if desired. Note that this needs to
 # return None if the user could not be loaded for any reason,
 # such as not being found in the underlying data store
+# Users are resolved through principal_cache, which returns a Principal with the
+# user's id, username and roles instead of the User itself.
 
 
-def user_loader_callback(jwt_header, jwt_payload) -> User:
+def load_principal(identity: int) -> Optional[Principal]:
+    user = app.session.get(User, identity)
+    if user is None:
+        return None
+    return Principal.from_user(user)
+
+
+def user_loader_callback(jwt_header, jwt_payload) -> Optional[Principal]:
     identity = jwt_payload["sub"]
-    user = app.session.query(User).get(identity)
-    return user
+    return principal_cache.get(identity, load_principal)
 
 
 # Create a function that will be called whenever create_access_token
@@ -103,18 +113,15 @@ def login_password():
     if user is None:
         return jsonify({"msg": "Bad username or password"}), 401
 
-    password_providers = [
-        prov for prov in user.providers if prov.provider_id == "password"
-    ]
-    if len(password_providers) != 1:
+    provider = app.session.get(AuthProvider, ("password", user.id))
+    if provider is None:
         return jsonify({"msg": "Bad username or password"}), 401
 
-    provider = password_providers[0]
-
-    if provider.extra["password"] != password_hash(password).hex():
+    hashed_password = password_hasher.hash(password, app.config["JWT_SECRET_KEY"])
+    if provider.extra["password"] != hashed_password.hex():
         return jsonify({"msg": "Bad username or password"}), 401
 
-    return login_user(provider.user)
+    return login_user(user)
 
 
 @auth.route("/refresh", methods=["POST"])
@@ -1,6 +1,7 @@
 from flask import (
     current_app as app,
     jsonify,
+    request,
 )
 from sqlalchemy import select
 
@@ -8,8 +9,76 @@ from .api import api
 from ..orm import Chat
 
 
+def get_chat_ids(chat_ids: str):
+    return [int(e) for e in chat_ids.split(",")]
+
+
+def get_messages_limit(arg: str, default=None):
+    """Reads a message limit from the query args, clamped to
+    [1, CHAT_MESSAGES_MAX_LIMIT]. Returns default if the arg is not given.
+    """
+    limit = request.args.get(arg, None, type=int)
+    if limit is None:
+        return default
+    return max(1, min(limit, app.config["CHAT_MESSAGES_MAX_LIMIT"]))
+
+
 @api.route("/chats/<chat_ids>")
 def chat(chat_ids: str):
-    chat_ids = [int(e) for e in chat_ids.split(",")]
+    """Returns a list of chats.
+
+    Args:
+        chat_ids (str): comma-separated list of chat IDs
+
+    Query args:
+        messages_limit (int): when given, only the most recent messages_limit
+            messages of each chat are included (at most CHAT_MESSAGES_MAX_LIMIT).
+            Older messages can be fetched with the /chats/<chat_id>/messages
+            endpoint.
+    """
+    chat_ids = get_chat_ids(chat_ids)
+    messages_limit = get_messages_limit("messages_limit")
     rows = app.session.execute(select(Chat).where(Chat.id.in_(chat_ids))).all()
-    return jsonify([r[0].to_dict() for r in rows])
+
+    if messages_limit is None:
+        return jsonify([r[0].to_dict() for r in rows])
+
+    chats = []
+    for (chat,) in rows:
+        chat_dict = chat.to_dict(exclude=["messages"])
+        chat_dict["messages"] = [
+            message.to_dict()
+            for message in Chat.get_messages_page(
+                app.session, chat.id, limit=messages_limit
+            )
+        ]
+        chats.append(chat_dict)
+    return jsonify(chats)
+
+
+@api.route("/chats/<chat_ids>/summary")
+def chat_summary(chat_ids: str):
+    """Returns a summary of each chat (number of messages, last message and unread
+    counts for the admin and for each journey) without the messages themselves.
+    """
+    return jsonify(Chat.get_summaries(app.session, get_chat_ids(chat_ids)))
+
+
+@api.route("/chats/<int:chat_id>/messages")
+def chat_messages(chat_id: int):
+    """Returns a page of the messages of a chat.
+
+    Query args:
+        before (int): only messages with an id lower than this are returned
+        after (int): only messages with an id higher than this are returned
+        limit (int): max number of messages to return. Defaults to 50, at most
+            CHAT_MESSAGES_MAX_LIMIT.
+    """
+    messages = Chat.get_messages_page(
+        app.session,
+        chat_id,
+        before=request.args.get("before", None, type=int),
+        after=request.args.get("after", None, type=int),
+        limit=get_messages_limit("limit", default=50),
+    )
+    return jsonify([message.to_dict() for message in messages])
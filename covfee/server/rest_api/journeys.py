@@ -7,11 +7,13 @@ from flask import (
     current_app as app,
 )
 import zipstream
+from sqlalchemy.orm import undefer
 
 from .api import api
 from .auth import admin_required
 from .utils import jsonify_or_404
 from ..orm import JourneyInstance
+from covfee.server.serialization import PreSerialized
 from covfee.server.socketio.socket import socketio
 
 # Journeys
@@ -22,9 +24,18 @@ from covfee.server.socketio.socket import socketio
 def journey(jid):
     with_nodes = request.args.get("with_nodes", True)
     with_response_info = request.args.get("with_response_info", True)
-    res = app.session.query(JourneyInstance).get(bytes.fromhex(jid))
+    # with_specs=0 leaves the node specs out, to be fetched from their spec_url
+    with_specs = bool(request.args.get("with_specs", 1, type=int))
+    res = (
+        app.session.query(JourneyInstance)
+        .options(undefer(JourneyInstance.interface), undefer(JourneyInstance.aux))
+        .get(bytes.fromhex(jid))
+    )
     return jsonify_or_404(
-        res, with_nodes=with_nodes, with_response_info=with_response_info
+        res,
+        with_nodes=with_nodes,
+        with_response_info=with_response_info,
+        with_specs=with_specs,
     )
 
 
@@ -39,7 +50,7 @@ def journey_pause(jid, pause):
         node.paused = pause
 
         # notify users and admins
-        payload = node.make_status_payload(node)
+        payload = PreSerialized(node.make_status_payload())
         socketio.emit("status", payload, to=node.id)
         socketio.emit("status", payload, namespace="/admin")
     app.session.commit()
@@ -55,7 +66,7 @@ def journey_disable(jid, disable):
     journey.disabled = disable
     app.session.commit()
 
-    payload = journey.make_status_payload()
+    payload = PreSerialized(journey.make_status_payload())
     socketio.emit("journey_status", payload, to=journey.id)
     socketio.emit("journey_status", payload, namespace="/admin")
 
@@ -76,7 +87,7 @@ def node_ready(jid, nidx, value):
     node.check_n()
     app.session.commit()
 
-    payload = node.make_status_payload(prev_status)
+    payload = PreSerialized(node.make_status_payload(prev_status))
     socketio.emit("status", payload, to=node.id)
     socketio.emit("status", payload, namespace="/admin")
 
@@ -1,7 +1,13 @@
 from flask import current_app as app
-from flask import jsonify, request
-
-from covfee.server.orm.node import NodeInstance, NodeInstanceManualStatus
+from flask import Response, jsonify, request
+
+from covfee.server.orm.node import (
+    NodeInstance,
+    NodeInstanceManualStatus,
+    NodeSpec,
+    spec_cache,
+)
+from covfee.server.serialization import PreSerialized
 from covfee.server.socketio.socket import socketio
 
 from ..orm import NodeInstanceStatus, TaskInstance
@@ -14,8 +20,33 @@ from .utils import jsonify_or_404
 
 @api.route("/nodes/<nid>")
 def nodes(nid):
+    # with_spec=0 leaves the node spec out, to be fetched from its spec_url
+    with_spec = bool(request.args.get("with_spec", 1, type=int))
     node = app.session.query(NodeInstance).get(int(nid))
-    return jsonify_or_404(node)
+    return jsonify_or_404(node, with_spec=with_spec)
+
+
+@api.route("/nodespecs/<int:sid>")
+def nodespec(sid):
+    """Returns a node spec. Specs are immutable, they are served with a strong ETag
+    (their content hash) and long-lived cache headers.
+    """
+    serialized = spec_cache.get(sid)
+    if serialized is None:
+        spec = app.session.query(NodeSpec).get(sid)
+        if spec is None:
+            return {"msg": "not found"}, 404
+        serialized = spec.get_serialized_spec()
+
+    if request.if_none_match.contains(serialized.hash):
+        res = Response(status=304)
+    else:
+        res = Response(serialized.encoded, mimetype="application/json")
+    res.set_etag(serialized.hash)
+    res.cache_control.public = True
+    res.cache_control.max_age = 31536000
+    res.cache_control.immutable = True
+    return res
 
 
 # @api.route("/nodes/<nid>/response")
@@ -62,7 +93,7 @@ def response_submit(nid):
     if task is None or not isinstance(task, TaskInstance):
         return jsonify({"msg": "invalid task"}), 400
 
-    res = task.responses[-1].submit(request.json)
+    res = task.curr_response.submit(request.json)
     app.session.commit()
     return jsonify(res)
 
@@ -73,7 +104,7 @@ def set_progress(nid, progress: float):
     node.progress = progress
 
     if isinstance(node, TaskInstance):
-        payload = node.make_status_payload()
+        payload = PreSerialized(node.make_status_payload())
         socketio.emit("status", payload, to=node.id)
         socketio.emit("status", payload, namespace="/admin")
 
@@ -91,7 +122,7 @@ def set_manual_status(nid, status):
     app.session.commit()
 
     # notify users and admins
-    payload = node.make_status_payload()
+    payload = PreSerialized(node.make_status_payload())
     socketio.emit("status", payload, to=node.id)
     socketio.emit("status", payload, namespace="/admin")
     return "", 200
@@ -106,7 +137,7 @@ def restart_node(nid):
     if isinstance(node, TaskInstance):
         # restart the task by adding a new response
         node.add_response()
-        payload = node.make_status_payload()
+        payload = PreSerialized(node.make_status_payload())
         socketio.emit("status", payload, to=node.id)
         socketio.emit("status", payload, namespace="/admin")
 
@@ -0,0 +1,141 @@
+"""Resolution of the users behind JWT identities, and hashing of login passwords.
+
+Every request to a protected route resolves the user of its token. Resolved users
+are cached for AUTH_PRINCIPAL_CACHE_TTL seconds, and invalidated as soon as this
+process commits changes to the user or its auth providers.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from eventlet import tpool
+from eventlet.semaphore import Semaphore
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..orm import AuthProvider, User, password_hash
+
+# session.info key of the users changed by the session's flushes
+INVALIDATED_USERS_KEY = "covfee_invalidated_users"
+
+
+class Principal(NamedTuple):
+    """The user of a token. Has the User attributes used by the JWT callbacks."""
+
+    id: int
+    username: str
+    roles: Tuple[str, ...]
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user.id, user.username, tuple(user.roles))
+
+
+class PrincipalCache:
+    """LRU cache of the principals resolved from JWT identities, with expiry"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[Principal, float]]" = OrderedDict()
+        # incremented by every invalidation, so that principals loaded before it are
+        # not cached after it
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        self.max_size = config["AUTH_PRINCIPAL_CACHE_SIZE"]
+        self.ttl = config["AUTH_PRINCIPAL_CACHE_TTL"]
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generation += 1
+
+    def get(
+        self, identity: int, load: Callable[[int], Optional[Principal]]
+    ) -> Optional[Principal]:
+        """Returns the cached principal of identity, or loads it with load().
+        Missing users (None) are not cached.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(identity, None)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(identity)
+                return entry[0]
+            generation = self._generation
+
+        principal = load(identity)
+        if principal is None or self.ttl <= 0:
+            return principal
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[identity] = (principal, now + self.ttl)
+                self._entries.move_to_end(identity)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return principal
+
+
+principal_cache = PrincipalCache()
+
+
+def _after_flush(session, flush_context):
+    user_ids = set()
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, User):
+            user_ids.add(instance.id)
+        elif isinstance(instance, AuthProvider):
+            user_ids.add(instance.user_id)
+    if len(user_ids) == 0:
+        return
+    session.info.setdefault(INVALIDATED_USERS_KEY, set()).update(user_ids)
+    for user_id in user_ids:
+        principal_cache.invalidate(user_id)
+
+
+def _after_commit(session):
+    # again, in case the old principal was loaded between the flush and the commit
+    for user_id in session.info.pop(INVALIDATED_USERS_KEY, ()):
+        principal_cache.invalidate(user_id)
+
+
+def _after_rollback(session):
+    session.info.pop(INVALIDATED_USERS_KEY, None)
+
+
+if not event.contains(Session, "after_flush", _after_flush):
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+
+
+class PasswordHasher:
+    """Hashes passwords (PBKDF2) in eventlet's native thread pool, so that logins do
+    not block the green threads handling requests and sockets. At most `concurrency`
+    hashes run at a time, leaving the rest of the pool to other blocking calls.
+    """
+
+    def __init__(self, concurrency: int = 2):
+        self._slots = Semaphore(concurrency)
+
+    def configure(self, config):
+        self._slots = Semaphore(config["PASSWORD_HASH_CONCURRENCY"])
+
+    def hash(self, password: str, secret: str) -> bytes:
+        with self._slots:
+            return tpool.execute(password_hash, password, secret)
+
+
+password_hasher = PasswordHasher()
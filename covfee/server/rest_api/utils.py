@@ -1,11 +1,15 @@
-import json
-from enum import Enum
-from typing import List, Union
+import threading
+import time
+from typing import Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Set, Union
 
 import requests
+from requests.adapters import HTTPAdapter
 from flask import jsonify
 from flask.json.provider import JSONProvider
 
+from covfee.logger import logger
+from covfee.server.serialization import json_serializer
+
 
 class ProlificAPIRequestError(Exception):
     def __init__(self, message):
@@ -20,57 +24,208 @@ def jsonify_or_404(res, **kwargs):
         return jsonify(res.to_dict(**kwargs))
 
 
-class CovfeeJSONEncoder(json.JSONEncoder):
-    """
-    Used to help jsonify numpy arrays or lists that contain numpy data types.
-    """
-
-    def default(self, obj):
-        if isinstance(obj, Enum):
-            return obj.name
-        else:
-            return super().default(obj)
-
-
 class CovfeeJSONProvider(JSONProvider):
+    """Serializes the responses with the covfee JSON serializer"""
+
     def dumps(self, obj, **kwargs):
-        return json.dumps(obj, **kwargs, cls=CovfeeJSONEncoder)
+        return json_serializer.dumps(obj, **kwargs)
 
     def loads(self, s: Union[str, bytes], **kwargs):
-        return json.loads(s, **kwargs)
+        return json_serializer.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            json_serializer.dumps_bytes(obj), mimetype="application/json"
+        )
 
 
-def fetch_prolific_ids_for_invalid_participants(study_id: str, token: str) -> List[str]:
+# submission statuses of participants who can no longer work on a study
+PROLIFIC_INVALID_STATUSES = ["RETURNED", "REJECTED", "TIMED-OUT"]
+
+
+def make_prolific_http_session(pool_size: int = 10) -> requests.Session:
+    """Creates a requests session with a connection pool, so that repeated calls to the
+    Prolific API reuse their TCP/TLS connections.
+    """
+    http_session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size
+    )
+    http_session.mount("https://", adapter)
+    http_session.mount("http://", adapter)
+    return http_session
+
+
+def fetch_prolific_ids_for_invalid_participants(
+    study_id: str,
+    token: str,
+    api_url: str,
+    http_session: Optional[requests.Session] = None,
+    timeout: float = 5,
+) -> List[str]:
     """
     Use the Prolific Academic API to get the IDs of participants who have failed to do
     the study. Either because they abandoned it (RETURNED), because we rejected the data
     that they submitted (REJECTED) or they failed to complete it on time (TIMED-OUT).
     See https://docs.prolific.com/docs/api-docs/public/#tag/Submissions/Submission-object
+
+    The submissions list is paginated by the API. Pages are followed through the
+    "_links.next.href" attribute of each response until there are no more pages.
     """
+    if http_session is None:
+        http_session = requests
+
     headers = {
         "Authorization": f"Token {token}",
     }
 
+    url = f"{api_url.rstrip('/')}/submissions/"
     params = {"study": study_id}
 
-    try:
-        response = requests.get(
-            "https://api.prolific.com/api/v1/submissions/",
-            headers=headers,
-            params=params,
-        )
-        response.raise_for_status()
-    except requests.exceptions.HTTPError as err:
-        raise ProlificAPIRequestError(
-            f"HTTP error occurred while requesting prolific data: {err}"
-        )
-    except requests.exceptions.RequestException as err:
-        raise ProlificAPIRequestError(
-            f"Request error occurred while requesting prolific data: {err}"
-        )
-    else:
-        return [
+    invalid_participant_ids = []
+    while url is not None:
+        try:
+            response = http_session.get(
+                url, headers=headers, params=params, timeout=timeout
+            )
+            response.raise_for_status()
+            page = response.json()
+        except requests.exceptions.HTTPError as err:
+            raise ProlificAPIRequestError(
+                f"HTTP error occurred while requesting prolific data: {err}"
+            )
+        except requests.exceptions.RequestException as err:
+            raise ProlificAPIRequestError(
+                f"Request error occurred while requesting prolific data: {err}"
+            )
+        except ValueError as err:
+            raise ProlificAPIRequestError(
+                f"Invalid JSON received while requesting prolific data: {err}"
+            )
+
+        invalid_participant_ids += [
             participant["participant_id"]
-            for participant in response.json()["results"]
-            if participant["status"] in ["RETURNED", "REJECTED", "TIMED-OUT"]
+            for participant in page["results"]
+            if participant["status"] in PROLIFIC_INVALID_STATUSES
         ]
+
+        # the next page URL already includes the query parameters
+        url = ((page.get("_links") or {}).get("next") or {}).get("href")
+        params = None
+
+    return invalid_participant_ids
+
+
+class ProlificCacheEntry(NamedTuple):
+    participant_ids: FrozenSet[str]
+
+    # time.monotonic() timestamp of the fetch
+    fetched_at: float
+
+
+class ProlificInvalidParticipantsCache:
+    """
+    Per-study cache of the IDs returned by fetch_prolific_ids_for_invalid_participants.
+    The API URL is PROLIFIC_API_URL of the config (see configure) unless given.
+
+    - Entries younger than `ttl` seconds are served directly.
+    - Entries older than `ttl` but younger than `max_stale` seconds are served as they are
+      (stale-while-revalidate) while a background thread refreshes them. At most one
+      refresh per study is in flight at any time.
+    - Entries older than `max_stale` (or missing) are fetched synchronously. If that fetch
+      fails and a stale entry exists, the stale entry is served instead.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60,
+        max_stale: float = 3600,
+        timeout: float = 5,
+        api_url: Optional[str] = None,
+    ):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.timeout = timeout
+        self.api_url = api_url
+
+        self._entries: Dict[str, ProlificCacheEntry] = {}
+        self._refreshing: Set[str] = set()
+        self._lock = threading.Lock()
+        self._http_session = make_prolific_http_session()
+
+    def configure(self, config: Mapping):
+        """Reads the cache settings from the app config."""
+        self.ttl = config.get("PROLIFIC_CACHE_TTL", self.ttl)
+        self.max_stale = config.get("PROLIFIC_CACHE_MAX_STALE", self.max_stale)
+        self.timeout = config.get("PROLIFIC_REQUEST_TIMEOUT", self.timeout)
+        self.api_url = config["PROLIFIC_API_URL"]
+
+    def _fetch(self, study_id: str, token: str) -> ProlificCacheEntry:
+        if self.api_url is None:
+            raise RuntimeError("The Prolific cache has not been configured.")
+        participant_ids = fetch_prolific_ids_for_invalid_participants(
+            study_id,
+            token,
+            self.api_url,
+            http_session=self._http_session,
+            timeout=self.timeout,
+        )
+        entry = ProlificCacheEntry(
+            frozenset(participant_ids), time.monotonic()
+        )
+        with self._lock:
+            self._entries[study_id] = entry
+        return entry
+
+    def _refresh_in_background(self, study_id: str, token: str):
+        with self._lock:
+            if study_id in self._refreshing:
+                return
+            self._refreshing.add(study_id)
+
+        def refresh():
+            try:
+                self._fetch(study_id, token)
+            except ProlificAPIRequestError as err:
+                logger.warning(
+                    f"Background refresh of prolific study {study_id} failed: {err}"
+                )
+            finally:
+                with self._lock:
+                    self._refreshing.discard(study_id)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def get(self, study_id: str, token: str) -> FrozenSet[str]:
+        """Returns the IDs of invalid participants of a study.
+        Raises ProlificAPIRequestError only if the API fails and nothing usable is cached.
+        """
+        entry = self._entries.get(study_id)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < self.ttl:
+                return entry.participant_ids
+            if age < self.max_stale:
+                self._refresh_in_background(study_id, token)
+                return entry.participant_ids
+
+        try:
+            return self._fetch(study_id, token).participant_ids
+        except ProlificAPIRequestError as err:
+            if entry is None:
+                raise
+            logger.warning(
+                f"Serving stale prolific data for study {study_id}: {err}"
+            )
+            return entry.participant_ids
+
+    def invalidate(self, study_id: Optional[str] = None):
+        with self._lock:
+            if study_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(study_id, None)
+
+
+prolific_invalid_participants_cache = ProlificInvalidParticipantsCache()
@@ -1,7 +1,10 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Literal
+from typing import TYPE_CHECKING, Literal, Optional
 from datetime import datetime, timedelta
 
+from covfee.logger import get_logger
+from covfee.server.metrics import timer_lag
+from covfee.server.serialization import PreSerialized
 from covfee.server.socketio.socket import socketio
 from .apscheduler import scheduler
 
@@ -10,18 +13,25 @@ if TYPE_CHECKING:
 
 TimerName = Literal["pause", "finish", "empty", "count"]
 
+log = get_logger(__name__)
 
-def update_status_job(timer: TimerName, node_id):
+
+def update_status_job(
+    timer: TimerName, node_id, scheduled_at: Optional[datetime] = None
+):
     from covfee.server.orm.node import NodeInstance
 
+    if scheduled_at is not None:
+        timer_lag.observe((datetime.now() - scheduled_at).total_seconds(), timer=timer)
+
     with NodeInstance.sessionmaker() as session:
         node = session.query(NodeInstance).get(node_id)
         if node is None:
-            return print(f"update_status_job could not find node with id {node_id}")
+            return log.warning("timer.node_not_found", timer=timer, node_id=node_id)
 
         node.check_timer(timer)
         session.commit()
-        payload = node.make_status_payload()
+        payload = PreSerialized(node.make_status_payload())
 
     socketio.emit("status", payload, to=node.id)
     socketio.emit("status", payload, namespace="/admin")
@@ -42,14 +52,16 @@ def schedule_timer(node: NodeInstance, timer: TimerName):
         if timer_time is None:
             return
 
+        run_date = datetime.now() + timedelta(seconds=timer_time)
         scheduler.add_job(
             update_status_job,
             "date",
-            run_date=datetime.now() + timedelta(seconds=timer_time),
+            run_date=run_date,
             kwargs={
                 "timer": timer,
                 # "sessionmaker": app.sessionmaker,
                 "node_id": node.id,
+                "scheduled_at": run_date,
             },
             id=f"{node.id}_pause",
         )
@@ -60,14 +72,16 @@ def schedule_timer(node: NodeInstance, timer: TimerName):
         if timer_time is None:
             return
 
+        run_date = datetime.now() + timedelta(seconds=timer_time - node.t_elapsed)
         scheduler.add_job(
             update_status_job,
             "date",
-            run_date=datetime.now() + timedelta(seconds=timer_time - node.t_elapsed),
+            run_date=run_date,
             kwargs={
                 "timer": timer,
                 # "sessionmaker": app.sessionmaker,
                 "node_id": node.id,
+                "scheduled_at": run_date,
             },
             id=f"{node.id}_finish",
         )
@@ -79,18 +93,20 @@ def schedule_timer(node: NodeInstance, timer: TimerName):
         if timer_time == 0:
             raise ValueError("schedule_timer called for countdown but coundown is zero")
 
+        run_date = datetime.now() + timedelta(seconds=timer_time)
         scheduler.add_job(
             update_status_job,
             "date",
-            run_date=datetime.now() + timedelta(seconds=timer_time),
+            run_date=run_date,
             kwargs={
                 "timer": timer,
                 # "sessionmaker": app.sessionmaker,
                 "node_id": node.id,
+                "scheduled_at": run_date,
             },
             id=f"{node.id}_count",
         )
-        print(f"Scheduled job finish: node={node.id}, ")
+        log.debug("timer.scheduled", timer=timer, node_id=node.id)
 
     else:
         raise NotImplementedError()
@@ -102,4 +118,4 @@ def stop_timer(node: NodeInstance, timer=TimerName):
 
     if job is not None:
         scheduler.remove_job(job_id)
-        print(f"Job {job_id} cancelled")
+        log.debug("timer.cancelled", job_id=job_id)
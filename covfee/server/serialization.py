@@ -0,0 +1,156 @@
+"""Serialization of the payloads of the REST API, Socket.IO and the exports.
+
+The JSON backend is orjson when installed (and JSON_BACKEND is "orjson"), or the
+standard json module otherwise. Besides the JSON types, both serialize bytes (as
+hex), dates and datetimes (ISO 8601), NumPy arrays and scalars, and enums. orjson
+serializes enums by value instead of name, so payloads hold enum names (converted
+where the payload is built).
+
+Socket.IO packets are JSON, or MessagePack if SOCKETIO_SERIALIZER is "msgpack"
+(requires the msgpack package). The format is the same for every connection of the
+server, as python-socketio has one packet class per server. The frontend receives
+it in its config and uses the matching parser. Other clients must be configured
+for it.
+"""
+
+import datetime
+import enum
+import json
+from typing import Any, Union
+
+import numpy
+
+from covfee.logger import get_logger
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+log = get_logger(__name__)
+
+ORJSON_OPTIONS = (
+    orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+)
+
+
+def default(obj):
+    """Converts the values that are not JSON types"""
+    if isinstance(obj, PreSerialized):
+        return obj.payload
+    if isinstance(obj, enum.Enum):
+        return obj.name
+    if isinstance(obj, bytes):
+        return obj.hex()
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, numpy.ndarray):
+        return obj.tolist()
+    if isinstance(obj, numpy.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class PreSerialized:
+    """A payload serialized once, to be sent several times. eg. a status emitted to
+    a node's room and to the admins:
+
+        payload = PreSerialized(node.make_status_payload())
+        emit("status", payload, to=node.id)
+        emit("status", payload, namespace="/admin", broadcast=True)
+
+    The encoded payload is reused when it is serialized on its own or as an item of
+    a list (such as a Socket.IO packet). Elsewhere it is serialized again.
+    """
+
+    __slots__ = ["payload", "encoded"]
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+        self.encoded = json_serializer.encode(payload)
+
+
+class JSONSerializer:
+    def __init__(self):
+        self.backend = "orjson" if orjson is not None else "json"
+
+    def configure(self, config):
+        backend = config["JSON_BACKEND"]
+        if backend == "orjson" and orjson is None:
+            log.warning("serialization.orjson_not_installed")
+            backend = "json"
+        self.backend = backend
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        """Serializes obj as compact JSON. Formatting arguments other than separators
+        (eg. indent, sort_keys) are passed to the json module.
+        """
+        if type(obj) is list and len(obj) == 2 and type(obj[1]) is PreSerialized:
+            # a Socket.IO packet: [event, payload]
+            return "[" + self.encode(obj[0]) + "," + obj[1].encoded + "]"
+        kwargs.pop("separators", None)
+        if len(kwargs) > 0:
+            return json.dumps(obj, default=default, **kwargs)
+        if has_pre_serialized(obj):
+            return self.splice(obj)
+        return self.encode(obj)
+
+    def encode(self, obj: Any) -> str:
+        if self.backend == "orjson":
+            return orjson.dumps(obj, default=default, option=ORJSON_OPTIONS).decode()
+        return json.dumps(obj, default=default, separators=(",", ":"))
+
+    def splice(self, obj) -> str:
+        """Serializes a PreSerialized, or a list with PreSerialized items"""
+        if isinstance(obj, PreSerialized):
+            return obj.encoded
+        items = [
+            item.encoded if isinstance(item, PreSerialized) else self.encode(item)
+            for item in obj
+        ]
+        return "[" + ",".join(items) + "]"
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        if self.backend == "orjson" and not has_pre_serialized(obj):
+            return orjson.dumps(obj, default=default, option=ORJSON_OPTIONS)
+        return self.dumps(obj).encode()
+
+    def loads(self, s: Union[str, bytes], **kwargs) -> Any:
+        if self.backend == "orjson":
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+
+json_serializer = JSONSerializer()
+
+
+def has_pre_serialized(obj) -> bool:
+    if isinstance(obj, PreSerialized):
+        return True
+    if isinstance(obj, (list, tuple)):
+        return any(isinstance(item, PreSerialized) for item in obj)
+    return False
+
+
+def get_socketio_serializer(config) -> str:
+    """Returns the Socket.IO packet format to use: "json" or "msgpack" """
+    if config["SOCKETIO_SERIALIZER"] == "msgpack":
+        if msgpack is not None:
+            return "msgpack"
+        log.warning("serialization.msgpack_not_installed")
+    return "json"
+
+
+def get_socketio_options(serializer: str):
+    """Returns the Socket.IO server options for the packet format"""
+    if serializer == "msgpack":
+        from socketio.msgpack_packet import MsgPackPacket
+
+        # bytes are a msgpack type, so default() only gets the other values
+        return {"serializer": MsgPackPacket.configure(dumps_default=default)}
+    return {"json": json_serializer}
@@ -0,0 +1,197 @@
+"""Server-side sessions, stored in memory (single process) or in SQLite (shared by
+multiple server processes).
+
+Socket.IO events go through the session interface too (manage_session=False), so
+that the session written by the handlers (journeyId, nodeId...) is kept in the
+store. Connections without a session cookie get a session id that is pinned to
+their environ, which Socket.IO reuses for every event of the connection.
+"""
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+# environ key holding the session id of requests/connections without a cookie
+SESSION_ID_ENVIRON_KEY = "covfee.session_id"
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid: str = None, new: bool = False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class MemorySessionStore:
+    """LRU of serialized sessions with expiry. Only for single-process servers."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(sid, None)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at <= time.time():
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return data
+
+    def set(self, sid: str, data: str, ttl: float):
+        with self._lock:
+            self._entries[sid] = (time.time() + ttl, data)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, sid: str):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def sweep(self) -> int:
+        """Removes the expired sessions. Returns the number removed."""
+        now = time.time()
+        with self._lock:
+            expired = [
+                sid
+                for sid, (expires_at, _) in self._entries.items()
+                if expires_at <= now
+            ]
+            for sid in expired:
+                del self._entries[sid]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteSessionStore:
+    """Serialized sessions in a SQLite database (WAL mode), shared by all the
+    server processes using the same file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS covfee_sessions ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_covfee_sessions_expires_at "
+                "ON covfee_sessions (expires_at)"
+            )
+
+    def get(self, sid: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM covfee_sessions WHERE id = ? AND expires_at > ?",
+                (sid, time.time()),
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, sid: str, data: str, ttl: float):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO covfee_sessions (id, data, expires_at) "
+                "VALUES (?, ?, ?)",
+                (sid, data, time.time() + ttl),
+            )
+
+    def delete(self, sid: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM covfee_sessions WHERE id = ?", (sid,))
+
+    def sweep(self) -> int:
+        """Removes the expired sessions. Returns the number removed."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "DELETE FROM covfee_sessions WHERE expires_at <= ?", (time.time(),)
+            )
+        return cursor.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM covfee_sessions"
+            ).fetchone()[0]
+
+
+class CovfeeSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, lifetime: float):
+        self.store = store
+        self.lifetime = lifetime
+
+    def open_session(self, app, request) -> ServerSideSession:
+        sid = request.cookies.get(self.get_cookie_name(app)) or request.environ.get(
+            SESSION_ID_ENVIRON_KEY, None
+        )
+        if sid is not None:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSideSession(self.serializer.loads(data), sid=sid)
+
+        # unknown or expired ids are not reused
+        sid = secrets.token_urlsafe(32)
+        request.environ[SESSION_ID_ENVIRON_KEY] = sid
+        return ServerSideSession(sid=sid, new=True)
+
+    def save_session(self, app, session: ServerSideSession, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session.modified:
+            return
+
+        self.store.set(session.sid, self.serializer.dumps(dict(session)), self.lifetime)
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def create_session_store(config):
+    backend = config["SESSION_BACKEND"]
+    if backend == "memory":
+        return MemorySessionStore(config["SESSION_MEMORY_MAX_ENTRIES"])
+    if backend == "sqlite":
+        return SqliteSessionStore(config["SESSION_SQLITE_PATH"])
+    raise ValueError(f"Unrecognized SESSION_BACKEND {backend}.")
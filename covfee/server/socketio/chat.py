@@ -1,42 +1,55 @@
 from typing import Dict
 from datetime import datetime
 
+from covfee.logger import get_logger
+from covfee.server.metrics import chat_messages, timed_event
 from .socket import socketio
-from covfee.server.orm.chat import ChatMessage, ChatJourney
+from covfee.server.orm.chat import Chat, ChatMessage, ChatJourney
+from covfee.server.serialization import PreSerialized
 from covfee.server.socketio.handlers import get_chat
 
-from flask import current_app as app, session
+from flask import current_app as app, request, session
 from flask_socketio import send, emit, join_room
+from sqlalchemy import select
+
+log = get_logger(__name__)
 
 
 def on_chat(data: Dict):
-    app.logger.info(f"socketio/chat: message {str(data)}")
+    log.info("socketio.chat_message", namespace=request.namespace, data=data)
     if "chatId" not in data:
         return send(f"chatId not sent")
 
     chatId = int(data["chatId"])
-    message = ChatMessage(data["message"])
     chat = get_chat(chatId)
     if chat is None:
         return send(f"chat not found")
+
+    chat_messages.inc(namespace=request.namespace)
+    message = ChatMessage(data["message"])
     chat.messages.append(message)
     app.session.commit()
 
+    # serialized once for both emits
+    payload = PreSerialized(message.to_dict())
+
     # emit the message
-    emit("message", message.to_dict(), to=chatId, namespace="/chat")
+    emit("message", payload, to=chatId, namespace="/chat")
 
     # broadcast to admins
-    emit("message", message.to_dict(), namespace="/admin_chat", broadcast=True)
+    emit("message", payload, namespace="/admin_chat", broadcast=True)
 
 
-socketio.on_event("message", on_chat, namespace="/chat")
-socketio.on_event("message", on_chat, namespace="/admin_chat")
-socketio.on_event("message", on_chat, namespace="/admin")
+for namespace in ["/chat", "/admin_chat", "/admin"]:
+    socketio.on_event(
+        "message", timed_event(namespace, "message")(on_chat), namespace=namespace
+    )
 
 
 @socketio.on("join_chat", namespace="/chat")
+@timed_event("/chat", "join_chat")
 def on_join_chat(data):
-    app.logger.info(f"socketio/chat: join_chat {str(data)}")
+    log.info("socketio.join_chat", data=data)
     chatId = data["chatId"]
     chat = get_chat(chatId)
 
@@ -48,9 +61,10 @@ def on_join_chat(data):
 
 
 @socketio.on("read", namespace="/chat")
+@timed_event("/chat", "read")
 def on_read(data):
     """Chat read by a journey"""
-    app.logger.info(f"socketio/chat: read {str(data)}")
+    log.info("socketio.chat_read", data=data)
 
     chatId = int(data["chatId"])
     journeyId = bytes.fromhex(data["journeyId"])
@@ -62,15 +76,14 @@ def on_read(data):
     assoc.read_at = datetime.now()
     app.session.commit()
 
-    payload = assoc.chat.to_dict(exclude=["messages"])
-    emit("chat_update", payload, to=chatId, namespace="/chat")
-    emit("chat_update", payload, namespace="/admin_chat", broadcast=True)
+    emit_chat_update(assoc.chat)
 
 
 @socketio.on("read", namespace="/admin_chat")
+@timed_event("/admin_chat", "read")
 def on_admin_read(data):
     """Chat read by an admin"""
-    app.logger.info(f"socketio/admin_chat: read {str(data)}")
+    log.info("socketio.admin_chat_read", data=data)
     chatId = int(data["chatId"])
     chat = get_chat(chatId)
 
@@ -80,6 +93,44 @@ def on_admin_read(data):
     chat.read_by_admin_at = datetime.now()
     app.session.commit()
 
-    chat_dict = chat.to_dict(exclude=["messages"])
-    emit("chat_update", chat_dict, to=chatId, namespace="/chat")
-    emit("chat_update", chat_dict, namespace="/admin_chat", broadcast=True)
+    emit_chat_update(chat)
+
+
+def emit_chat_update(chat: Chat):
+    """Sends the read dates of a chat to its room, and broadcasts its summary
+    (read dates, unread counts, last message) to admins
+    """
+    payload = PreSerialized(chat.to_dict(exclude=["messages"]))
+    emit("chat_update", payload, to=chat.id, namespace="/chat")
+    summaries = Chat.get_summaries(app.session, [chat.id])
+    if len(summaries) == 1:
+        emit("chat_summary", summaries[0], namespace="/admin_chat", broadcast=True)
+
+
+@socketio.on("summaries", namespace="/admin_chat")
+@timed_event("/admin_chat", "summaries")
+def on_admin_summaries(data):
+    """Summaries of a list of chats (chatIds), or of a page of chats: the first
+    limit chats (at most CHAT_SUMMARIES_MAX_LIMIT) with an id greater than after.
+    Lets admin clients get the state of every chat without loading their messages.
+    """
+    log.info("socketio.admin_chat_summaries", data=data)
+    data = data if data is not None else {}
+    chat_ids = data.get("chatIds", None)
+    if chat_ids is None:
+        max_limit = app.config["CHAT_SUMMARIES_MAX_LIMIT"]
+        limit = max(1, min(int(data.get("limit", max_limit)), max_limit))
+        chat_ids = (
+            app.session.execute(
+                select(Chat.id)
+                .where(Chat.id > int(data.get("after", 0)))
+                .order_by(Chat.id)
+                .limit(limit)
+            )
+            .scalars()
+            .all()
+        )
+    else:
+        chat_ids = [int(chat_id) for chat_id in chat_ids]
+
+    emit("chat_summaries", Chat.get_summaries(app.session, chat_ids))
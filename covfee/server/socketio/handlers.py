@@ -3,14 +3,21 @@ from typing import Union
 from flask import current_app as app
 from flask import session
 from flask_socketio import emit, join_room, leave_room, send
+from sqlalchemy.orm import undefer
 
+from covfee.logger import get_logger
+from covfee.server.metrics import socketio_connections, timed_event
 from covfee.server.orm import JourneyInstance, NodeInstance
 from covfee.server.orm.chat import Chat
+from covfee.server.orm.response import TaskResponse
 from covfee.server.orm.task import TaskInstance
-from covfee.server.socketio.socket import socketio, store
+from covfee.server.serialization import PreSerialized
+from covfee.server.socketio.socket import get_store, socketio
 
 from ..tasks.base import CriticalError
 
+log = get_logger(__name__)
+
 
 def get_journey(jid: str) -> JourneyInstance:
     return app.session.query(JourneyInstance).get(bytes.fromhex(jid))
@@ -24,8 +31,17 @@ def get_chat(chatId: int) -> Chat:
     return app.session.query(Chat).get(chatId)
 
 
+def get_curr_response(node: TaskInstance) -> TaskResponse:
+    """Returns the latest response of a task, loaded with its state"""
+    return (
+        app.session.query(TaskResponse)
+        .options(undefer(TaskResponse.state))
+        .get(node.curr_response_id)
+    )
+
+
 def get_on_join_payload(node: TaskInstance, journey: JourneyInstance):
-    response = node.responses[-1].to_dict()
+    response = get_curr_response(node).to_dict()
     task_object = node.get_task_object()
     if task_object is not None:
         try:
@@ -40,9 +56,7 @@ def get_on_join_payload(node: TaskInstance, journey: JourneyInstance):
                 "error": f"Unknown exception while executing on_join for task {task_object.__class__.__name__}",
                 "load_task": True,
             }
-            app.logger.error(
-                f"Error running on_join for task {task_object.__class__.__name__}"
-            )
+            log.exception("task.on_join_error", task=task_object.__class__.__name__)
     else:
         payload = {}
 
@@ -52,14 +66,16 @@ def get_on_join_payload(node: TaskInstance, journey: JourneyInstance):
 
 
 @socketio.on("connect")
+@timed_event("/", "connect")
 def on_connect(data):
-    app.logger.info(f"socketio: connect {str(data)}")
+    log.info("socketio.connect", data=data)
 
     journey = get_journey(data["journeyId"])
     if journey is None:
         return False
     journey.num_connections += 1
     app.session.commit()
+    socketio_connections.inc()
 
     session["journeyId"] = data["journeyId"]
     payload = {
@@ -72,8 +88,9 @@ def on_connect(data):
 
 
 @socketio.on("join")
+@timed_event("/", "join")
 def on_join(data):
-    app.logger.info(f"socketio: join {str(data)}")
+    log.info("socketio.join", data=data)
     curr_journey_id = str(data["journeyId"])
     curr_journey = get_journey(curr_journey_id)
 
@@ -104,8 +121,8 @@ def on_join(data):
             leave_store(prev_node_id)
 
         # update previous node status
-        payload = prev_node.make_status_payload(prev_node_prev_status)
-        app.logger.info(f"emit: status {str(payload)}")
+        payload = PreSerialized(prev_node.make_status_payload(prev_node_prev_status))
+        log.info("socketio.emit_status", payload=payload.payload)
         emit("status", payload, to=prev_node_id)
         emit("status", payload, namespace="/admin", broadcast=True)
 
@@ -118,35 +135,37 @@ def on_join(data):
     curr_node.check_n()
 
     emit("join", join_payload)
-    app.logger.info(f"socketio: join: {str(join_payload)}")
+    log.info("socketio.emit_join", payload=join_payload)
 
-    print("app.session.commit()")
     app.session.commit()
 
     # update current node status
-    payload = curr_node.make_status_payload(curr_node_prev_status)
+    payload = PreSerialized(curr_node.make_status_payload(curr_node_prev_status))
     emit("status", payload, to=curr_node_id)
     emit("status", payload, namespace="/admin", broadcast=True)
-    app.logger.info(f"emit: status {str(payload)}")
+    log.info("socketio.emit_status", payload=payload.payload)
 
     session["journeyId"] = curr_journey_id
     session["nodeId"] = curr_node_id
     session["useSharedState"] = use_shared_state
 
     if isinstance(curr_node, TaskInstance) and use_shared_state:
-        response = curr_node.responses[-1]
-        res = store.join(curr_node_id, curr_node.spec.spec["type"], response.state)
+        response = curr_node.curr_response
+        res = get_store().join(
+            curr_node_id, curr_node.spec.task_type, response.state
+        )
         if res["success"]:
             emit("state", res, to=curr_node_id)
         else:
-            app.logger.error("Redux store returned error")
+            log.error("redux_store.join_error", node_id=curr_node_id, result=res)
 
 
 # admin joins a node
 # to support observer mode
 @socketio.on("join", namespace="/admin")
+@timed_event("/admin", "join")
 def on_admin_join(data):
-    app.logger.info(f"socketio(admin): join {str(data)}")
+    log.info("socketio.admin_join", data=data)
     curr_node_id = int(data["nodeId"])
     curr_node = get_node(curr_node_id)
 
@@ -160,12 +179,14 @@ def on_admin_join(data):
     join_payload = get_on_join_payload(curr_node, None)
 
     emit("join", join_payload)
-    app.logger.info(f"socketio(admin): join: {str(join_payload)}")
+    log.info("socketio.admin_emit_join", payload=join_payload)
 
     if isinstance(curr_node, TaskInstance) and use_shared_state:
         # task may not be running so we need to pass the state
-        response = curr_node.responses[-1]
-        res = store.join(curr_node_id, curr_node.spec.spec["type"], response.state)
+        response = curr_node.curr_response
+        res = get_store().join(
+            curr_node_id, curr_node.spec.task_type, response.state
+        )
         if res["success"]:
             emit("state", res, namespace="/admin", broadcast=True)
 
@@ -178,46 +199,51 @@ def on_admin_join(data):
 
 
 @socketio.on("state")
+@timed_event("/", "state")
 def on_state(data):
     """state is sent directly from the client
     used when useSharedState==False for autosave feature
     """
-    app.logger.info(f"socketio: state {str(data)}")
+    log.info("socketio.state", data=data)
     nodeId = int(data["nodeId"])
     state = data["state"]
 
-    response = get_node(nodeId).responses[-1]
+    response = get_node(nodeId).curr_response
     response.state = state
     app.session.commit()
 
 
 @socketio.on("action")
+@timed_event("/", "action")
 def on_action(data):
     action = data["action"]
     nodeId = int(data["nodeId"])
 
-    res = store.action(nodeId, action)
+    log.info("socketio.action", node_id=nodeId, action=action)
+    res = get_store().action(nodeId, action)
     if res["success"]:
         emit("action", action, to=nodeId)
         emit("action", action, to=nodeId, namespace="/admin")
 
 
 def leave_store(nodeId):
-    app.logger.info(f"Leaving node {nodeId}")
-    res = store.leave(nodeId)
+    log.info("redux_store.leave", node_id=nodeId)
+    res = get_store().leave(nodeId)
     if res["success"]:
         # save state to database
-        response = get_node(nodeId).responses[-1]
+        response = get_node(nodeId).curr_response
         response.state = res["state"]
         app.session.commit()
 
 
 @socketio.on("disconnect")
+@timed_event("/", "disconnect")
 def disconnect():
     if "journeyId" not in session:
         return
 
     # important: same journey can have multiple connections (tabs)
+    socketio_connections.dec()
     journey_id = session["journeyId"]
     journey = get_journey(journey_id)
     journey.num_connections = max(0, journey.num_connections - 1)
@@ -242,10 +268,10 @@ def disconnect():
         return
 
     if "useSharedState" in session and session["useSharedState"]:
-        leave_store(node.responses[-1].id)
+        leave_store(node.id)
 
     if node:
-        payload = node.make_status_payload(prev_status)
+        payload = PreSerialized(node.make_status_payload(prev_status))
         emit("status", payload, to=node.id)
         emit("status", payload, namespace="/admin", broadcast=True)
-        app.logger.info(f"emit: status {str(payload)}")
+        log.info("socketio.emit_status", payload=payload.payload)
@@ -6,8 +6,7 @@ import zmq
 from flask import current_app as app
 
 from covfee.cli.utils import working_directory
-
-context = zmq.Context()
+from covfee.server.metrics import redux_store_duration, redux_store_errors
 
 
 class ReduxStoreService:
@@ -30,18 +29,20 @@ class ReduxStoreClient:
 
     def __init__(self):
         #  Socket to talk to server
-        self.socket = context.socket(zmq.REQ)
+        self.socket = zmq.Context.instance().socket(zmq.REQ)
         self.socket.setsockopt(zmq.RCVTIMEO, 500)
         self.socket.connect("tcp://127.0.0.1:5555")
 
     def socket_request(self, payload):
-        self.socket.send_json(payload)
-        try:
-            message = self.socket.recv()
-        except zmq.error.Again as e:
-            raise RuntimeError(
-                "The Redux store service may not be running or the store service host/port may be incorrect"
-            ) from e
+        with redux_store_duration.time(command=payload["command"]):
+            self.socket.send_json(payload)
+            try:
+                message = self.socket.recv()
+            except zmq.error.Again as e:
+                redux_store_errors.inc(command=payload["command"])
+                raise RuntimeError(
+                    "The Redux store service may not be running or the store service host/port may be incorrect"
+                ) from e
         return json.loads(message.decode("utf-8"))
 
     def join(self, nodeId, taskName, currState):
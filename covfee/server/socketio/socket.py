@@ -1,6 +1,16 @@
+from typing import Optional
+
 from flask_socketio import SocketIO
 
 from covfee.server.socketio.redux_store import ReduxStoreClient
 
 socketio = SocketIO()
-store = ReduxStoreClient()
+_store: Optional[ReduxStoreClient] = None
+
+
+def get_store() -> ReduxStoreClient:
+    """Returns the client of the redux store service, connected on first use"""
+    global _store
+    if _store is None:
+        _store = ReduxStoreClient()
+    return _store
@@ -0,0 +1,223 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+from typing import Dict, List
+
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
+
+from .media import is_media_file, send_media_file
+
+try:
+    import brotli
+except ImportError:  # brotli variants are optional
+    brotli = None
+
+# maps the entry bundles (eg. main.js) to their content-hashed names
+BUNDLE_MANIFEST_FILENAME = "manifest.json"
+# webpack entry points, referenced by the html templates
+BUNDLE_ENTRIES = ["main.js", "admin.js"]
+# files for which precompressed variants are built and negotiated
+COMPRESSIBLE_EXTENSIONS = (".js", ".css", ".map", ".json", ".svg", ".html", ".txt")
+# supported precompressed variants, in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+HASH_LENGTH = 12
+HASHED_NAME_RE = re.compile(
+    r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^.]+)$" % HASH_LENGTH
+)
+
+
+def get_content_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def get_hashed_name(filename: str, content_hash: str) -> str:
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{content_hash}{ext}"
+
+
+def is_compressible(filename: str) -> bool:
+    return filename.endswith(COMPRESSIBLE_EXTENSIONS)
+
+
+def compress_file(path: str, min_size: int = 0) -> List[str]:
+    """Writes the precompressed variants of a file next to it.
+    Returns the paths of the variants written.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    written = []
+    for encoding, ext in ENCODINGS:
+        variant_path = path + ext
+        if len(data) < min_size:
+            # too small to benefit, remove outdated variants if any
+            if os.path.exists(variant_path):
+                os.remove(variant_path)
+            continue
+        if encoding == "br":
+            if brotli is None:
+                continue
+            compressed = brotli.compress(data, quality=11)
+        else:
+            # mtime=0 makes the output deterministic
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        with open(variant_path, "wb") as f:
+            f.write(compressed)
+        written.append(variant_path)
+    return written
+
+
+def build_bundle_assets(bundle_path: str, min_size: int = 1024) -> Dict[str, str]:
+    """Post-processes the webpack output for static serving:
+
+    - copies the entry bundles to content-hashed names and writes the manifest
+      mapping the entries to them. Older hashed copies are removed.
+    - writes gzip (and brotli, if installed) variants of the compressible files.
+
+    Returns the manifest.
+    """
+    manifest = {}
+    for entry in BUNDLE_ENTRIES:
+        entry_path = os.path.join(bundle_path, entry)
+        if not os.path.exists(entry_path):
+            continue
+        hashed_name = get_hashed_name(entry, get_content_hash(entry_path))
+        shutil.copyfile(entry_path, os.path.join(bundle_path, hashed_name))
+        manifest[entry] = hashed_name
+
+    # remove the hashed copies of previous builds
+    current = set(manifest.values())
+    for filename in os.listdir(bundle_path):
+        base_name = filename
+        for _, ext in ENCODINGS:
+            if base_name.endswith(ext):
+                base_name = base_name[: -len(ext)]
+        match = HASHED_NAME_RE.match(base_name)
+        if (
+            match is not None
+            and match["stem"] + match["ext"] in BUNDLE_ENTRIES
+            and base_name not in current
+        ):
+            os.remove(os.path.join(bundle_path, filename))
+
+    for filename in os.listdir(bundle_path):
+        file_path = os.path.join(bundle_path, filename)
+        if os.path.isfile(file_path) and is_compressible(filename):
+            compress_file(file_path, min_size)
+
+    with open(os.path.join(bundle_path, BUNDLE_MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class BundleManifest:
+    """Resolves the entry bundles to their content-hashed names.
+    The manifest file is re-read when it changes (ie. after a rebuild).
+    """
+
+    def __init__(self):
+        self._manifests: Dict[str, Dict[str, str]] = {}
+        self._mtimes: Dict[str, float] = {}
+
+    def load(self, bundle_path: str) -> Dict[str, str]:
+        manifest_path = os.path.join(bundle_path, BUNDLE_MANIFEST_FILENAME)
+        try:
+            mtime = os.stat(manifest_path).st_mtime
+        except OSError:
+            # bundles built without the asset pipeline
+            return {}
+        if self._mtimes.get(bundle_path) != mtime:
+            with open(manifest_path) as f:
+                self._manifests[bundle_path] = json.load(f)
+            self._mtimes[bundle_path] = mtime
+        return self._manifests[bundle_path]
+
+    def get_filename(self, bundle_path: str, entry: str) -> str:
+        return self.load(bundle_path).get(entry, entry)
+
+    def is_hashed(self, bundle_path: str, filename: str) -> bool:
+        return filename in self.load(bundle_path).values()
+
+
+bundle_manifest = BundleManifest()
+
+
+def send_static_asset(
+    directory: str, filename: str, max_age: int = 0, immutable: bool = False
+):
+    """Sends a static file, supporting conditional and range requests.
+
+    - Precompressed variants of the file (.br, .gz) are sent if accepted by the client.
+    - Immutable files (content-hashed names) are cached for max_age without
+      revalidation. Otherwise, files are cached for max_age and then revalidated
+      with their ETag / Last-Modified (max_age=0 revalidates on every use).
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    send_path, content_encoding = path, None
+    negotiated = is_compressible(filename)
+    if negotiated:
+        for encoding, ext in ENCODINGS:
+            if request.accept_encodings[encoding] > 0 and os.path.isfile(path + ext):
+                send_path, content_encoding = path + ext, encoding
+                break
+
+    response = send_file(
+        send_path,
+        mimetype=mimetype,
+        conditional=True,
+        etag=True,
+        max_age=max_age,
+    )
+    if content_encoding is not None:
+        response.headers["Content-Encoding"] = content_encoding
+    if negotiated:
+        response.vary.add("Accept-Encoding")
+    if immutable:
+        response.cache_control.immutable = True
+    elif max_age == 0:
+        response.cache_control.no_cache = True
+    return response
+
+
+def get_bundle_filename(config, entry: str) -> str:
+    """Returns the name under which an entry bundle is served"""
+    if config["COVFEE_ENV"] == "dev":
+        # served by webpack-dev-server
+        return entry
+    return bundle_manifest.get_filename(config["MASTER_BUNDLE_PATH"], entry)
+
+
+def send_bundle(config, filename: str):
+    bundle_path = config["MASTER_BUNDLE_PATH"]
+    if bundle_manifest.is_hashed(bundle_path, filename):
+        return send_static_asset(
+            bundle_path,
+            filename,
+            max_age=config["BUNDLES_IMMUTABLE_MAX_AGE"],
+            immutable=True,
+        )
+    return send_static_asset(
+        bundle_path, filename, max_age=config["WWW_CACHE_MAX_AGE"]
+    )
+
+
+def send_www_file(config, filename: str):
+    if is_media_file(filename):
+        return send_media_file(config, config["PROJECT_WWW_PATH"], filename)
+    return send_static_asset(
+        config["PROJECT_WWW_PATH"], filename, max_age=config["WWW_CACHE_MAX_AGE"]
+    )
@@ -5,10 +5,12 @@ from typing import TYPE_CHECKING, Any, Dict, Optional
 
 from flask import Blueprint, jsonify, request
 from flask import current_app as app
-from sqlalchemy import ForeignKey, select
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import ForeignKey, Index, select
+from sqlalchemy.orm import Mapped, mapped_column, relationship, undefer
 
 from covfee.server.orm import Base
+from covfee.server.orm.mutable import MutableJSON
+from covfee.server.orm.types import CompressedJSON
 from covfee.server.tasks.base import BaseCovfeeTask
 
 if TYPE_CHECKING:
@@ -47,7 +49,11 @@ bp = Blueprint("ContinuousAnnotationTask", __name__)
 @bp.route("/tasks/<tid>/annotations/all")
 def fetch_all(tid):
     rows = (
-        app.session.execute(select(Annotation).where(Annotation.task_id == int(tid)))
+        app.session.execute(
+            select(Annotation)
+            .where(Annotation.task_id == int(tid))
+            .options(undefer(Annotation.data_json))
+        )
         .scalars()
         .all()
     )
@@ -56,7 +62,11 @@ def fetch_all(tid):
 
 @bp.route("/annotations/<annotid>")
 def fetch_one(annotid):
-    res = app.session.query(Annotation).get(int(annotid))
+    res = (
+        app.session.query(Annotation)
+        .options(undefer(Annotation.data_json))
+        .get(int(annotid))
+    )
 
     return jsonify_or_404(res)
 
@@ -104,6 +114,7 @@ class Annotation(Base):
     """Stores annotations for covfee tasks"""
 
     __tablename__ = "ContinuousAnnotationTask.annotations"
+    __table_args__ = (Index("ix_continuous_annotations_task_id", "task_id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
 
@@ -114,12 +125,20 @@ class Annotation(Base):
     category: Mapped[str]
     participant: Mapped[str]
     interface: Mapped[Dict[str, Any]]  # json column
-    data_json: Mapped[Optional[Dict[str, Any]]]
+    data_json: Mapped[Optional[Dict[str, Any]]] = mapped_column(
+        MutableJSON.as_mutable(CompressedJSON()), deferred=True
+    )
 
     created_at: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now)
     updated_at: Mapped[datetime.datetime] = mapped_column(
         default=datetime.datetime.now, onupdate=datetime.datetime.now
     )
 
+    def to_dict(self, with_data=True):
+        annotation_dict = super().to_dict()
+        if with_data:
+            annotation_dict["data_json"] = self.data_json
+        return annotation_dict
+
     def reset_data(self) -> None:
         self.data_json = None
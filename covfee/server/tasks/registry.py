@@ -0,0 +1,27 @@
+import inspect
+from typing import Dict, Optional, Type
+
+from .base import BaseCovfeeTask
+
+_task_classes: Optional[Dict[str, Type[BaseCovfeeTask]]] = None
+
+
+def get_task_classes() -> Dict[str, Type[BaseCovfeeTask]]:
+    """Returns the covfee task classes, by task type name.
+    The covfee.server.tasks module is scanned only once, on first use.
+    """
+    global _task_classes
+    if _task_classes is None:
+        from covfee.server import tasks
+
+        _task_classes = {}
+        for name in dir(tasks):
+            elem = getattr(tasks, name)
+            if inspect.isclass(elem) and issubclass(elem, BaseCovfeeTask):
+                _task_classes[name] = elem
+    return _task_classes
+
+
+def get_task_class(task_type: str) -> Type[BaseCovfeeTask]:
+    """Returns the class of a task type, BaseCovfeeTask for types without a class."""
+    return get_task_classes().get(task_type, BaseCovfeeTask)
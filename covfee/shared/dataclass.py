@@ -1,5 +1,19 @@
+import hashlib
+import json
 import os
-from typing import Any, List, Optional, Tuple
+from collections import defaultdict
+from itertools import islice
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 from sqlalchemy import select
 from sqlalchemy.orm import scoped_session
@@ -20,6 +34,13 @@ from covfee.server.orm import (
 )
 
 
+def make_fingerprint(data: Any) -> str:
+    """Hashes JSON-serializable spec data, independently of the order of its keys"""
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True, separators=(",", ":"), default=str).encode()
+    ).hexdigest()
+
+
 class PostInitCaller(type):
     def __call__(cls, *args, **kwargs):
         obj = type.__call__(cls, *args, **kwargs)
@@ -39,15 +60,21 @@ class CovfeeTask(BaseDataclass, metaclass=PostInitCaller):
         super().__init__()
         self._player_count = -1
 
-    def create_orm_task_object(self) -> OrmTask:
-        if self._orm_task is not None:
-            return self._orm_task
+    def get_spec_dict(self) -> Dict[str, Any]:
         spec = {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
         class_vars = {
             k: v for k, v in self.__class__.__dict__.items() if not k.startswith("_")
         }
+        return {**spec, **class_vars}
+
+    def get_fingerprint(self) -> str:
+        return make_fingerprint(self.get_spec_dict())
 
-        self._orm_task = OrmTask({**spec, **class_vars})
+    def create_orm_task_object(self) -> OrmTask:
+        if self._orm_task is not None:
+            return self._orm_task
+
+        self._orm_task = OrmTask(self.get_spec_dict())
         logger.debug(f"Created ORM task: {str(self._orm_task)}")
         return self._orm_task
 
@@ -104,12 +131,24 @@ class Journey(BaseDataclass):
         self.global_unique_id = global_unique_id
         self.prolific_study_id = prolific_study_id
 
+    def get_fingerprint(self) -> str:
+        return make_fingerprint(
+            {
+                "nodes_players": [
+                    (n.get_fingerprint(), p) for n, p in self.nodes_players
+                ],
+                "global_unique_id": self.global_unique_id,
+                "prolific_study_id": self.prolific_study_id,
+            }
+        )
+
     def create_orm_journey_object(self) -> OrmJourney:
         journey = OrmJourney(
             [(n.create_orm_task_object(), p) for n, p in self.nodes_players]
         )
         journey.global_unique_id = self.global_unique_id
         journey.prolific_study_id = self.prolific_study_id
+        journey.fingerprint = self.get_fingerprint()
         logger.debug(f"Created ORM journey: {str(journey)}")
         return journey
 
@@ -168,17 +207,246 @@ class HIT(BaseDataclass):
         self.journeys.append(j)
         return j
 
+    def get_fingerprint(self) -> str:
+        # nodes shared by journeys (ie. multiplayer nodes) are part of the spec
+        node_indices = {}
+        for journey in self.journeys:
+            for node, _ in journey.nodes_players:
+                node_indices.setdefault(id(node), len(node_indices))
+
+        return make_fingerprint(
+            {
+                "name": self.name,
+                "config": self.config,
+                "global_unique_id": self.global_unique_id,
+                "journeys": [j.get_fingerprint() for j in self.journeys],
+                "journey_nodes": [
+                    [node_indices[id(n)] for n, _ in j.nodes_players]
+                    for j in self.journeys
+                ],
+            }
+        )
+
     def create_orm_hit_object(self) -> OrmHit:
         hit = OrmHit(self.name, [j.create_orm_journey_object() for j in self.journeys])
         hit.global_unique_id = self.global_unique_id
+        hit.fingerprint = self.get_fingerprint()
         logger.debug(f"Created ORM HIT: {str(hit)}")
         return hit
 
 
+def match_specs(
+    specs: List[Union[HIT, Journey]], existing: List, existing_by_id: Dict
+) -> Tuple[List[Tuple], List]:
+    """Matches specs to existing rows (with global_unique_id and fingerprint):
+    by global_unique_id, or by fingerprint for specs without one.
+
+    Returns a (spec, fingerprint, existing row or None) tuple per spec, and the
+    existing rows without global_unique_id that were not matched.
+    """
+    rows_by_fingerprint = defaultdict(list)
+    for row in existing:
+        if row.global_unique_id is None:
+            rows_by_fingerprint[row.fingerprint].append(row)
+
+    matches = []
+    for spec in specs:
+        fingerprint = spec.get_fingerprint()
+        if spec.global_unique_id is not None:
+            row = existing_by_id.get(spec.global_unique_id)
+        elif rows_by_fingerprint[fingerprint]:
+            row = rows_by_fingerprint[fingerprint].pop(0)
+        else:
+            row = None
+        matches.append((spec, fingerprint, row))
+    rows_left = [row for rows in rows_by_fingerprint.values() for row in rows]
+    return matches, rows_left
+
+
+class ExistingSpecs(NamedTuple):
+    """Ids and fingerprints of the HITs and journeys of a project in the database"""
+
+    hits: List
+    hits_by_id: Dict[str, Any]
+    journeys_by_hit: Dict[int, List]
+    journey_ids: Set[str]
+
+    @staticmethod
+    def load(session: scoped_session, project_id: int) -> "ExistingSpecs":
+        hits = session.execute(
+            select(
+                OrmHit.id, OrmHit.name, OrmHit.global_unique_id, OrmHit.fingerprint
+            ).where(OrmHit.project_id == project_id)
+        ).all()
+        journeys = session.execute(
+            select(
+                OrmJourney.id,
+                OrmJourney.global_unique_id,
+                OrmJourney.fingerprint,
+                OrmJourney.hitspec_id,
+            )
+            .join(OrmHit)
+            .where(OrmHit.project_id == project_id)
+        ).all()
+
+        journeys_by_hit = defaultdict(list)
+        for j in journeys:
+            journeys_by_hit[j.hitspec_id].append(j)
+        return ExistingSpecs(
+            hits,
+            {h.global_unique_id: h for h in hits if h.global_unique_id},
+            journeys_by_hit,
+            {j.global_unique_id for j in journeys if j.global_unique_id},
+        )
+
+
+def diff_existing_hit(
+    diff: "SpecsDiff",
+    hit: HIT,
+    fingerprint: str,
+    existing_hit,
+    existing: ExistingSpecs,
+) -> Tuple[int, int]:
+    """Adds to diff the changes of a HIT matched to an existing one.
+
+    Returns the number of unchanged HITs (0 or 1) and journeys.
+    """
+    label = hit.global_unique_id or hit.name
+    if existing_hit.fingerprint == fingerprint:
+        return 1, len(hit.journeys)
+
+    up_to_date, unchanged_journeys = diff_hit_journeys(
+        diff, hit, label, existing_hit, existing
+    )
+    # whether the HIT in the database will match the spec after the update
+    if up_to_date and existing_hit.name == hit.name:
+        diff.updated_fingerprints[existing_hit.id] = fingerprint
+    elif existing_hit.fingerprint is None:
+        return 1, unchanged_journeys
+    else:
+        diff.changed.append(f"HIT {label}")
+    return 0, unchanged_journeys
+
+
+def diff_hit_journeys(
+    diff: "SpecsDiff", hit: HIT, label: str, existing_hit, existing: ExistingSpecs
+) -> Tuple[bool, int]:
+    """Adds to diff the journeys to add to an existing HIT, and its changed or
+    skipped journeys.
+
+    Returns whether every existing journey of the HIT matches the specs after the
+    update, and the number of unchanged journeys.
+    """
+    hit_journeys = existing.journeys_by_hit[existing_hit.id]
+    matched_journeys, journeys_left = match_specs(
+        hit.journeys,
+        hit_journeys,
+        {j.global_unique_id: j for j in hit_journeys if j.global_unique_id},
+    )
+    up_to_date = True
+    matched = unchanged = 0
+    for index, (journey, journey_fingerprint, existing_journey) in enumerate(
+        matched_journeys
+    ):
+        journey_label = journey.global_unique_id or index
+        if existing_journey is None and journey.global_unique_id is not None:
+            if journey.global_unique_id in existing.journey_ids:
+                diff.skipped.append(
+                    f"Journey {journey_label} of HIT {label}: its"
+                    " global_unique_id is used by another HIT"
+                )
+                up_to_date = False
+            else:
+                diff.added_journeys.append((existing_hit.id, journey))
+            continue
+        if existing_journey is None:
+            if len(journeys_left) == 0:
+                diff.added_journeys.append((existing_hit.id, journey))
+                continue
+            # possibly an edited version of an existing journey
+            existing_journey = journeys_left.pop(0)
+            if existing_journey.fingerprint is None:
+                diff.skipped.append(
+                    f"Journey {journey_label} of HIT {label}: missing"
+                    " global_unique_id and existing journeys have no fingerprint"
+                )
+                up_to_date = False
+                continue
+
+        matched += 1
+        if existing_journey.fingerprint not in (None, journey_fingerprint):
+            diff.changed.append(f"Journey {journey_label} of HIT {label}")
+            up_to_date = False
+        else:
+            unchanged += 1
+
+    return up_to_date and matched == len(hit_journeys), unchanged
+
+
+class SpecsDiff(NamedTuple):
+    """Changes to the specs of a project in the database.
+    See Project.get_orm_specs_diff
+    """
+
+    project_exists: bool
+    # the project's hits if it does not exist, which may be parsed as iterated
+    added_hits: Iterable[HIT]
+    # (id of the existing HITSpec, journey to add to it)
+    added_journeys: List[Tuple[int, Journey]]
+    # new fingerprints of existing HITs that will match their spec after the update
+    updated_fingerprints: Dict[int, str]
+    # existing specs are never modified: changed specs make the update fail
+    changed: List[str]
+    skipped: List[str]
+    unchanged_hits: int
+    unchanged_journeys: int
+
+    def has_changes(self) -> bool:
+        return (
+            not self.project_exists
+            or len(self.added_hits) > 0
+            or len(self.added_journeys) > 0
+            or len(self.updated_fingerprints) > 0
+        )
+
+    def get_report(self, project_name: str) -> str:
+        # added_hits are iterated once, as they may be parsed as iterated
+        added_hits = added_hits_journeys = 0
+        for hit in self.added_hits:
+            added_hits += 1
+            added_hits_journeys += len(hit.journeys)
+        lines = [
+            f"Project {project_name}: "
+            + ("existing" if self.project_exists else "new, will be created"),
+            f"  HITs to add: {added_hits} (with {added_hits_journeys} journeys)",
+            f"  Journeys to add to existing HITs: {len(self.added_journeys)}",
+            f"  Unchanged HITs: {self.unchanged_hits},"
+            f" unchanged journeys: {self.unchanged_journeys}",
+        ]
+        if self.changed:
+            lines.append(
+                f"  Changed specs (existing specs cannot be modified, the update"
+                f" will fail): {len(self.changed)}"
+            )
+            lines += [f"    - {c}" for c in self.changed]
+        if self.skipped:
+            lines.append(f"  Skipped: {len(self.skipped)}")
+            lines += [f"    - {c}" for c in self.skipped]
+        return "\n".join(lines)
+
+
+class SpecsChangedException(Exception):
+    def __init__(self, name: str, changed: List[str]):
+        super().__init__(f"Specs of project {name} changed in the database")
+        self.name = name
+        self.changed = changed
+
+
 class Project(BaseDataclass):
     name: str
     email: str
-    hits: List[HIT]
+    # a list, or the JsonFileHits of a JSON project file (iterable once)
+    hits: Iterable[HIT]
 
     def __init__(self, name: str, email: str, hits: HIT = None):
         super().__init__()
@@ -186,57 +454,143 @@ class Project(BaseDataclass):
         self.email = email
         self.hits = hits if hits is not None else list()
 
-    def create_or_update_orm_specs_data(self, session: scoped_session) -> OrmProject:
+    def add_orm_hits_in_batches(
+        self,
+        orm_project: OrmProject,
+        hits: Iterable[HIT],
+        session: scoped_session,
+        batch_size: Optional[int],
+    ):
+        """Adds the ORM objects of the hits to the project. If batch_size is given,
+        the session is flushed every batch_size hits instead of only at commit.
+        """
+        if batch_size is None:
+            orm_project.hitspecs += [h.create_orm_hit_object() for h in hits]
+            return
+
+        session.add(orm_project)
+        iterator = iter(hits)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                break
+            orm_project.hitspecs += [h.create_orm_hit_object() for h in batch]
+            session.flush()
+            # flushed changes are no longer listed in session.new
+            session.info["covfee_specs_flushed"] = True
+            logger.debug(f"Flushed {len(orm_project.hitspecs)} HITs to the database.")
+
+    def get_orm_specs_diff(
+        self, session: Optional[scoped_session], project: Optional[OrmProject] = None
+    ) -> SpecsDiff:
+        """Computes the changes needed to bring the database up to date with the specs.
+
+        The fingerprints of the existing HITs and journeys of the project are loaded in
+        one query each. HITs and journeys are matched by global_unique_id, or by
+        fingerprint if they do not have one. A spec without global_unique_id that
+        matches no fingerprint is only added if every existing spec without one is
+        matched. Otherwise it may be an edited version of those left, and is reported
+        as changed (HITs with the same name, journeys in order) or skipped.
+        """
+        if project is None and session is not None:
+            project = session.execute(
+                select(OrmProject).filter_by(name=self.name)
+            ).scalar_one_or_none()
+        if project is None:
+            return SpecsDiff(False, self.hits, [], {}, [], [], 0, 0)
+
+        existing = ExistingSpecs.load(session, project.id)
+        diff = SpecsDiff(True, [], [], {}, [], [], 0, 0)
+        unchanged_hits = unchanged_journeys = 0
+        matched_hits, hits_left = match_specs(
+            self.hits, existing.hits, existing.hits_by_id
+        )
+
+        # specs without global_unique_id that match no existing HIT
+        unmatched_hits = []
+        hits_left_by_name = defaultdict(list)
+        for h in hits_left:
+            hits_left_by_name[h.name].append(h)
+        for hit, fingerprint, existing_hit in matched_hits:
+            label = hit.global_unique_id or hit.name
+            if existing_hit is not None:
+                hit_unchanged, journeys_unchanged = diff_existing_hit(
+                    diff, hit, fingerprint, existing_hit, existing
+                )
+                unchanged_hits += hit_unchanged
+                unchanged_journeys += journeys_unchanged
+            elif hit.global_unique_id is not None:
+                diff.added_hits.append(hit)
+            elif hits_left_by_name[hit.name]:
+                existing_hit = hits_left_by_name[hit.name].pop()
+                hits_left.remove(existing_hit)
+                if existing_hit.fingerprint is None:
+                    diff.skipped.append(
+                        f"HIT {label}: missing global_unique_id and the existing HIT"
+                        " has no fingerprint"
+                    )
+                else:
+                    diff.changed.append(f"HIT {label}")
+            else:
+                unmatched_hits.append(hit)
+
+        for hit in unmatched_hits:
+            if len(hits_left) > 0:
+                diff.skipped.append(
+                    f"HIT {hit.name}: missing global_unique_id, and existing HITs"
+                    " without one do not match the specs"
+                )
+            else:
+                diff.added_hits.append(hit)
+
+        return diff._replace(
+            unchanged_hits=unchanged_hits, unchanged_journeys=unchanged_journeys
+        )
+
+    def create_or_update_orm_specs_data(
+        self, session: scoped_session, batch_size: Optional[int] = None
+    ) -> OrmProject:
         project: Optional[OrmProject] = session.execute(
             select(OrmProject).filter_by(name=self.name)
         ).scalar_one_or_none()
         if project is not None:
             logger.info(
-                f"Project {self.name} already exists! Will only accept HITs/Journeys with new global_unique_ids."
+                f"Project {self.name} already exists! Will only add new HITs/Journeys."
             )
+            diff = self.get_orm_specs_diff(session, project)
+            logger.info(diff.get_report(self.name))
+            if diff.changed:
+                raise SpecsChangedException(self.name, diff.changed)
             project.email = self.email
 
-            for new_hit in self.hits:
-                if new_hit.global_unique_id is None:
-                    logger.info("HIT missing global_unique_id. Skipping...")
-                    continue
-                hitspec_in_db: Optional[OrmHit] = session.execute(
-                    select(OrmHit).filter_by(global_unique_id=new_hit.global_unique_id)
-                ).scalar_one_or_none()
-                if hitspec_in_db is not None:
-                    logger.info(
-                        f"HIT {new_hit.global_unique_id} already exists. Checking whether to add new journeys."
-                    )
-                    for journey in new_hit.journeys:
-                        if journey.global_unique_id is None:
-                            logger.info(
-                                "Cant' add new journeys to HIT without a global_unique_id. Skipping..."
-                            )
-                            continue
-                        journey_in_db = session.execute(
-                            select(OrmJourney).filter_by(
-                                global_unique_id=journey.global_unique_id
-                            )
-                        ).scalar_one_or_none()
-                        if journey_in_db is not None:
-                            logger.info(
-                                f"Journey {journey.global_unique_id} already exists. Skipping..."
-                            )
-                        else:
-                            logger.info(
-                                f"Journey {journey.global_unique_id} being created."
-                            )
-                            journey_orm = journey.create_orm_journey_object()
-                            hitspec_in_db.append_journeyspecs([journey_orm])
-                else:
-                    project.hitspecs.append(new_hit.create_orm_hit_object())
+            journeys_by_hitspec = defaultdict(list)
+            for hitspec_id, journey in diff.added_journeys:
+                journeys_by_hitspec[hitspec_id].append(journey)
+            hitspec_ids = set(journeys_by_hitspec) | set(diff.updated_fingerprints)
+            if hitspec_ids:
+                hitspecs = session.scalars(
+                    select(OrmHit).where(OrmHit.id.in_(hitspec_ids))
+                )
+                for hitspec_in_db in hitspecs:
+                    if hitspec_in_db.id in journeys_by_hitspec:
+                        hitspec_in_db.append_journeyspecs(
+                            [
+                                j.create_orm_journey_object()
+                                for j in journeys_by_hitspec[hitspec_in_db.id]
+                            ]
+                        )
+                    if hitspec_in_db.id in diff.updated_fingerprints:
+                        hitspec_in_db.fingerprint = diff.updated_fingerprints[
+                            hitspec_in_db.id
+                        ]
+
+            self.add_orm_hits_in_batches(project, diff.added_hits, session, batch_size)
         else:
             logger.info(
                 f"Project {self.name} did not exist. Will be created from scratch as is."
             )
-            project = OrmProject(
-                self.name, self.email, [h.create_orm_hit_object() for h in self.hits]
-            )
+            project = OrmProject(self.name, self.email, [])
+            self.add_orm_hits_in_batches(project, self.hits, session, batch_size)
             logger.debug(f"Created ORM Project: {str(project)}")
         return project
 
@@ -288,19 +642,31 @@ class CovfeeApp(BaseDataclass):
         super().__init__()
         self._projects_specs = projects
 
+    def get_database_changes_report(self, session: Optional[scoped_session]) -> str:
+        """Describes the changes that adding the projects to the database would make.
+        With session=None, the database is assumed to be empty.
+        """
+        return "\n".join(
+            project_specs.get_orm_specs_diff(session).get_report(project_specs.name)
+            for project_specs in self._projects_specs
+        )
+
     def add_to_database_new_or_updated_projects_specifications_and_instances(
-        self, session: scoped_session
+        self, session: scoped_session, batch_size: Optional[int] = None
     ) -> List[OrmProject]:
         """
         If a session is provided, it is assumed that the related projects could already exist and we
         could potentially be committing new specs and their related instances.
+        If batch_size is given, new HITs are flushed to the database in batches of that size.
         """
         for project_specs in self._projects_specs:
             # We first create or update the project specs data, meaning the respective
             # hitspecs and journeyspecs. If the project is new, it will create data for
             # all provided HITs. Otherwise, it will create specs only for new HITs
             # or journeys with global_unique_ids.
-            orm_project = project_specs.create_or_update_orm_specs_data(session)
+            orm_project = project_specs.create_or_update_orm_specs_data(
+                session, batch_size
+            )
 
             # We then create instances for hitspecs and journeyspecs without instances.
             # This is equally valid for a newly created project, or the newly created specs
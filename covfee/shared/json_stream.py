@@ -0,0 +1,143 @@
+import json
+from typing import Any, Dict, Iterator, Optional, TextIO, Tuple
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+# characters that may follow a complete value
+_DELIMITERS = _WHITESPACE + ",:]}"
+_END = object()
+
+
+class JsonObjectStream:
+    """Incrementally parses a JSON file containing a single object, one of whose
+    properties is a (potentially very large) list.
+
+    The items of the list are yielded one by one by iter_items, so that only
+    one item (and a read buffer) is held in memory at a time. The remaining
+    properties of the object are collected in the header.
+    """
+
+    def __init__(self, path: str, list_key: str, buffer_size: int = 1 << 20):
+        self.path = path
+        self.list_key = list_key
+        self.buffer_size = buffer_size
+        self.header: Optional[Dict[str, Any]] = None
+        self.chars_read = 0
+
+        self._file: Optional[TextIO] = None
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _open(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, "r", encoding="utf-8")
+        self._buffer, self._pos, self._eof = "", 0, False
+        self.chars_read = 0
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _fill(self) -> bool:
+        """Reads more data into the buffer. Returns False at the end of the file."""
+        if self._eof:
+            return False
+        # read at least as much as is pending in the buffer, so that large values
+        # are re-decoded a logarithmic number of times
+        chunk = self._file.read(max(self.buffer_size, len(self._buffer) - self._pos))
+        if not chunk:
+            self._eof = True
+            return False
+        self.chars_read += len(chunk)
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it."""
+        while True:
+            buffer = self._buffer
+            while self._pos < len(buffer) and buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise json.JSONDecodeError(
+                    "Unexpected end of file", self._buffer, self._pos
+                )
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if char not in chars:
+            raise json.JSONDecodeError(
+                f"Expected one of '{chars}'", self._buffer, self._pos
+            )
+        self._pos += 1
+        return char
+
+    def _decode_value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+                # a value must be followed by a delimiter: a number at the end of
+                # the buffer (eg. "2.") may continue in the next chunk of the file
+                buffer = self._buffer
+                if (end < len(buffer) and buffer[end] in _DELIMITERS) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def _iter_object(self, skip_list: bool) -> Iterator[Any]:
+        """Parses the top-level object, filling in the header and yielding the list
+        items (or skipping them if skip_list=True).
+        """
+        self._open()
+        self.header = {}
+        try:
+            self._expect("{")
+            if self._peek() == "}":
+                return
+            while True:
+                key = self._decode_value()
+                self._expect(":")
+                if key == self.list_key and self._peek() == "[":
+                    self._expect("[")
+                    if self._peek() == "]":
+                        self._expect("]")
+                    else:
+                        while True:
+                            item = self._decode_value()
+                            if not skip_list:
+                                yield item
+                            if self._expect(",]") == "]":
+                                break
+                else:
+                    self.header[key] = self._decode_value()
+                if self._expect(",}") == "}":
+                    return
+        finally:
+            self._close()
+
+    def read_header(self, required_keys: Tuple[str, ...] = ()) -> Dict[str, Any]:
+        """Parses the properties of the object other than the list.
+        Parsing stops at the list unless required_keys are missing from the header.
+        """
+        items = self._iter_object(skip_list=False)
+        has_items = next(items, _END) is not _END
+        items.close()
+        if has_items and any(k not in self.header for k in required_keys):
+            # the list appears before some of the required properties
+            for _ in self._iter_object(skip_list=True):
+                pass
+        return self.header
+
+    def iter_items(self) -> Iterator[Any]:
+        """Yields the items of the list. The header is complete after iteration."""
+        yield from self._iter_object(skip_list=False)
@@ -1,6 +1,10 @@
 import os
+import copy
 import json
+import glob
+import hashlib
 from collections import Counter
+from typing import Dict, List, Set, Tuple
 
 from json_ref_dict import materialize, RefDict
 
@@ -9,9 +13,43 @@ from covfee.config import config
 from .dataclass_maker import DataclassMaker
 
 
+# a discriminated union (Z) of definitions also referenced by another (X). Processing
+# Z modifies Y and W, so an edit of X must process Z again
+INCREMENTAL_BUILD_EXAMPLE = {
+    "Z": {"anyOf": [{"$ref": "#/definitions/Y"}, {"$ref": "#/definitions/W"}]},
+    "Y": {
+        "type": "object",
+        "properties": {"type": {"type": "string", "enum": ["Y"], "default": "Y"}},
+    },
+    "W": {
+        "type": "object",
+        "properties": {"type": {"type": "string", "enum": ["W"], "default": "W"}},
+    },
+    "X": {"type": "object", "properties": {"p": {"$ref": "#/definitions/Y"}}},
+}
+
+
+def hash_json(obj) -> str:
+    return hashlib.sha256(
+        json.dumps(obj, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
 class Schemata:
+    """Generates the JSON schemata (and task dataclasses) from the typescript specs.
+
+    Builds are incremental: a manifest in SCHEMATA_CACHE_PATH records the hash of
+    the typescript inputs and of every generated definition, so that typescript
+    compilation, post-processing and dataclass generation only run when (and for
+    what) the inputs changed.
+    """
+
     def __init__(self):
-        config.load_environment("dev")
         self.schemata = None
 
     def exists(self):
@@ -68,35 +106,222 @@ class Schemata:
         except:
             pass
 
-    def make(self):
+    @staticmethod
+    def get_input_paths() -> List[str]:
+        """Returns the typescript files (and config) that the schemata are built from"""
+        shared_path = config["COVFEE_SHARED_PATH"]
+        paths = [
+            os.path.join(shared_path, "tsconfig.json"),
+            *glob.glob(os.path.join(shared_path, "*.ts")),
+            *glob.glob(os.path.join(shared_path, "spec", "**", "*.ts"), recursive=True),
+            *glob.glob(
+                os.path.join(config["COVFEE_CLIENT_PATH"], "tasks", "**", "spec.ts"),
+                recursive=True,
+            ),
+        ]
+        return sorted(p for p in paths if os.path.isfile(p))
+
+    def get_inputs_hash(self) -> str:
+        base_path = config["COVFEE_BASE_PATH"]
+        return hash_json(
+            {os.path.relpath(p, base_path): hash_file(p) for p in self.get_input_paths()}
+        )
+
+    @staticmethod
+    def get_manifest_path() -> str:
+        return os.path.join(config["SCHEMATA_CACHE_PATH"], "manifest.json")
+
+    def load_manifest(self) -> Dict:
         try:
-            os.remove(config["SCHEMATA_PATH"])
+            with open(self.get_manifest_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest: Dict):
+        os.makedirs(config["SCHEMATA_CACHE_PATH"], exist_ok=True)
+        with open(self.get_manifest_path(), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    def is_up_to_date(self) -> bool:
+        """True if the schemata and dataclasses were built from the current inputs"""
+        manifest = self.load_manifest()
+        return (
+            self.exists()
+            and os.path.exists(config["DATACLASSES_PATH"])
+            and manifest.get("inputs_hash") == self.get_inputs_hash()
+            and manifest.get("schemata_hash") == hash_file(config["SCHEMATA_PATH"])
+            and manifest.get("dataclasses_schemata_hash") == manifest["schemata_hash"]
+        )
+
+    def make(self, force: bool = False) -> bool:
+        """Builds the schemata if the typescript inputs changed since the last build.
+        Returns True if the schemata were rebuilt.
+        """
+        manifest = self.load_manifest()
+        inputs_hash = self.get_inputs_hash()
+        if (
+            not force
+            and self.exists()
+            and manifest.get("inputs_hash") == inputs_hash
+            and manifest.get("schemata_hash") == hash_file(config["SCHEMATA_PATH"])
+        ):
+            self.schemata = None
+            self.load()
+            return False
+
+        # make the typescript into json schemata
+        os.makedirs(config["SCHEMATA_CACHE_PATH"], exist_ok=True)
+        raw_path = os.path.join(config["SCHEMATA_CACHE_PATH"], "raw_schemata.json")
+        try:
+            os.remove(raw_path)
         except OSError:
             pass
-        # make the typescript into json schemata
         with working_directory(config["COVFEE_SHARED_PATH"]):
             tsconfig_path = os.path.join(config["COVFEE_SHARED_PATH"], "tsconfig.json")
-            cmd = f'npx typescript-json-schema {tsconfig_path} "MyProjectSpec" --titles --ignoreErrors --required -o {config["SCHEMATA_PATH"]}'
+            cmd = f'npx typescript-json-schema {tsconfig_path} "MyProjectSpec" --titles --ignoreErrors --required -o {raw_path}'
             os.system(cmd)
 
         # process the schemata for validation
-        schemata = json.load(open(config["SCHEMATA_PATH"]))
-        defs_only = {
+        schemata = json.load(open(raw_path))
+        raw_definitions = schemata["definitions"]
+        raw_hashes = {k: hash_json(d) for k, d in raw_definitions.items()}
+
+        # only the definitions affected by a change are processed again
+        previous = None
+        if not force and self.exists() and "definition_hashes" in manifest:
+            previous = json.load(open(config["SCHEMATA_PATH"]))["definitions"]
+        definitions, to_process = self.process_definitions(
+            raw_definitions,
+            raw_hashes,
+            manifest.get("definition_hashes", {}) if previous is not None else {},
+            previous or {},
+        )
+        self.schemata = {
             "$schema": schemata["$schema"],
-            "definitions": schemata["definitions"],
+            "definitions": definitions,
         }
-        self.schemata = defs_only
 
-        self.schemata["definitions"] = {
-            k: self.add_discriminators(d)
-            for k, d in self.schemata["definitions"].items()
-        }
         json.dump(self.schemata, open(config["SCHEMATA_PATH"], "w"), indent=2)
 
+        manifest.update(
+            inputs_hash=inputs_hash,
+            schemata_hash=hash_file(config["SCHEMATA_PATH"]),
+            definition_hashes=raw_hashes,
+            processed_definitions=len(to_process),
+        )
+        self.save_manifest(manifest)
+        return True
+
+    def process_definitions(
+        self,
+        raw_definitions: Dict,
+        raw_hashes: Dict[str, str],
+        previous_hashes: Dict[str, str],
+        previous_definitions: Dict,
+    ) -> Tuple[Dict, Set[str]]:
+        """Post-processes the raw definitions, reusing the previously processed
+        definitions that are not affected by a change. Returns the definitions and
+        the names of those processed. The raw definitions processed are modified.
+        """
+        to_process = self.get_definitions_to_process(
+            raw_definitions, raw_hashes, previous_hashes, previous_definitions
+        )
+        definitions = {
+            k: (raw_definitions[k] if k in to_process else previous_definitions[k])
+            for k in raw_definitions
+        }
+        for k in raw_definitions:
+            if k in to_process:
+                definitions[k] = self.add_discriminators(definitions[k], definitions)
+        return definitions, to_process
+
+    @staticmethod
+    def get_references(definition) -> Set[str]:
+        refs = set()
+        nodes = [definition]
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, dict):
+                ref = node.get("$ref")
+                if isinstance(ref, str) and ref.startswith("#/definitions/"):
+                    refs.add(ref[14:])
+                nodes += node.values()
+            elif isinstance(node, list):
+                nodes += node
+        return refs
+
+    def get_definitions_to_process(
+        self,
+        raw_definitions: Dict,
+        raw_hashes: Dict[str, str],
+        previous_hashes: Dict[str, str],
+        previous_definitions: Dict,
+    ) -> Set[str]:
+        """Returns the definitions to process again: those connected to a changed
+        definition through references, in either direction. Processing a
+        definition modifies the definitions it references, so the processed form
+        of a definition also depends on the definitions referencing it.
+        """
+        # references that were removed are included, as processing a definition
+        # modifies the definitions it references
+        references = {
+            k: self.get_references(d) | self.get_references(previous_definitions.get(k))
+            for k, d in raw_definitions.items()
+        }
+
+        neighbours = {k: set() for k in raw_definitions}
+        for k, refs in references.items():
+            for ref in refs:
+                if ref in neighbours:
+                    neighbours[k].add(ref)
+                    neighbours[ref].add(k)
+
+        changed = {
+            k
+            for k in raw_definitions
+            if previous_hashes.get(k) != raw_hashes[k] or k not in previous_definitions
+        }
+        to_process, pending = set(), list(changed)
+        while pending:
+            name = pending.pop()
+            if name not in to_process:
+                to_process.add(name)
+                pending += neighbours[name]
+        return to_process
+
+    def check_incremental_build(self, raw_definitions: Dict) -> List[str]:
+        """Edits every definition in turn and compares the incremental build from
+        the unedited schemata with a full build. Returns the names of the
+        definitions whose edit gives a different output.
+        """
+        previous_hashes = {k: hash_json(d) for k, d in raw_definitions.items()}
+        previous, _ = self.process_definitions(
+            copy.deepcopy(raw_definitions), previous_hashes, {}, {}
+        )
+        failures = []
+        for name in raw_definitions:
+            edited = copy.deepcopy(raw_definitions)
+            edited[name]["description"] = "edited"
+            hashes = {k: hash_json(d) for k, d in edited.items()}
+            full, _ = self.process_definitions(copy.deepcopy(edited), hashes, {}, {})
+            incremental, _ = self.process_definitions(
+                copy.deepcopy(edited),
+                hashes,
+                previous_hashes,
+                copy.deepcopy(previous),
+            )
+            if hash_json(incremental) != hash_json(full):
+                failures.append(name)
+        return failures
+
     def get_ref(self, ref):
         return self.schemata["definitions"][ref[14:]]
 
-    def add_discriminators(self, definition):
+    def add_discriminators(self, definition, definitions: Dict = None):
+        if definitions is None:
+            definitions = self.schemata["definitions"]
+
         def resolve(node):
             # Returns a list of the resolved children nodes of a node up to nodes with properties
             if "allOf" in node:
@@ -106,7 +331,7 @@ class Schemata:
                 raise Exception("found oneOf in node")
 
             if "$ref" in node:
-                return resolve(self.get_ref(node["$ref"]))
+                return resolve(definitions[node["$ref"][14:]])
 
             if "anyOf" in node:
                 return [e for n in node["anyOf"] for e in resolve(n)]
@@ -180,7 +405,20 @@ class Schemata:
 
         return recursive_dfs(definition)
 
-    def make_dataclasses(self):
+    def make_dataclasses(self, force: bool = False) -> bool:
+        """Generates the task dataclasses if the schemata changed since they were
+        last generated. Returns True if the dataclasses were generated.
+        """
+        self.load()
+        manifest = self.load_manifest()
+        schemata_hash = hash_file(config["SCHEMATA_PATH"])
+        if (
+            not force
+            and os.path.exists(config["DATACLASSES_PATH"])
+            and manifest.get("dataclasses_schemata_hash") == schemata_hash
+        ):
+            return False
+
         task_specs = [
             sch
             for sch in self.schemata["definitions"].values()
@@ -194,5 +432,9 @@ class Schemata:
         with open(config["DATACLASSES_PATH"], "w") as f:
             f.write(pfile)
 
+        manifest["dataclasses_schemata_hash"] = schemata_hash
+        self.save_manifest(manifest)
+        return True
+
 
 schemata = Schemata()
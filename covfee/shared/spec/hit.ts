@@ -37,7 +37,7 @@ export interface HitSpec {
   /**
    * list of journeys in the HIT
    */
-  journeys: JourneySpec
+  journeys: JourneySpec[]
   /**
    * number of copies or instances of the HIT
    */
@@ -6,13 +6,12 @@ import subprocess
 from flask import current_app as app
 from .validation_errors import JavascriptError, ValidationError
 import zmq
-context = zmq.Context()
 
 class AjvValidator:
 
     def __init__(self):
         #  Socket to talk to server
-        self.socket = context.socket(zmq.REQ)
+        self.socket = zmq.Context.instance().socket(zmq.REQ)
         self.socket.setsockopt(zmq.RCVTIMEO, 1000)
         # bind to a random port in loopback iface
         port = self.socket.bind_to_random_port("tcp://127.0.0.1")
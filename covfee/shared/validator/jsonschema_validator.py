@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from jsonschema import Draft7Validator
+
+from covfee.config import config
+from .validation_errors import ValidationError, ValidationErrors
+
+# definitions validated by the JsonSchemaValidator
+ROOT_DEFINITIONS = ["ProjectSpec", "HitSpec"]
+
+# (message, path, instance) tuples, picklable so that they can be returned by workers
+ErrorTuple = Tuple[str, List[str], object]
+
+# per-process validators, created by the worker initializer
+_worker_validators: Dict[str, Draft7Validator] = {}
+
+
+def get_schemata_hash(schemata_path: str) -> str:
+    with open(schemata_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def make_standalone_schema(definitions: Dict, name: str) -> Dict:
+    """Returns a schema for a definition that includes only the definitions
+    reachable from it through $refs.
+    """
+    reachable = {}
+    pending = [name]
+    while pending:
+        def_name = pending.pop()
+        if def_name in reachable:
+            continue
+        reachable[def_name] = definitions[def_name]
+
+        nodes = [definitions[def_name]]
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, dict):
+                ref = node.get("$ref")
+                if isinstance(ref, str) and ref.startswith("#/definitions/"):
+                    pending.append(ref[len("#/definitions/") :])
+                nodes += node.values()
+            elif isinstance(node, list):
+                nodes += node
+
+    return {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "$ref": f"#/definitions/{name}",
+        "definitions": reachable,
+    }
+
+
+def get_friendly_errors(error) -> List[ErrorTuple]:
+    """Translates a jsonschema error into (message, path, instance) tuples.
+
+    Errors in discriminated unions (oneOf + discriminator, see Schemata.add_discriminators)
+    are reported for the branch selected by the discriminator property instead of
+    for every branch of the union.
+    """
+    path = [str(p) for p in error.absolute_path]
+
+    discriminator = (
+        error.schema.get("discriminator", None)
+        if isinstance(error.schema, dict)
+        else None
+    )
+    if error.validator == "oneOf" and discriminator is not None:
+        tag = discriminator["propertyName"]
+        branch_errors = {}
+        for suberror in error.context:
+            branch_errors.setdefault(suberror.schema_path[0], []).append(suberror)
+
+        # branches whose discriminator property matches the instance
+        matching_branches = [
+            branch
+            for branch in range(len(error.schema["oneOf"]))
+            if not any(
+                list(e.relative_path) == [tag] for e in branch_errors.get(branch, [])
+            )
+        ]
+        if len(matching_branches) == 0:
+            tag_value = (
+                error.instance.get(tag) if isinstance(error.instance, dict) else None
+            )
+            return [
+                (
+                    f"Invalid value '{tag_value}' for property '{tag}'. Please make sure you are using a supported value.",
+                    path,
+                    error.instance,
+                )
+            ]
+        return [
+            friendly
+            for suberror in branch_errors.get(matching_branches[0], [])
+            for friendly in get_friendly_errors(suberror)
+        ]
+
+    return [(error.message, path, error.instance)]
+
+
+def raise_validation_errors(errors: List[ErrorTuple]):
+    if len(errors) == 1:
+        message, path, instance = errors[0]
+        raise ValidationError(message, path, instance)
+    if len(errors) > 1:
+        raise ValidationErrors(
+            [
+                ValidationError(message, path, instance)
+                for message, path, instance in errors
+            ]
+        )
+
+
+def init_hits_validator_worker(schema: Dict):
+    _worker_validators["HitSpec"] = Draft7Validator(schema)
+
+
+def validate_hits_chunk(
+    start_index: int, hits: List[Dict], validator: Optional[Draft7Validator] = None
+) -> List[ErrorTuple]:
+    if validator is None:
+        validator = _worker_validators["HitSpec"]
+
+    errors = []
+    for i, hit in enumerate(hits):
+        for error in validator.iter_errors(hit):
+            for message, path, instance in get_friendly_errors(error):
+                path = ["hits", str(start_index + i), *path]
+                errors.append((message, path, instance))
+    return errors
+
+
+class JsonSchemaValidator:
+    """Validates covfee project specs in-process, using the schemata generated by
+    Schemata.make.
+
+    - HITs are validated in parallel chunks (in worker processes when workers > 1).
+    - All the errors found are reported, together with their path in the project.
+    - The standalone schemas used for validation are checked once and cached on disk,
+      in a file keyed by the hash of the schemata.
+    """
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 100):
+        self.workers = (
+            workers if workers is not None else config.get("VALIDATOR_WORKERS", 1)
+        )
+        self.chunk_size = chunk_size
+        self.schemas = self.load_schemas()
+        self.validators = {
+            name: Draft7Validator(schema) for name, schema in self.schemas.items()
+        }
+
+    @staticmethod
+    def load_schemas() -> Dict[str, Dict]:
+        schemata_hash = get_schemata_hash(config["SCHEMATA_PATH"])
+        cache_path = os.path.join(
+            config["SCHEMATA_CACHE_PATH"], f"validators.{schemata_hash[:16]}.json"
+        )
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                return json.load(f)
+
+        with open(config["SCHEMATA_PATH"]) as f:
+            definitions = json.load(f)["definitions"]
+
+        schemas = {}
+        for name in ROOT_DEFINITIONS:
+            schemas[name] = make_standalone_schema(definitions, name)
+            Draft7Validator.check_schema(schemas[name])
+
+        os.makedirs(config["SCHEMATA_CACHE_PATH"], exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump(schemas, f)
+        return schemas
+
+    def validate_hits(self, hits: List[Dict]) -> List[ErrorTuple]:
+        chunks = [
+            (start, hits[start : start + self.chunk_size])
+            for start in range(0, len(hits), self.chunk_size)
+        ]
+        if self.workers <= 1 or len(chunks) <= 1:
+            return [
+                error
+                for start, chunk in chunks
+                for error in validate_hits_chunk(
+                    start, chunk, self.validators["HitSpec"]
+                )
+            ]
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=init_hits_validator_worker,
+            initargs=(self.schemas["HitSpec"],),
+        ) as executor:
+            futures = [
+                executor.submit(validate_hits_chunk, start, chunk)
+                for start, chunk in chunks
+            ]
+            return [error for future in futures for error in future.result()]
+
+    def validate_project(self, project_spec: Dict):
+        hits = project_spec.get("hits", None)
+        if isinstance(hits, list):
+            # hits are validated separately, in chunks
+            project_shell = {**project_spec, "hits": []}
+        else:
+            hits, project_shell = [], project_spec
+
+        errors = [
+            friendly
+            for error in self.validators["ProjectSpec"].iter_errors(project_shell)
+            for friendly in get_friendly_errors(error)
+        ]
+        errors += self.validate_hits(hits)
+        raise_validation_errors(errors)
@@ -90,4 +90,16 @@ class ValidationError(Exception):
     def print_friendly(self):
         print(f'\nError in project{self.get_python_path_string()} for object: ')
         print(Fore.BLUE+self.prune_pprint(self.instance, indent=4))
-        print('Error: '+ Fore.RED+str(self))
\ No newline at end of file
+        print('Error: '+ Fore.RED+str(self))
+
+class ValidationErrors(ValidationError):
+    '''Groups all the validation errors found in a project spec.'''
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} validation error(s) found.')
+        self.errors = errors
+
+    def print_friendly(self):
+        for error in self.errors:
+            error.print_friendly()
+        print(f'\n{len(self.errors)} validation error(s) found.')
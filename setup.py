@@ -60,7 +60,17 @@ setup(
     extras_require={        
         'dev': [
             'gevent == 23.9.1',
-        ]
+            'pytest == 8.*',
+            # websocket transport of the load test's socketio clients
+            'websocket-client == 1.*',
+        ],
+        # faster JSON, MessagePack Socket.IO packets (SOCKETIO_SERIALIZER) and
+        # zstd-compressed JSON columns (JSON_COMPRESSION_CODEC)
+        'serialization': [
+            'orjson == 3.*',
+            'msgpack == 1.*',
+            'zstandard == 0.*',
+        ],
     },
     python_requires=">=3.6",
 )
@@ -0,0 +1,49 @@
+import pytest
+
+from covfee.config import config
+
+
+@pytest.fixture(scope="session", autouse=True)
+def dev_config():
+    config.load_environment("dev")
+    return config
+
+
+@pytest.fixture
+def make_database(tmp_path):
+    """Returns a function that creates an (in-memory) database with the load test's
+    synthetic project, of participants HITs with nodes task nodes each, and returns
+    its sessionmaker.
+    """
+    from covfee.cli.loadtest import make_loadtest_app
+    from covfee.launcher import Launcher
+    from covfee.server.db import create_database_sessionmaker
+
+    engines = []
+
+    def make(participants: int = 2, nodes: int = 2):
+        launcher = Launcher(
+            "dev",
+            make_loadtest_app(participants, nodes),
+            str(tmp_path),
+            auth_enabled=False,
+        )
+        launcher.create_or_update_database(delete_existing_data=True)
+        engines.append(launcher.engine)
+        return create_database_sessionmaker(launcher.engine)
+
+    yield make
+    for engine in engines:
+        engine.dispose()
+
+
+@pytest.fixture
+def make_app():
+    """Returns a function that creates the flask app of a sessionmaker"""
+    from covfee.server.app import create_app_and_socketio
+
+    def make(session_local):
+        _, app = create_app_and_socketio("dev", session_local)
+        return app
+
+    return make
@@ -0,0 +1,61 @@
+"""Admins get chat summaries (read dates, unread counts) in pages, and reads send
+only the summary of the chat to the admins.
+"""
+
+import pytest
+from sqlalchemy import select
+
+from covfee.server.orm.chat import Chat, ChatJourney
+from covfee.server.socketio.socket import socketio
+
+
+@pytest.fixture
+def admin_client(make_database, make_app):
+    session_local = make_database(participants=3, nodes=2)
+    app = make_app(session_local)
+    with session_local() as session:
+        chat_ids = sorted(session.scalars(select(Chat.id)))
+    client = socketio.test_client(app, namespace="/admin_chat")
+    yield client, chat_ids, session_local
+    client.disconnect(namespace="/admin_chat")
+
+
+def get_summaries(client, **data):
+    client.emit("summaries", data, namespace="/admin_chat")
+    (event,) = client.get_received("/admin_chat")
+    assert event["name"] == "chat_summaries"
+    return event["args"][0]
+
+
+def test_summaries_paging(admin_client):
+    client, chat_ids, _ = admin_client
+    assert len(chat_ids) > 2
+
+    pages, after = [], 0
+    while True:
+        page = get_summaries(client, after=after, limit=2)
+        if not page:
+            break
+        assert len(page) <= 2
+        pages += page
+        after = page[-1]["id"]
+    assert [summary["id"] for summary in pages] == chat_ids
+
+    scoped = get_summaries(client, chatIds=chat_ids[:1])
+    assert [summary["id"] for summary in scoped] == chat_ids[:1]
+
+
+def test_admin_read_sends_summary(admin_client):
+    client, chat_ids, session_local = admin_client
+    with session_local() as session:
+        assoc = session.query(ChatJourney).first()
+        chat_id, journey_id = assoc.chat_id, assoc.journeyinstance_id.hex()
+
+    client.emit("read", {"chatId": chat_id}, namespace="/admin_chat")
+    events = client.get_received("/admin_chat")
+    assert [event["name"] for event in events] == ["chat_summary"]
+    summary = events[0]["args"][0]
+    assert summary["id"] == chat_id
+    assert summary["read_by_admin_at"] is not None
+    assert summary["read_at_by_journey"] == {journey_id: None}
+    assert summary["unread_by_journey"] == {journey_id: 0}
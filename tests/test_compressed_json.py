@@ -0,0 +1,37 @@
+"""CompressedJSON values are compressed from JSON_COMPRESSION_MIN_SIZE bytes, with
+zstd when the zstandard package is installed and zlib otherwise.
+"""
+
+import pytest
+
+from covfee.server.orm import types
+
+VALUE = {"data": list(range(2000))}
+
+
+@pytest.fixture
+def codec():
+    """Restores the codec of the compression settings"""
+    previous = types.json_compression.codec
+    yield
+    types.json_compression.codec = previous
+
+
+@pytest.mark.parametrize("name", ["zlib", "zstd"])
+def test_round_trip(codec, name):
+    types.json_compression.codec = name
+    column = types.CompressedJSON(min_size=16)
+
+    stored = column.process_bind_param(VALUE, None)
+    assert types.is_compressed(stored)
+    if name == "zstd" and types.zstandard is not None:
+        assert stored[len(types.MAGIC) + 1] == types.CODEC_ZSTD
+    else:
+        assert stored[len(types.MAGIC) + 1] == types.CODEC_ZLIB
+    assert column.process_result_value(stored, None) == VALUE
+
+
+def test_small_values_are_text():
+    column = types.CompressedJSON(min_size=16)
+    assert column.process_bind_param({"a": 1}, None) == '{"a": 1}'
+    assert column.process_result_value('{"a": 1}', None) == {"a": 1}
@@ -0,0 +1,51 @@
+"""The listing endpoints don't load the deferred (large JSON) columns.
+
+Each endpoint is requested twice: the first request fills the caches (eg. of the
+serialized node specs), the second must not load any deferred column other than
+those the endpoint returns.
+"""
+
+import pytest
+
+from covfee.server.orm import Base, HITInstance, JourneyInstance, Project
+from covfee.server.orm.deferred import record_deferred_loads
+from covfee.server.orm.task import TaskInstance
+
+JOURNEY_COLUMNS = ["JourneyInstance.interface", "JourneyInstance.aux"]
+
+
+@pytest.fixture
+def client(make_database, make_app):
+    session_local = make_database(participants=2, nodes=2)
+    app = make_app(session_local)
+    app.config["UNSAFE_MODE_ON"] = True
+    return app.test_client(), session_local
+
+
+@pytest.mark.parametrize(
+    "path, returned",
+    [
+        ("/api/projects?with_hits=1&with_hit_nodes=1", []),
+        ("/api/projects/{project_id}?with_hits=1&with_hit_nodes=1", []),
+        ("/api/instances/{hit_id}", []),
+        ("/api/journeys/{journey_id}", JOURNEY_COLUMNS),
+        ("/api/journeys/{journey_id}?with_specs=0", JOURNEY_COLUMNS),
+        ("/api/nodes/{node_id}", []),
+        ("/api/nodes/{node_id}?with_spec=0", []),
+    ],
+)
+def test_listing_endpoint(client, path, returned):
+    client, session_local = client
+    with session_local() as session:
+        url = path.format(
+            project_id=session.query(Project).first().id,
+            hit_id=session.query(HITInstance).first().id.hex(),
+            journey_id=session.query(JourneyInstance).first().id.hex(),
+            node_id=session.query(TaskInstance).first().id,
+        )
+
+    client.get(url)
+    with record_deferred_loads(Base) as loads:
+        res = client.get(url)
+    assert res.status_code == 200
+    assert sorted(set(loads) - set(returned)) == []
@@ -0,0 +1,39 @@
+"""The hot queries use indexes, after create_all and after migrating a database
+created before the indexes existed.
+"""
+
+from sqlalchemy import create_engine, text
+
+import covfee.server.orm as orm
+import covfee.server.tasks  # noqa: F401 (registers the task tables)
+from covfee.server.migrations import check_query_plans, get_pending_migrations, migrate
+
+
+def assert_uses_indexes(engine):
+    with engine.connect() as connection:
+        assert check_query_plans(connection) == []
+        assert get_pending_migrations(connection) == []
+
+
+def test_create_all():
+    engine = create_engine("sqlite://")
+    orm.Base.metadata.create_all(engine)
+    migrate(engine)
+    assert_uses_indexes(engine)
+
+
+def test_migrated():
+    engine = create_engine("sqlite://")
+    orm.Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        # indexes of unique/primary key constraints have no sql
+        index_names = connection.execute(
+            text(
+                "SELECT name FROM sqlite_master "
+                "WHERE type = 'index' AND sql IS NOT NULL"
+            )
+        ).scalars()
+        for name in list(index_names):
+            connection.execute(text(f'DROP INDEX "{name}"'))
+    migrate(engine)
+    assert_uses_indexes(engine)
@@ -0,0 +1,32 @@
+"""The incremental JSON parser of project files gives the same output as
+json.loads at every read buffer size.
+"""
+
+import json
+
+import pytest
+
+from covfee.shared.json_stream import JsonObjectStream
+
+
+# documents whose values end at every position of the read buffer
+@pytest.mark.parametrize(
+    "document",
+    [
+        '{"hits": []}',
+        '{"hits":[1, 2.5, 300]}',
+        '{"name": "a", "hits": [-1.5e+10, 0, 12, 3E-2], "email": "b"}',
+        '{"hits": [true, false, null, "", "x\\u00e9\\"y\\\\"], "n": -0.25}',
+        '{"a": {"b": [1, {"c": null}]}, "hits": [{"k": [1e3, {}]}, [], [[2]]] }',
+        '\n{ "hits" : [ 7 ,\n 8.0 ] , "z" : 12345 }\n',
+    ],
+)
+def test_buffer_sizes(tmp_path, document):
+    path = tmp_path / "project.json"
+    path.write_text(document, encoding="utf-8")
+    expected = json.loads(document)
+    expected_items = expected.pop("hits")
+    for buffer_size in range(1, len(document) + 1):
+        stream = JsonObjectStream(str(path), "hits", buffer_size=buffer_size)
+        assert list(stream.iter_items()) == expected_items, buffer_size
+        assert stream.header == expected, buffer_size
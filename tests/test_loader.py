@@ -0,0 +1,43 @@
+"""Loading of JSON project files."""
+
+import pytest
+
+from covfee.cli.loader_benchmark import write_synthetic_project
+from covfee.loader import Loader, make_hit_from_json_spec
+from covfee.shared.schemata import Schemata
+
+
+def test_make_hit_from_json_spec():
+    hit = make_hit_from_json_spec(
+        {
+            "id": "hit0",
+            "name": "HIT 0",
+            "nodes": [
+                {"type": "IncrementCounterTask", "name": "Counter 0"},
+                {"type": "IncrementCounterTask", "name": "Counter 1"},
+            ],
+            "journeys": [{"nodes": [0, 1]}, {"nodes": [1]}],
+        }
+    )
+    assert hit.global_unique_id == "hit0"
+    assert [
+        [node.name for node, _ in journey.nodes_players] for journey in hit.journeys
+    ] == [["Counter 0", "Counter 1"], ["Counter 1"]]
+    # nodes shared by journeys are the same dataclass
+    assert hit.journeys[0].nodes_players[1][0] is hit.journeys[1].nodes_players[0][0]
+
+
+def test_load_json_project(tmp_path):
+    if not Schemata().exists():
+        pytest.skip("covfee-dev schemata has not been run")
+    path = str(tmp_path / "project.covfee.json")
+    write_synthetic_project(path, hits=5, nodes=2)
+
+    covfee_app = Loader(path).load_project_spec_file_and_parse_as_covfee_app()
+    (project,) = covfee_app._projects_specs
+    assert [hit.global_unique_id for hit in project.hits] == [
+        f"hit{i}" for i in range(5)
+    ]
+    # the file is parsed once per load
+    with pytest.raises(RuntimeError):
+        list(project.hits)
@@ -0,0 +1,61 @@
+"""Queued logging (LOG_QUEUE): records are formatted and written by a native
+thread, so that the logging greenlet does not wait on them.
+"""
+
+import logging
+import time
+
+from eventlet import patcher
+
+from covfee.logger import (
+    NativeQueueListener,
+    StructuredMessage,
+    UnformattedQueueHandler,
+)
+
+_native_threading = patcher.original("threading")
+_native_queue = patcher.original("queue")
+_native_time = patcher.original("time")
+
+
+class SlowHandler(logging.Handler):
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.records = []
+
+    def emit(self, record):
+        # formats the record, and blocks the thread as slow I/O does
+        self.records.append((self.format(record), _native_threading.get_ident()))
+        _native_time.sleep(self.delay)
+
+
+def test_queued_records():
+    log_queue = _native_queue.SimpleQueue()
+    handler = SlowHandler(delay=0.2)
+    listener = NativeQueueListener(log_queue, handler)
+    test_logger = logging.getLogger("covfee.tests.queue")
+    test_logger.propagate = False
+    test_logger.addHandler(UnformattedQueueHandler(log_queue))
+    listener.start()
+    try:
+        formatted_by = []
+
+        def by():
+            formatted_by.append(_native_threading.get_ident())
+
+        start = time.monotonic()
+        for i in range(5):
+            test_logger.info(StructuredMessage("test.event", {"i": i, "by": by}))
+        # logging does not wait for the handler, nor format the messages
+        assert time.monotonic() - start < 0.1
+        assert formatted_by == []
+    finally:
+        listener.stop()
+        test_logger.handlers.clear()
+    assert [message for message, _ in handler.records] == [
+        f"test.event i={i} by=None" for i in range(5)
+    ]
+    main_thread = _native_threading.get_ident()
+    assert all(thread != main_thread for _, thread in handler.records)
+    assert all(thread != main_thread for thread in formatted_by)
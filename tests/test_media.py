@@ -0,0 +1,200 @@
+"""Range / If-Range handling of the media files served from www.
+
+A video file is written to the www folder and requested with the app's test
+client, with single, open-ended, suffix, unsatisfiable and multipart ranges,
+If-Range validators that match or not (including after the file is modified),
+conditional requests and the proxy handoff modes.
+"""
+
+import os
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import pytest
+from werkzeug.http import http_date
+from werkzeug.wsgi import FileWrapper
+
+from covfee.server.media import media_metadata_cache
+
+MEDIA_SIZE = 1000
+
+
+class MediaCase(NamedTuple):
+    name: str
+    # formatted with the etag and last_modified of the file, and those of the file
+    # before it was modified (old_etag, old_last_modified)
+    headers: Dict[str, str]
+    status: int
+    # byte range of the file expected in the body, None for an empty body
+    body: Optional[Tuple[int, int]]
+    content_range: Optional[str] = None
+    method: str = "GET"
+    # MEDIA_SENDFILE
+    sendfile: Optional[str] = None
+    # runs through a WSGI file_wrapper that ignores the Content-Length
+    file_wrapper: bool = False
+    # other response headers, formatted with the path of the file
+    expected_headers: Dict[str, str] = {}
+
+
+MEDIA_CASES = [
+    MediaCase("whole file", {}, 200, (0, MEDIA_SIZE)),
+    MediaCase(
+        "range",
+        {"Range": "bytes=100-199"},
+        206,
+        (100, 200),
+        f"bytes 100-199/{MEDIA_SIZE}",
+    ),
+    MediaCase(
+        "open-ended range",
+        {"Range": "bytes=900-"},
+        206,
+        (900, MEDIA_SIZE),
+        f"bytes 900-999/{MEDIA_SIZE}",
+    ),
+    MediaCase(
+        "suffix range",
+        {"Range": "bytes=-10"},
+        206,
+        (990, MEDIA_SIZE),
+        f"bytes 990-999/{MEDIA_SIZE}",
+    ),
+    MediaCase(
+        "range past the end",
+        {"Range": "bytes=990-2000"},
+        206,
+        (990, MEDIA_SIZE),
+        f"bytes 990-999/{MEDIA_SIZE}",
+    ),
+    MediaCase(
+        "unsatisfiable range",
+        {"Range": f"bytes={MEDIA_SIZE}-"},
+        416,
+        None,
+        f"bytes */{MEDIA_SIZE}",
+    ),
+    MediaCase(
+        "multipart range", {"Range": "bytes=0-9,20-29"}, 200, (0, MEDIA_SIZE)
+    ),
+    MediaCase(
+        "If-Range with the current etag",
+        {"Range": "bytes=0-9", "If-Range": '"{etag}"'},
+        206,
+        (0, 10),
+        f"bytes 0-9/{MEDIA_SIZE}",
+    ),
+    MediaCase(
+        "If-Range with an old etag",
+        {"Range": "bytes=0-9", "If-Range": '"{old_etag}"'},
+        200,
+        (0, MEDIA_SIZE),
+    ),
+    MediaCase(
+        "If-Range with the current date",
+        {"Range": "bytes=0-9", "If-Range": "{last_modified}"},
+        206,
+        (0, 10),
+        f"bytes 0-9/{MEDIA_SIZE}",
+    ),
+    MediaCase(
+        "If-Range with an old date",
+        {"Range": "bytes=0-9", "If-Range": "{old_last_modified}"},
+        200,
+        (0, MEDIA_SIZE),
+    ),
+    MediaCase("If-None-Match", {"If-None-Match": '"{etag}"'}, 304, None),
+    MediaCase(
+        "HEAD range",
+        {"Range": "bytes=0-9"},
+        206,
+        None,
+        f"bytes 0-9/{MEDIA_SIZE}",
+        method="HEAD",
+        expected_headers={"Content-Length": "10"},
+    ),
+    MediaCase(
+        "range through a file_wrapper",
+        {"Range": "bytes=100-199"},
+        206,
+        (100, 200),
+        f"bytes 100-199/{MEDIA_SIZE}",
+        file_wrapper=True,
+    ),
+    MediaCase(
+        "x-sendfile",
+        {"Range": "bytes=0-9"},
+        200,
+        None,
+        sendfile="x-sendfile",
+        expected_headers={"X-Sendfile": "{path}"},
+    ),
+    MediaCase(
+        "x-accel-redirect",
+        {"Range": "bytes=0-9"},
+        200,
+        None,
+        sendfile="x-accel-redirect",
+        expected_headers={"X-Accel-Redirect": "/_covfee_www/video.mp4"},
+    ),
+]
+
+
+@pytest.fixture
+def media(tmp_path, make_app):
+    """Returns the app serving the www folder, the content of its video file, and
+    the validators of the file and of its first version
+    """
+    from sqlalchemy import create_engine
+
+    from covfee.server.db import create_database_sessionmaker
+
+    path = os.path.join(tmp_path, "video.mp4")
+
+    def write_media(content: bytes, mtime: int):
+        with open(path, "wb") as f:
+            f.write(content)
+        os.utime(path, (mtime, mtime))
+        media_metadata_cache.clear()
+        return media_metadata_cache.get(path)
+
+    # the file is modified, so the validators of its first version are old
+    old_info = write_media(b"\0" * MEDIA_SIZE, 1_600_000_000)
+    content = bytes(i % 251 for i in range(MEDIA_SIZE))
+    info = write_media(content, 1_700_000_000)
+    validators = {
+        "etag": info.etag,
+        "last_modified": http_date(info.last_modified),
+        "old_etag": old_info.etag,
+        "old_last_modified": http_date(old_info.last_modified),
+    }
+
+    app = make_app(create_database_sessionmaker(create_engine("sqlite://")))
+    app.config["PROJECT_WWW_PATH"] = str(tmp_path)
+    app.config["MEDIA_ACCEL_REDIRECT_PREFIX"] = "/_covfee_www/"
+    yield app, path, content, validators
+    media_metadata_cache.clear()
+
+
+@pytest.mark.parametrize("case", MEDIA_CASES, ids=lambda case: case.name)
+def test_media_request(media, case: MediaCase):
+    app, path, content, validators = media
+    app.config["MEDIA_SENDFILE"] = case.sendfile
+    environ = {}
+    if case.file_wrapper:
+        environ["wsgi.file_wrapper"] = FileWrapper
+    res = app.test_client().open(
+        "/www/video.mp4",
+        method=case.method,
+        headers={k: v.format(**validators) for k, v in case.headers.items()},
+        environ_overrides=environ,
+    )
+
+    expected_body = b""
+    if case.body is not None:
+        expected_body = content[case.body[0] : case.body[1]]
+    assert res.status_code == case.status
+    assert res.get_data() == expected_body
+    assert res.headers.get("Content-Range") == case.content_range
+    for header, value in case.expected_headers.items():
+        assert res.headers.get(header) == value.format(path=path)
+    res.close()
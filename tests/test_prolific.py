@@ -0,0 +1,185 @@
+"""Cache of prolific invalid-participant lists, against a stub server.
+
+A local HTTP server stands in for the submissions endpoint of the Prolific API:
+it serves a paginated list of submissions, counts the requests, and can be made
+slow or failing.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from covfee.server.rest_api.utils import (
+    ProlificAPIRequestError,
+    ProlificInvalidParticipantsCache,
+)
+
+
+class StubProlificServer:
+    """Serves the submissions of each study in pages of page_size"""
+
+    def __init__(self, page_size: int = 2):
+        self.page_size = page_size
+        # maps study_id -> list of (participant_id, status)
+        self.submissions: Dict[str, List] = {}
+        self.requests = 0
+        self._requests_lock = threading.Lock()
+        self.delay = 0.0
+        self.failing = False
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._requests_lock:
+                    stub.requests += 1
+                time.sleep(stub.delay)
+                if stub.failing:
+                    self.send_error(503)
+                    return
+                self.respond(stub.get_page(urlparse(self.path).query))
+
+            def respond(self, page: Dict):
+                body = json.dumps(page).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except ConnectionError:
+                    # the client timed out
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.api_url = f"http://127.0.0.1:{self.server.server_address[1]}/api/v1"
+
+    def get_page(self, query: str) -> Dict:
+        args = parse_qs(query)
+        study_id = args["study"][0]
+        page = int(args.get("page", ["0"])[0])
+        submissions = self.submissions.get(study_id, [])
+
+        start = page * self.page_size
+        next_link = None
+        if start + self.page_size < len(submissions):
+            next_link = {
+                "href": f"{self.api_url}/submissions/"
+                f"?study={study_id}&page={page + 1}"
+            }
+        return {
+            "results": [
+                {"participant_id": participant_id, "status": status}
+                for participant_id, status in submissions[
+                    start : start + self.page_size
+                ]
+            ],
+            "_links": {"next": next_link},
+        }
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def stub():
+    with StubProlificServer(page_size=2) as stub:
+        # p2, p3 and p5 are invalid
+        stub.submissions["study"] = [
+            ("p1", "APPROVED"),
+            ("p2", "RETURNED"),
+            ("p3", "REJECTED"),
+            ("p4", "AWAITING REVIEW"),
+            ("p5", "TIMED-OUT"),
+        ]
+        yield stub
+
+
+def make_cache(stub: StubProlificServer, timeout: float = 2, **kwargs):
+    return ProlificInvalidParticipantsCache(
+        api_url=stub.api_url, timeout=timeout, **kwargs
+    )
+
+
+def test_pagination(stub):
+    # every page is requested, only the invalid statuses are kept
+    cache = make_cache(stub, ttl=60, max_stale=3600)
+    assert cache.get("study", "token") == {"p2", "p3", "p5"}
+    assert stub.requests == 3
+
+
+def test_ttl_hit(stub):
+    cache = make_cache(stub, ttl=60, max_stale=3600)
+    cache.get("study", "token")
+    stub.requests = 0
+    cache.get("study", "token")
+    assert stub.requests == 0
+
+
+def test_stale_while_revalidate(stub):
+    # outdated entries are served while a single background refresh runs
+    cache = make_cache(stub, ttl=0, max_stale=3600)
+    cache.get("study", "token")
+    stub.submissions["study"].append(("p6", "RETURNED"))
+    stub.requests = 0
+    stub.delay = 0.2
+    results = [cache.get("study", "token") for _ in range(5)]
+    assert results == [{"p2", "p3", "p5"}] * 5
+    assert wait_for(lambda: len(cache._refreshing) == 0)
+    stub.delay = 0
+    assert stub.requests == 3
+    cache.ttl = 60
+    assert cache.get("study", "token") == {"p2", "p3", "p5", "p6"}
+
+
+def test_stale_fallback(stub):
+    # expired entries are served if the API fails
+    cache = make_cache(stub, ttl=0, max_stale=0)
+    cache.get("study", "token")
+    stub.failing = True
+    assert cache.get("study", "token") == {"p2", "p3", "p5"}
+
+
+def test_failure_without_entry(stub):
+    stub.failing = True
+    with pytest.raises(ProlificAPIRequestError):
+        make_cache(stub).get("study", "token")
+
+
+def test_timeout(stub):
+    stub.delay = 0.5
+    start = time.monotonic()
+    with pytest.raises(ProlificAPIRequestError):
+        make_cache(stub, timeout=0.1).get("study", "token")
+    assert time.monotonic() - start < 0.4
+    stub.delay = 0
+
+
+def test_configured_api_url(stub, dev_config):
+    cache = ProlificInvalidParticipantsCache()
+    with pytest.raises(RuntimeError):
+        cache.get("study", "token")
+    cache.configure({**dev_config, "PROLIFIC_API_URL": stub.api_url})
+    assert cache.get("study", "token") == {"p2", "p3", "p5"}
@@ -0,0 +1,22 @@
+"""Incremental schemata builds give the same output as full builds (--force)."""
+
+import json
+import os
+
+import pytest
+
+from covfee.shared.schemata import INCREMENTAL_BUILD_EXAMPLE, Schemata
+
+
+def test_incremental_build_example():
+    assert Schemata().check_incremental_build(INCREMENTAL_BUILD_EXAMPLE) == []
+
+
+def test_incremental_build(dev_config):
+    # the last typescript-json-schema output, made by covfee-dev schemata
+    raw_path = os.path.join(dev_config["SCHEMATA_CACHE_PATH"], "raw_schemata.json")
+    if not os.path.exists(raw_path):
+        pytest.skip("covfee-dev schemata has not been run")
+    with open(raw_path) as f:
+        raw_definitions = json.load(f)["definitions"]
+    assert Schemata().check_incremental_build(raw_definitions) == []
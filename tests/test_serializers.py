@@ -0,0 +1,54 @@
+"""Base.to_dict gives the same dicts as the reflective to_dict it replaced.
+
+Base.to_dict used to walk the table columns of the model and convert each value
+with utils.to_dict (reflective_to_dict, which the covfee-dev serializer-benchmark
+command times against it). The rows of every model of the load test's synthetic
+project, with chat messages and responses added, are serialized both ways, loaded
+and expired, and must give the same dicts in the same key order.
+"""
+
+import pytest
+
+from covfee.cli.serializer_benchmark import add_sample_rows, reflective_to_dict
+from covfee.server.orm import Base
+
+import covfee.server.tasks  # noqa: F401 (registers the task tables)
+
+MODELS = sorted(
+    (mapper.class_ for mapper in Base.registry.mappers),
+    key=lambda model: model.__name__,
+)
+
+
+@pytest.fixture(scope="module")
+def session_local(tmp_path_factory):
+    from covfee.cli.loadtest import make_loadtest_app
+    from covfee.launcher import Launcher
+    from covfee.server.db import create_database_sessionmaker
+
+    launcher = Launcher(
+        "dev",
+        make_loadtest_app(5, 2),
+        str(tmp_path_factory.mktemp("serializers")),
+        auth_enabled=False,
+    )
+    launcher.create_or_update_database(delete_existing_data=True)
+    session_local = create_database_sessionmaker(launcher.engine)
+    with session_local() as session:
+        add_sample_rows(session)
+    yield session_local
+    launcher.engine.dispose()
+
+
+@pytest.mark.parametrize("expired", [False, True])
+@pytest.mark.parametrize("model", MODELS, ids=lambda model: model.__name__)
+def test_to_dict(session_local, model, expired):
+    with session_local() as session:
+        rows = session.query(model).all()
+        assert len(rows) > 0
+        if expired:
+            session.expire_all()
+        for row in rows:
+            # the reflective to_dict loads the expired columns
+            to_dict = Base.to_dict(row)
+            assert list(to_dict.items()) == list(reflective_to_dict(row).items())
@@ -0,0 +1,104 @@
+"""Project.get_orm_specs_diff matches the specs of a project to those in the
+database: new HITs and journeys are added, changed specs make the update fail.
+"""
+
+import pytest
+
+from covfee.launcher import Launcher
+from covfee.shared import task_dataclasses as tasks
+from covfee.shared.dataclass import (
+    HIT,
+    CovfeeApp,
+    Project,
+    SpecsChangedException,
+)
+
+
+def make_hit(name, journeys=1, counters=1, global_unique_id=None, ids=False):
+    hit = HIT(name, global_unique_id=global_unique_id)
+    for i in range(journeys):
+        nodes = [
+            tasks.IncrementCounterTaskSpec(name=f"Counter {j}") for j in range(counters)
+        ]
+        hit.add_journey(
+            nodes, journey_global_unique_id=f"{name} journey {i}" if ids else None
+        )
+    return hit
+
+
+def make_project(hits):
+    return Project("Diff test", email="diff@example.com", hits=hits)
+
+
+@pytest.fixture
+def launcher(tmp_path):
+    """Launcher (in-memory database) with one HIT with ids and one without"""
+    launcher = Launcher(
+        "dev",
+        CovfeeApp(
+            [
+                make_project(
+                    [make_hit("A", global_unique_id="a", ids=True), make_hit("B")]
+                )
+            ]
+        ),
+        str(tmp_path),
+        auth_enabled=False,
+    )
+    launcher.create_or_update_database(delete_existing_data=True)
+    yield launcher
+    launcher.engine.dispose()
+
+
+def get_diff(launcher, hits):
+    with launcher._sessionmaker() as session:
+        return make_project(hits).get_orm_specs_diff(session)
+
+
+def test_unchanged(launcher):
+    diff = get_diff(
+        launcher, [make_hit("A", global_unique_id="a", ids=True), make_hit("B")]
+    )
+    assert not diff.has_changes()
+    assert (diff.unchanged_hits, diff.unchanged_journeys) == (2, 2)
+    assert diff.changed == [] and diff.skipped == []
+
+
+def test_added(launcher):
+    hit_a = make_hit("A", global_unique_id="a", journeys=2, ids=True)
+    diff = get_diff(
+        launcher,
+        [hit_a, make_hit("B"), make_hit("C", global_unique_id="c"), make_hit("D")],
+    )
+    assert [hit.name for hit in diff.added_hits] == ["C", "D"]
+    assert [journey for _, journey in diff.added_journeys] == [hit_a.journeys[1]]
+    assert len(diff.updated_fingerprints) == 1
+    assert diff.changed == [] and diff.skipped == []
+
+
+def test_changed(launcher):
+    changed_hits = [
+        make_hit("A", global_unique_id="a", counters=2, ids=True),
+        make_hit("B", counters=2),
+    ]
+    diff = get_diff(launcher, changed_hits)
+    assert diff.changed == ["Journey A journey 0 of HIT a", "HIT a", "HIT B"]
+
+    project = make_project(changed_hits)
+    with launcher._sessionmaker() as session:
+        with pytest.raises(SpecsChangedException) as error:
+            project.create_or_update_orm_specs_data(session)
+        assert error.value.changed == diff.changed
+
+
+def test_skipped(launcher):
+    # B is not matched, so an unmatched HIT without id may be an edited B
+    diff = get_diff(
+        launcher,
+        [make_hit("A", global_unique_id="a", ids=True), make_hit("C", counters=2)],
+    )
+    assert diff.added_hits == []
+    assert diff.skipped == [
+        "HIT C: missing global_unique_id, and existing HITs without one do not "
+        "match the specs"
+    ]
@@ -0,0 +1,36 @@
+"""TaskInstance.get_task_object reuses the node's task object until the node
+changes session or its spec is modified.
+"""
+
+from covfee.server.orm.task import TaskInstance, get_session_token
+
+
+def test_task_object_cache(make_database):
+    session_local = make_database(participants=1, nodes=1)
+    with session_local() as session:
+        node = session.query(TaskInstance).first()
+        task_object = node.get_task_object()
+        assert node.get_task_object() is task_object
+        assert task_object.session is session
+
+        node.spec.spec = {**node.spec.spec}
+        assert node.get_task_object() is not task_object
+
+        task_object = node.get_task_object()
+        node_id = node.id
+        session.expunge(node)
+
+    with session_local() as session:
+        node = session.get(TaskInstance, node_id)
+        assert node.get_task_object() is not task_object
+
+
+def test_session_token(make_database):
+    session_local = make_database(participants=1, nodes=1)
+    tokens = []
+    for _ in range(2):
+        with session_local() as session:
+            assert get_session_token(session) is get_session_token(session)
+            tokens.append(get_session_token(session))
+    assert tokens[0] is not tokens[1]
+    assert get_session_token(None) is None